@@ -0,0 +1,136 @@
+#app_logging.py
+import collections
+import logging
+import logging.handlers
+import os
+import queue
+
+LOG_DIR = "logs"
+LOG_FILE = "lancador.log"
+LOGGER_NAME = "lancador"
+
+# Nível extra para mensagens de sucesso (exibidas em verde no Log)
+SUCCESS = 25
+logging.addLevelName(SUCCESS, "SUCCESS")
+
+# Nível usado pelo aplicativo ("info", "success", ...) -> nível do logging
+LEVELS = {
+    "info": logging.INFO,
+    "success": SUCCESS,
+    "warning": logging.WARNING,
+    "error": logging.ERROR,
+}
+
+# Nível do logging -> tag do widget de log
+TAGS = {
+    logging.INFO: "info",
+    SUCCESS: "success",
+    logging.WARNING: "warning",
+    logging.ERROR: "error",
+}
+
+_listener = None
+
+# Handler que acumula as linhas ainda não exibidas; o widget as consome em lote
+class RingBufferHandler(logging.Handler):
+    """Buffer limitado: se a interface não consumir a tempo, as linhas mais antigas são descartadas"""
+
+    def __init__(self, capacity=5000):
+        super().__init__()
+        self.pending = collections.deque(maxlen=capacity)
+        self.setFormatter(logging.Formatter("[%(asctime)s] ", datefmt="%H:%M:%S"))
+
+    def emit(self, record):
+        tag = TAGS.get(record.levelno, "info")
+        self.pending.append((self.format(record), f"{record.getMessage()}\n", tag))
+
+    def drain(self):
+        """Remove e devolve as linhas pendentes (seguro entre threads)"""
+        lines = []
+        pending = self.pending
+        while pending:
+            try:
+                lines.append(pending.popleft())
+            except IndexError:
+                break
+        return lines
+
+# Configura o logger do aplicativo: QueueHandler -> (arquivo rotativo, buffer da interface)
+def setup_logging(log_dir=LOG_DIR, max_bytes=1024 * 1024, backup_count=5, capacity=5000):
+    """Devolve (logger, ui_handler). Chamadas seguintes reaproveitam a mesma configuração."""
+    global _listener
+    logger = logging.getLogger(LOGGER_NAME)
+    if _listener is not None:
+        return logger, _listener.handlers[-1]
+
+    handlers = []
+    try:
+        os.makedirs(log_dir, exist_ok=True)
+        file_handler = logging.handlers.RotatingFileHandler(
+            os.path.join(log_dir, LOG_FILE), maxBytes=max_bytes,
+            backupCount=backup_count, encoding='utf-8'
+        )
+        file_handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(threadName)s: %(message)s"))
+        handlers.append(file_handler)
+    except OSError:
+        # Sem permissão para gravar o arquivo: o log continua aparecendo na interface
+        pass
+    ui_handler = RingBufferHandler(capacity)
+    handlers.append(ui_handler)
+
+    log_queue = queue.SimpleQueue()
+    logger.setLevel(logging.INFO)
+    logger.propagate = False
+    logger.addHandler(logging.handlers.QueueHandler(log_queue))
+    _listener = logging.handlers.QueueListener(log_queue, *handlers, respect_handler_level=True)
+    _listener.start()
+    return logger, ui_handler
+
+# Esvazia a fila e fecha os arquivos de log
+def stop_logging():
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        for handler in _listener.handlers:
+            handler.close()
+        _listener = None
+
+# Exibe o log em um tk.Text, atualizando em lotes por timer e mantendo só as últimas linhas
+class LogView:
+    def __init__(self, text_widget, handler, max_lines=1000, interval_ms=200):
+        self.text = text_widget
+        self.handler = handler
+        self.max_lines = max_lines
+        self.interval_ms = interval_ms
+        self._job = None
+
+    def start(self):
+        if self._job is None:
+            self._job = self.text.after(self.interval_ms, self._tick)
+
+    def stop(self):
+        if self._job is not None:
+            self.text.after_cancel(self._job)
+            self._job = None
+
+    def _tick(self):
+        self.flush()
+        self._job = self.text.after(self.interval_ms, self._tick)
+
+    def flush(self):
+        """Insere de uma vez todas as linhas pendentes e descarta as mais antigas do widget"""
+        lines = self.handler.drain()
+        if not lines:
+            return
+        # Só as últimas max_lines chegariam a aparecer
+        lines = lines[-self.max_lines:]
+        args = []
+        for timestamp, message, tag in lines:
+            args.extend((timestamp, "info", message, tag))
+        self.text.insert("end", *args)
+
+        line_count = int(self.text.index("end-1c").split(".")[0])
+        excess = line_count - self.max_lines - 1
+        if excess > 0:
+            self.text.delete("1.0", f"{excess + 1}.0")
+        self.text.see("end")
@@ -0,0 +1,207 @@
+#batch_extract.py
+"""Extração em lote de faturas PDF, sem interface gráfica.
+
+Uso:
+    python batch_extract.py PASTA_OU_GLOB [...] --fornecedor 1000012345 --saida itens.json
+
+Cada PDF é processado em um processo separado. O resultado é um único JSON de ITEMS
+(mesmo formato enviado ao SAP) e um relatório por arquivo com os valores
+candidatos e os tempos de cada etapa.
+"""
+import argparse
+import glob
+import json
+import os
+import sqlite3
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from document_loader import load_document, LAYOUT_VIVO_MOVEL
+from json_generator import build_line_items, build_line_items_vivo_movel
+from line_items import renumber
+from extraction_cache import ExtractionCache
+from extraction_templates import TemplateRegistry
+from config_manager import ConfigManager
+
+CONFIG_DIR = "config_files"
+
+# Cache e modelos de extração de cada processo do pool, abertos uma única vez por init_worker
+_worker_cache = None
+_worker_templates = None
+
+# Sem interface gráfica: erros de configuração vão para o stderr em vez de um messagebox
+def set_headless():
+    ConfigManager.headless = True
+
+# Abre o cache de extração; com o banco inacessível, segue sem cache
+def open_cache(cache_path=None):
+    try:
+        return ExtractionCache(cache_path)
+    except (OSError, sqlite3.Error) as e:
+        print(f"Cache de extração desativado: {e}", file=sys.stderr)
+        return None
+
+# Initializer do pool: cada processo tem o seu próprio ConfigManager, a sua conexão com o cache
+# (o modo WAL permite gravações concorrentes) e o seu registro de modelos de extração
+def init_worker(cache_path=None, config_dir=CONFIG_DIR):
+    global _worker_cache, _worker_templates
+    set_headless()
+    _worker_cache = open_cache(cache_path) if cache_path else None
+    _worker_templates = TemplateRegistry.load(config_dir)
+
+# Carrega o fornecedores.json pelo cache do ConfigManager (erros vão para o stderr)
+def load_supplier_data(config_dir=CONFIG_DIR):
+    set_headless()
+    return ConfigManager.load_json_file("fornecedores.json", config_dir)
+
+# Expande pastas e padrões glob em uma lista ordenada de PDFs, sem repetições
+def collect_pdf_files(inputs):
+    files = []
+    seen = set()
+    for entry in inputs:
+        if os.path.isdir(entry):
+            matches = [
+                os.path.join(entry, name) for name in os.listdir(entry)
+                if name.lower().endswith(".pdf")
+            ]
+        else:
+            matches = glob.glob(entry)
+        for path in sorted(matches):
+            path = os.path.abspath(path)
+            if path not in seen and os.path.isfile(path):
+                seen.add(path)
+                files.append(path)
+    return files
+
+# Processa um único PDF (executado dentro do pool de processos)
+def process_pdf(filepath, streaming=False):
+    report = {
+        "arquivo": filepath,
+        "layout": None,
+        "vivo_movel": False,
+        "valores": [],
+        "confiancas": [],
+        "notas_fiscais": [],
+        "texto": "",
+        "erro": None,
+        "tempos": {},
+    }
+    start = time.perf_counter()
+    try:
+        # O layout é identificado pelo conteúdo, como em PDFtoJSONApp.load_pdf
+        result = load_document(filepath, _worker_cache, streaming=streaming, templates=_worker_templates)
+        report["tempos"]["extracao"] = time.perf_counter() - start
+        report["layout"] = result["layout"]
+        report["vivo_movel"] = result["layout"] == LAYOUT_VIVO_MOVEL
+        if report["vivo_movel"]:
+            report["notas_fiscais"] = result["data"]["notas_fiscais"]
+            if not report["notas_fiscais"]:
+                report["erro"] = "Nenhuma nota fiscal encontrada na fatura Vivo Móvel"
+        else:
+            report["valores"] = result["values"] or []
+            # Confiança de cada valor candidato (mesma ordem de "valores")
+            report["confiancas"] = [scored.confidence for scored in result["scores"]]
+            if not result["values"]:
+                report["erro"] = "Não foi possível encontrar o valor total da fatura."
+        report["texto"] = result["text"]
+    except Exception as e:
+        report["erro"] = f"Erro ao ler o PDF: {e}"
+    report["tempos"]["total"] = time.perf_counter() - start
+    return report
+
+# Monta a lista consolidada de LineItem a partir dos relatórios, na ordem dos arquivos
+def build_items(reports, supplier_data, supplier_code, short_text, is_servico, material_code):
+    items = []
+    for report in reports:
+        if report["erro"]:
+            continue
+
+        if report["vivo_movel"]:
+            data = {"notas_fiscais": report["notas_fiscais"]}
+            new_items = build_line_items_vivo_movel(data, is_servico, supplier_data, material_code)
+        else:
+            if not supplier_code:
+                report["erro"] = "Fornecedor não informado (use --fornecedor)"
+                continue
+            description = short_text or os.path.splitext(os.path.basename(report["arquivo"]))[0]
+            new_items = build_line_items(
+                report["texto"], description, is_servico, supplier_code,
+                report["valores"][0], material_code
+            )
+
+        report["itens"] = len(new_items)
+        items.extend(new_items)
+
+    # Renumera PREQ_ITEM da mesma forma que PDFtoJSONApp.append_items
+    renumber(items)
+    return items
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Extrai em lote os valores de faturas PDF e gera o JSON de ITEMS.")
+    parser.add_argument("entradas", nargs="+", help="Pastas ou padrões glob com os PDFs")
+    parser.add_argument("--saida", default="itens.json", help="Arquivo do JSON consolidado de ITEMS")
+    parser.add_argument("--relatorio", default="relatorio.json", help="Arquivo do relatório por PDF")
+    parser.add_argument("--fornecedor", help="Código SAP do fornecedor para os PDFs que não são Vivo Móvel")
+    parser.add_argument("--descricao", help="Descrição (SHORT_TEXT); padrão: nome do arquivo")
+    parser.add_argument("--material", default="ZA040282", help="Código do material/serviço")
+    parser.add_argument("--servico", action="store_true", help="Marca os itens como serviço (S)")
+    parser.add_argument("--processos", type=int, default=None, help="Número de processos (padrão: núcleos da CPU)")
+    parser.add_argument("--config-dir", default=CONFIG_DIR,
+                        help="Pasta com o fornecedores.json e o templates_extracao.json")
+    parser.add_argument("--sem-cache", action="store_true", help="Não usar o cache de extração em disco")
+    parser.add_argument("--streaming", action="store_true",
+                        help="Parar de ler páginas assim que um total confiável for encontrado")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+    files = collect_pdf_files(args.entradas)
+    if not files:
+        print("Nenhum PDF encontrado.", file=sys.stderr)
+        return 1
+
+    supplier_data = load_supplier_data(args.config_dir)
+    cache_path = None
+    if not args.sem_cache:
+        cache = open_cache()  # Cria o banco antes de iniciar os processos
+        cache_path = cache.path if cache else None
+    start = time.perf_counter()
+    reports_by_file = {}
+    with ProcessPoolExecutor(max_workers=args.processos, initializer=init_worker,
+                             initargs=(cache_path, args.config_dir)) as executor:
+        futures = {executor.submit(process_pdf, path, args.streaming): path for path in files}
+        for done, future in enumerate(as_completed(futures), start=1):
+            report = future.result()
+            reports_by_file[report["arquivo"]] = report
+            status = "ERRO" if report["erro"] else "OK"
+            print(f"[{done}/{len(files)}] {status} {os.path.basename(report['arquivo'])} "
+                  f"({report['tempos']['total']:.2f}s)")
+
+    # Mantém a ordem de entrada para que a numeração dos itens seja reproduzível
+    reports = [reports_by_file[path] for path in files]
+    items = build_items(
+        reports, supplier_data, args.fornecedor, args.descricao, args.servico, args.material
+    )
+    elapsed = time.perf_counter() - start
+
+    with open(args.saida, 'w', encoding='utf-8') as f:
+        json.dump([item.to_sap() for item in items], f, indent=4, ensure_ascii=False)
+
+    for report in reports:
+        # O texto completo fica fora do relatório para não gerar arquivos enormes
+        report.pop("texto", None)
+    with open(args.relatorio, 'w', encoding='utf-8') as f:
+        json.dump({
+            "arquivos": len(files),
+            "itens": len(items),
+            "erros": sum(1 for r in reports if r["erro"]),
+            "tempo_total": elapsed,
+            "resultados": reports,
+        }, f, indent=4, ensure_ascii=False)
+
+    print(f"{len(items)} itens gravados em {args.saida}; relatório em {args.relatorio} ({elapsed:.2f}s)")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,5 @@
+"""Benchmarks da extração e testes de carga do envio ao SAP. Executar a partir da raiz do projeto, ex.:
+
+    python -m benchmarks.bench_extraction --saida resultados.json
+    python -m benchmarks.load_sap --taxa 5 --requisicoes 200
+"""
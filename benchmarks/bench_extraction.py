@@ -0,0 +1,211 @@
+#bench_extraction.py
+"""Mede a extração sobre um corpus sintético (benchmarks.corpus) e grava os resultados em JSON.
+
+Para cada grupo de documentos (faturas, boletos, contas de arrecadação e cada tamanho de
+fatura Vivo Móvel) são medidos:
+
+- cada estratégia do pdf_reader, com um DocumentModel novo (inclui a leitura das páginas);
+- o parser da Vivo Móvel sobre o PDF e sobre o texto já extraído;
+- o caminho completo do aplicativo: load_document -> generate_json_input(_vivo_movel).
+
+Os tempos são o melhor e a mediana de N repetições; a memória é o pico do tracemalloc em uma
+execução à parte (só conta as alocações do Python, não as do MuPDF).
+
+Uso (a partir da raiz do projeto):
+    python -m benchmarks.bench_extraction --saida resultados.json
+    python -m benchmarks.bench_extraction --saida novo.json --comparar resultados.json
+"""
+import argparse
+import datetime
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import fitz
+
+from benchmarks.corpus import build_corpus, parse_vivo_size
+from document_loader import load_document
+from extraction_templates import TemplateRegistry
+from json_generator import generate_json_input, generate_json_input_vivo_movel
+from pdf_reader import (
+    DocumentModel, EXTRACTOR_VERSION, VALUE_STRATEGIES, _extract_vivo_movel, extrair_dados_vivo_movel,
+)
+from tracing import get_tracer
+
+# Executa func(documento) para todos os documentos do grupo; devolve os resultados
+def _run(func, documents):
+    return [func(document) for document in documents]
+
+def _measure(func, documents, repeat):
+    """Devolve (tempos de cada repetição, pico de memória em bytes, resultados)"""
+    times = []
+    results = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        results = _run(func, documents)
+        times.append(time.perf_counter() - start)
+    tracemalloc.start()
+    try:
+        _run(func, documents)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return times, peak, results
+
+# Uma estratégia do pdf_reader sobre um DocumentModel recém-criado
+def _strategy_stage(strategy):
+    def run(document):
+        with fitz.open(document["caminho"]) as doc:
+            return strategy(DocumentModel(doc))
+    return run
+
+def _text_stage(document):
+    with fitz.open(document["caminho"]) as doc:
+        return DocumentModel(doc).text
+
+def _vivo_pdf_stage(document):
+    return _extract_vivo_movel(fitz.open(document["caminho"]))[1]
+
+def _vivo_text_stage(document):
+    return extrair_dados_vivo_movel(document["texto"])
+
+# Caminho do aplicativo: identifica o layout, extrai e gera o JSON de ITEMS
+def _end_to_end_stage(templates):
+    def run(document):
+        result = load_document(document["caminho"], streaming=True, templates=templates)
+        if result["data"] is not None:
+            return result, generate_json_input_vivo_movel(result["data"], True, {})
+        values = result["values"] or []
+        if not values:
+            return result, None
+        return result, generate_json_input(result["text"], "Benchmark", True, "1000000000", values[0])
+    return run
+
+# Confere o resultado de ponta a ponta com o valor esperado do manifesto
+def _is_correct(document, outcome):
+    result, output = outcome
+    if output is None:
+        return False
+    if document["tipo"] == "vivo":
+        totals = [nf["total"] for nf in result["data"]["notas_fiscais"]]
+        return totals == document["totais"]
+    return result["values"][0] == document["total"]
+
+def _group_documents(manifest, directory):
+    groups = {}
+    for entry in manifest["documentos"]:
+        document = dict(entry, caminho=os.path.join(directory, entry["arquivo"]))
+        name = entry["tipo"] if entry["tipo"] != "vivo" else os.path.splitext(entry["arquivo"])[0]
+        groups.setdefault(name, []).append(document)
+    return groups
+
+def _record(group, stage, documents, times, peak):
+    pages = sum(document["paginas"] for document in documents)
+    best = min(times)
+    return {
+        "grupo": group,
+        "etapa": stage,
+        "documentos": len(documents),
+        "paginas": pages,
+        "melhor_s": round(best, 6),
+        "mediana_s": round(statistics.median(times), 6),
+        "paginas_por_s": round(pages / best, 2) if best else None,
+        "docs_por_s": round(len(documents) / best, 2) if best else None,
+        "pico_memoria_bytes": peak,
+    }
+
+def run_benchmarks(manifest, directory, repeat=3, log=print):
+    results = []
+    # Sem modelos de região: mede só as estratégias do pdf_reader
+    templates = TemplateRegistry()
+    for group, documents in _group_documents(manifest, directory).items():
+        is_vivo = documents[0]["tipo"] == "vivo"
+        stages = [("texto", _text_stage)]
+        if is_vivo:
+            for document in documents:
+                document["texto"] = _text_stage(document)
+            stages += [("vivo_movel_pdf", _vivo_pdf_stage), ("vivo_movel_texto", _vivo_text_stage)]
+        else:
+            stages += [(strategy.__name__, _strategy_stage(strategy)) for strategy in VALUE_STRATEGIES]
+        stages.append(("ponta_a_ponta", _end_to_end_stage(templates)))
+
+        for stage, func in stages:
+            times, peak, outcomes = _measure(func, documents, repeat)
+            record = _record(group, stage, documents, times, peak)
+            if stage == "ponta_a_ponta":
+                record["corretos"] = sum(_is_correct(doc, out) for doc, out in zip(documents, outcomes))
+            results.append(record)
+            log(f"{group:<28} {stage:<28} {record['melhor_s']:>10.4f}s {record['paginas_por_s'] or 0:>10.1f} pág/s "
+                f"{record['docs_por_s'] or 0:>9.1f} docs/s {peak / 1024:>10.0f} KiB"
+                + (f"  {record['corretos']}/{len(documents)} corretos" if "corretos" in record else ""))
+    return results
+
+# Compara com uma execução anterior; devolve as etapas que ficaram mais lentas que a tolerância
+def compare(results, previous, tolerance, log=print):
+    before = {(entry["grupo"], entry["etapa"]): entry for entry in previous["resultados"]}
+    regressions = []
+    for entry in results:
+        old = before.get((entry["grupo"], entry["etapa"]))
+        if not old or not old["melhor_s"]:
+            continue
+        ratio = entry["melhor_s"] / old["melhor_s"]
+        flag = ""
+        if ratio > 1 + tolerance:
+            regressions.append({**entry, "razao": round(ratio, 3)})
+            flag = "  REGRESSÃO"
+        log(f"{entry['grupo']:<28} {entry['etapa']:<28} {ratio:>6.2f}x{flag}")
+    return regressions
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--pasta", help="Pasta do corpus (padrão: pasta temporária reaproveitada entre execuções)")
+    parser.add_argument("--faturas", type=int, default=20)
+    parser.add_argument("--boletos", type=int, default=20)
+    parser.add_argument("--arrecadacao", type=int, default=10)
+    parser.add_argument("--vivo", type=parse_vivo_size, nargs="*", default=[(1, 1), (100, 50), (1000, 1000)],
+                        help="Faturas Vivo Móvel como PÁGINAS:NOTAS")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--repeticoes", type=int, default=3)
+    parser.add_argument("--saida", default="benchmark_extracao.json", help="Arquivo JSON com os resultados")
+    parser.add_argument("--comparar", help="Resultados anteriores (JSON) para detectar regressões")
+    parser.add_argument("--tolerancia", type=float, default=0.2,
+                        help="Aumento relativo de tempo aceito antes de acusar regressão (padrão 0.2)")
+    args = parser.parse_args(argv)
+
+    # Os spans continuam sendo medidos, mas não são gravados em disco durante as medições
+    get_tracer().path = None
+    directory = args.pasta or os.path.join(tempfile.gettempdir(), f"corpus_extracao_{args.seed}")
+    start = time.perf_counter()
+    manifest = build_corpus(directory, args.faturas, args.boletos, args.vivo, args.seed, args.arrecadacao)
+    print(f"Corpus em {directory} ({time.perf_counter() - start:.1f}s)")
+
+    results = run_benchmarks(manifest, directory, args.repeticoes)
+    output = {
+        "data": datetime.datetime.now().isoformat(timespec="seconds"),
+        "versao_extrator": EXTRACTOR_VERSION,
+        "python": platform.python_version(),
+        "pymupdf": getattr(fitz, "VersionBind", None),
+        "plataforma": platform.platform(),
+        "corpus": manifest["parametros"],
+        "repeticoes": args.repeticoes,
+        "resultados": results,
+    }
+    with open(args.saida, "w", encoding="utf-8") as f:
+        json.dump(output, f, ensure_ascii=False, indent=2)
+    print(f"Resultados gravados em {args.saida}")
+
+    if args.comparar:
+        with open(args.comparar, encoding="utf-8") as f:
+            previous = json.load(f)
+        regressions = compare(results, previous, args.tolerancia)
+        if regressions:
+            print(f"{len(regressions)} etapa(s) mais lentas que a tolerância de {args.tolerancia:.0%}")
+            sys.exit(1)
+
+if __name__ == "__main__":
+    main()
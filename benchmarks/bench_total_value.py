@@ -0,0 +1,103 @@
+#bench_total_value.py
+"""Compara o tokenizador de extract_total_value com a versão antiga de 18 regex.
+
+Uso (a partir da raiz do projeto):
+    python -m benchmarks.bench_total_value --paginas 10 100 300
+"""
+import argparse
+import random
+import re
+import time
+
+from pdf_reader import extract_total_value
+
+# Implementação anterior, mantida aqui apenas como referência para comparação
+LEGACY_PATTERNS = [
+    r"R\$\s*([\d\.]+,\d{2})",
+    r"VALOR.*?R\$\s*([\d\.]+,\d{2})",
+    r"TOTAL\s*R\$\s*([\d\.]+,\d{2})",
+    r"TOTAL.*?R\$\s*([\d\.]+,\d{2})",
+    r"TOTAL FATURA.*?R\$\s*([\d\.]+,\d{2})",
+    r"LÍQUIDO FATURA.*?([\d\.]+,\d{2})",
+    r"TOTAL\s+LÍQUIDO\s+FATURA\s*R\$\s*([\d\.]+,\d{2})",
+    r"TOTAL\s+FATURA\s*R\$\s*([\d\.]+,\d{2})",
+    r"TOTAL\s+FATURA.*?R\$\s*([\d\.]+,\d{2})",
+    r"VALOR TOTAL\s*R\$\s*([\d\.]+,\d{2})",
+    r"TOTAL SERVIÇOS DE TELECOMUNICAÇÕES\s*R\$\s*([\d\.]+,\d{2})",
+    r"TOTAL VOGEL SOL\. EM TEL\. E INF\. S\.A\.\s*([\d\.]+,\d{2})",
+    r"VALOR\s*DO\s*DOCUMENTO\s*R?\$?\s*([\d\.]+,\d{2})",
+    r"VALOR\s*COBRADO\s*R?\$?\s*([\d\.]+,\d{2})",
+    r"VALOR\s*A\s*PAGAR\s*R?\$?\s*([\d\.]+,\d{2})",
+    r"PAGAMENTO\s*R?\$?\s*([\d\.]+,\d{2})",
+    r"VALOR\s*LÍQUIDO\s*R?\$?\s*([\d\.]+,\d{2})",
+    r"(?:^|\s)([\d\.]{1,},[0-9]{2})(?:$|\s)",
+]
+
+def legacy_extract_total_value(text):
+    all_values = []
+    for pattern in LEGACY_PATTERNS:
+        all_values.extend(re.findall(pattern, text, re.IGNORECASE | re.DOTALL))
+    unique_values = []
+    seen = set()
+    for value in all_values:
+        if value not in seen:
+            unique_values.append(value)
+            seen.add(value)
+    return unique_values if unique_values else None
+
+def _money(rng, high=5000):
+    cents = rng.randint(1, high * 100)
+    reais, centavos = divmod(cents, 100)
+    return f"{reais:,}".replace(",", ".") + f",{centavos:02d}"
+
+# Gera o texto de uma fatura de telefonia no mesmo formato de DocumentModel.text (uma página por linha)
+def make_telecom_text(pages, lines_per_page=60, seed=42):
+    rng = random.Random(seed)
+    line_templates = [
+        lambda: f"Ligação local {rng.randint(10, 99)} min {_money(rng, 5)}",
+        lambda: f"Chamada para (11) 9{rng.randint(1000, 9999)}-{rng.randint(1000, 9999)} {rng.randint(1, 59)}m{rng.randint(0, 59)}s {_money(rng, 20)}",
+        lambda: f"Serviços de dados {rng.randint(1, 50)}GB {_money(rng, 300)}",
+        lambda: f"Subtotal do número {_money(rng, 800)} Impostos ICMS {_money(rng, 50)}",
+        lambda: "Detalhamento de uso do período sem valores nesta linha",
+    ]
+    out = []
+    for page in range(pages):
+        # O detalhamento não usa R$: cada "Valor"/"Total" depois do último R$ fazia os padrões
+        # antigos com .*? percorrerem o resto do documento
+        lines = [f"Página {page + 1} de {pages} Data Hora Número Duração Valor Total do período"]
+        for _ in range(lines_per_page):
+            lines.append(rng.choice(line_templates)())
+        if page == 0:
+            lines.append(f"TOTAL A PAGAR R$ {_money(rng)} VALOR DO DOCUMENTO {_money(rng)}")
+            lines.append(f"LÍQUIDO FATURA {_money(rng)} VALOR COBRADO R$ {_money(rng)}")
+        if page == pages - 1:
+            lines.append(f"TOTAL FATURA {_money(rng)} PAGAMENTO {_money(rng)}")
+        out.append(" ".join(lines) + "\n")
+    return "".join(out)
+
+def _time(func, text, repeat):
+    best = float("inf")
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func(text)
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--paginas", type=int, nargs="+", default=[1, 10, 50, 100])
+    parser.add_argument("--repeticoes", type=int, default=3)
+    args = parser.parse_args(argv)
+
+    print(f"{'páginas':>8} {'caracteres':>11} {'antigo (s)':>11} {'tokenizador (s)':>16} {'ganho':>7}  igual")
+    for pages in args.paginas:
+        text = make_telecom_text(pages)
+        legacy_time, legacy_result = _time(legacy_extract_total_value, text, args.repeticoes)
+        new_time, new_result = _time(extract_total_value, text, args.repeticoes)
+        speedup = legacy_time / new_time if new_time else float("inf")
+        same = "sim" if legacy_result == new_result else "NÃO"
+        print(f"{pages:>8} {len(text):>11} {legacy_time:>11.4f} {new_time:>16.4f} {speedup:>6.1f}x  {same}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+#bench_vivo_movel.py
+"""Compara o VivoMovelParser com a regex única que extrair_dados_vivo_movel usava antes.
+
+Uso (a partir da raiz do projeto):
+    python -m benchmarks.bench_vivo_movel --paginas 500 --notas 50
+"""
+import argparse
+import random
+import re
+import time
+
+from pdf_reader import extrair_dados_vivo_movel, standardize_cnpj
+
+VIVO_CNPJS = [
+    "02.558.157/0001-62", "02.558.157/0002-43", "02.558.157/0003-24", "02.558.157/0008-39",
+    "02.558.157/0009-10", "02.558.157/0011-34", "02.558.157/0013-04", "02.558.157/0014-87",
+]
+
+# Implementação anterior, mantida aqui apenas como referência para comparação
+def legacy_notas_fiscais(text):
+    nf_matches = re.finditer(
+        r"NOTA FISCAL DE SERVIÇOS DE TELECOMUNICAÇÕES.*?"
+        r"CNPJ:\s*([\d.-]+/[\d-]+).*?"
+        r"TOTAL NOTA FISCAL TELEFONICA BRASIL S.A.\s*([\d.,]+)",
+        text, re.DOTALL)
+    return [{"cnpj": standardize_cnpj(m.group(1)), "total": m.group(2)} for m in nf_matches]
+
+def _money(rng, high=2000):
+    reais, centavos = divmod(rng.randint(100, high * 100), 100)
+    return f"{reais:,}".replace(",", ".") + f",{centavos:02d}"
+
+# Gera o texto de uma fatura composta no formato de DocumentModel.text (uma página por linha)
+def make_vivo_text(pages, notas, lines_per_page=50, seed=7):
+    rng = random.Random(seed)
+    notas = max(1, min(notas, pages))
+    # Páginas de resumo no fim repetem o título das notas fiscais sem o total, como nas faturas reais
+    summary_pages = max(1, pages // 20)
+    detail_pages = max(notas, pages - summary_pages)
+    starts = sorted(rng.sample(range(detail_pages), notas)) if notas < detail_pages else list(range(notas))
+    starts_set = set(starts)
+
+    out = []
+    current = -1
+    for page in range(detail_pages):
+        lines = [f"Nº da Conta: 0123456789 Mês de referência: 03/2025 Página {page + 1}"]
+        if page == 0:
+            lines.append(f"Total a Pagar - R$ {_money(rng, 90000)}")
+        if page in starts_set:
+            current += 1
+            lines.append("NOTA FISCAL DE SERVIÇOS DE TELECOMUNICAÇÕES")
+            lines.append(f"TELEFONICA BRASIL S.A. CNPJ: {rng.choice(VIVO_CNPJS)} IE: 108.383.949.112")
+        for _ in range(lines_per_page):
+            lines.append(f"Linha (11) 9{rng.randint(1000, 9999)}-{rng.randint(1000, 9999)} "
+                         f"Ligação {rng.randint(1, 59)}min {_money(rng, 5)}")
+        next_start = page + 1 in starts_set or page + 1 == detail_pages
+        if next_start and current >= 0:
+            lines.append(f"TOTAL NOTA FISCAL TELEFONICA BRASIL S.A. {_money(rng)}")
+        out.append(" ".join(lines) + "\n")
+    for page in range(summary_pages):
+        lines = ["Resumo NOTA FISCAL DE SERVIÇOS DE TELECOMUNICAÇÕES por CNPJ:"]
+        for _ in range(lines_per_page):
+            lines.append(f"NOTA FISCAL DE SERVIÇOS DE TELECOMUNICAÇÕES {rng.randint(100000, 999999)} {_money(rng)}")
+        out.append(" ".join(lines) + "\n")
+    return "".join(out)
+
+def _time(func, text, repeat):
+    best = float("inf")
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func(text)
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--paginas", type=int, nargs="+", default=[50, 200, 500])
+    parser.add_argument("--notas", type=int, default=50)
+    parser.add_argument("--repeticoes", type=int, default=3)
+    args = parser.parse_args(argv)
+
+    print(f"{'páginas':>8} {'NFs':>5} {'regex antiga (s)':>17} {'parser (s)':>11} {'ganho':>7}  igual")
+    for pages in args.paginas:
+        text = make_vivo_text(pages, args.notas)
+        legacy_time, legacy_result = _time(legacy_notas_fiscais, text, args.repeticoes)
+        new_time, data = _time(extrair_dados_vivo_movel, text, args.repeticoes)
+        new_result = [{"cnpj": nf["cnpj"], "total": nf["total"]} for nf in data["notas_fiscais"]]
+        speedup = legacy_time / new_time if new_time else float("inf")
+        same = "sim" if legacy_result == new_result else "NÃO"
+        print(f"{pages:>8} {len(new_result):>5} {legacy_time:>17.4f} {new_time:>11.4f} {speedup:>6.1f}x  {same}")
+
+if __name__ == "__main__":
+    main()
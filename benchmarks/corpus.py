@@ -0,0 +1,259 @@
+#corpus.py
+"""Gera corpora sintéticos e reproduzíveis de PDFs com o PyMuPDF.
+
+Tipos de documento:
+
+- fatura: nota de serviço de uma página com detalhamento e TOTAL A PAGAR;
+- boleto: ficha de compensação com linha digitável válida (DVs módulo 10 e 11);
+- arrecadacao: conta de consumo com linha digitável de arrecadação de 48 dígitos, impressa com
+  hífen antes do DV de cada bloco ("83640000001-1 33120138000-2 ...");
+- vivo: fatura composta da Vivo Móvel com N notas fiscais distribuídas em P páginas.
+
+O mesmo seed gera sempre os mesmos arquivos. Cada corpus tem um manifesto.json com o valor
+esperado de cada documento, para conferir se a extração continua correta.
+
+Uso (a partir da raiz do projeto):
+    python -m benchmarks.corpus PASTA --faturas 20 --boletos 20 --arrecadacao 10 --vivo 10:5 1000:1000
+"""
+import argparse
+import datetime
+import json
+import os
+import random
+
+import fitz
+
+MANIFEST_FILE = "manifesto.json"
+CORPUS_VERSION = 2  # Mudar sempre que os documentos gerados mudarem
+
+PAGE_WIDTH, PAGE_HEIGHT = 595, 842  # A4 em pontos
+MARGIN = 36
+FONT_SIZE = 7
+LINE_HEIGHT = 9
+LINES_PER_PAGE = (PAGE_HEIGHT - 2 * MARGIN) // LINE_HEIGHT
+
+VIVO_CNPJS = [
+    "02.558.157/0001-62", "02.558.157/0002-43", "02.558.157/0003-24", "02.558.157/0008-39",
+    "02.558.157/0009-10", "02.558.157/0011-34", "02.558.157/0013-04", "02.558.157/0014-87",
+]
+SUPPLIER_CNPJS = ["11.222.333/0001-81", "45.997.418/0001-53", "60.701.190/0001-04"]
+
+# Data base do fator de vencimento; o fator volta a 1000 depois de 9999 (22/02/2025)
+_FACTOR_BASE = datetime.date(1997, 10, 7)
+
+def money(cents):
+    """Centavos no formato brasileiro ("1.234,56")"""
+    reais, centavos = divmod(cents, 100)
+    return f"{reais:,}".replace(",", ".") + f",{centavos:02d}"
+
+def _random_cents(rng, high):
+    return rng.randint(100, high * 100)
+
+# DV módulo 10 dos campos da linha digitável
+def mod10(digits):
+    total = 0
+    for i, digit in enumerate(reversed(digits)):
+        product = int(digit) * (2 if i % 2 == 0 else 1)
+        total += product // 10 + product % 10
+    return str((10 - total % 10) % 10)
+
+# DV geral módulo 11 do código de barras bancário
+def mod11(digits):
+    total = sum(int(digit) * (2 + i % 8) for i, digit in enumerate(reversed(digits)))
+    dv = 11 - total % 11
+    return "1" if dv in (0, 10, 11) else str(dv)
+
+def due_date_factor(date):
+    days = (date - _FACTOR_BASE).days
+    return days if days < 10000 else (days - 10000) % 9000 + 1000
+
+# Linha digitável (47 dígitos, formatada) de um boleto bancário
+def make_linha_digitavel(bank, due_date, cents, free_field):
+    without_dv = f"{bank}9{due_date_factor(due_date):04d}{cents:010d}{free_field}"
+    barcode = without_dv[:4] + mod11(without_dv) + without_dv[4:]
+    field1 = barcode[0:4] + barcode[19:24]
+    field2 = barcode[24:34]
+    field3 = barcode[34:44]
+    field1 += mod10(field1)
+    field2 += mod10(field2)
+    field3 += mod10(field3)
+    return (f"{field1[:5]}.{field1[5:]} {field2[:5]}.{field2[5:]} {field3[:5]}.{field3[5:]} "
+            f"{barcode[4]} {barcode[5:19]}")
+
+# Linha digitável (48 dígitos, formatada com hífens) de uma arrecadação com valor em reais e DVs
+# módulo 10 (identificador 6); o campo livre tem 29 dígitos
+def make_linha_arrecadacao(segment, cents, free_field):
+    without_dv = f"8{segment}6{cents:011d}{free_field}"
+    barcode = without_dv[:3] + mod10(without_dv) + without_dv[3:]
+    blocks = [barcode[i:i + 11] for i in range(0, 44, 11)]
+    return " ".join(f"{block}-{mod10(block)}" for block in blocks)
+
+# Escreve as linhas de texto em páginas A4; cada item de `pages` é uma lista de (linha, negrito)
+def write_pdf(path, pages, metadata=None):
+    doc = fitz.open()
+    try:
+        for lines in pages:
+            page = doc.new_page(width=PAGE_WIDTH, height=PAGE_HEIGHT)
+            y = MARGIN + FONT_SIZE
+            for text, bold in lines:
+                page.insert_text((MARGIN, y), text, fontsize=FONT_SIZE, fontname="hebo" if bold else "helv")
+                y += LINE_HEIGHT
+        if metadata:
+            doc.set_metadata(metadata)
+        doc.save(path, garbage=3, deflate=True)
+    finally:
+        doc.close()
+
+def _detail_line(rng):
+    return rng.choice((
+        lambda: f"Serviço de manutenção {rng.randint(1, 99)} h {money(_random_cents(rng, 300))}",
+        lambda: f"Material de consumo lote {rng.randint(1000, 9999)} {money(_random_cents(rng, 80))}",
+        lambda: f"Deslocamento técnico {rng.randint(1, 30)} km {money(_random_cents(rng, 20))}",
+        lambda: "Observação: serviço executado conforme contrato vigente",
+    ))()
+
+# Fatura comum de uma página
+def invoice_pages(rng):
+    cnpj = rng.choice(SUPPLIER_CNPJS)
+    total = _random_cents(rng, 20000)
+    lines = [
+        ("FATURA DE SERVIÇOS", True),
+        (f"Prestador: Fornecedor Exemplo Ltda CNPJ: {cnpj}", False),
+        (f"Fatura nº {rng.randint(10000, 99999)} Emissão: {rng.randint(1, 28):02d}/03/2025", False),
+    ]
+    lines += [(_detail_line(rng), False) for _ in range(40)]
+    lines.append((f"Impostos retidos {money(_random_cents(rng, 500))}", False))
+    lines.append((f"TOTAL A PAGAR R$ {money(total)}", True))
+    return [lines], total, {"cnpj": cnpj}
+
+# Boleto bancário com linha digitável
+def boleto_pages(rng):
+    total = _random_cents(rng, 20000)
+    due_date = datetime.date(2025, 1, 1) + datetime.timedelta(days=rng.randint(0, 365))
+    free_field = "".join(str(rng.randint(0, 9)) for _ in range(25))
+    linha = make_linha_digitavel(rng.choice(("001", "237", "341", "104")), due_date, total, free_field)
+    lines = [
+        ("RECIBO DO PAGADOR", True),
+        (f"Beneficiário: Fornecedor Exemplo Ltda CNPJ: {rng.choice(SUPPLIER_CNPJS)}", False),
+        (f"Nosso Número: {rng.randint(10 ** 9, 10 ** 10 - 1)} Vencimento: {due_date:%d/%m/%Y}", False),
+        (f"Valor do Documento R$ {money(total)}", False),
+        (f"Juros/Multa {money(_random_cents(rng, 50))} Descontos {money(_random_cents(rng, 50))}", False),
+    ]
+    lines += [(_detail_line(rng), False) for _ in range(20)]
+    lines += [
+        ("FICHA DE COMPENSAÇÃO", True),
+        (linha, True),
+        (f"Local de pagamento: pagável em qualquer banco até o vencimento {due_date:%d/%m/%Y}", False),
+        (f"Valor do Documento {money(total)}", False),
+    ]
+    return [lines], total, {"linha_digitavel": linha, "vencimento": due_date.isoformat()}
+
+# Conta de consumo com linha digitável de arrecadação
+def collection_pages(rng):
+    total = _random_cents(rng, 2000)
+    due_date = datetime.date(2025, 1, 1) + datetime.timedelta(days=rng.randint(0, 365))
+    free_field = "".join(str(rng.randint(0, 9)) for _ in range(29))
+    linha = make_linha_arrecadacao(rng.choice("1234"), total, free_field)
+    lines = [
+        ("CONTA DE FORNECIMENTO", True),
+        (f"Concessionária Exemplo S.A. CNPJ: {rng.choice(SUPPLIER_CNPJS)}", False),
+        (f"Instalação {rng.randint(10 ** 7, 10 ** 8 - 1)} Vencimento: {due_date:%d/%m/%Y}", False),
+    ]
+    lines += [(_detail_line(rng), False) for _ in range(20)]
+    lines += [
+        (f"Tributos {money(_random_cents(rng, 100))} Multa {money(_random_cents(rng, 20))}", False),
+        ("Autenticação mecânica", False),
+        (linha, True),
+        # Sem o total impresso: o valor certo só sai da linha digitável
+        (f"Vencimento {due_date:%d/%m/%Y}", False),
+    ]
+    return [lines], total, {"linha_digitavel": linha, "vencimento": due_date.isoformat()}
+
+# Fatura composta da Vivo Móvel: `notas` notas fiscais em `pages` páginas
+def vivo_pages(rng, pages, notas):
+    notas = max(1, min(notas, pages))
+    starts = sorted({0, *rng.sample(range(1, pages), notas - 1)})
+    # Páginas onde cada nota termina (a página antes da próxima nota, ou a última)
+    ends = {end - 1 for end in starts[1:]} | {pages - 1}
+
+    header = ("Nº da Conta: 0123456789 Mês de referência: 03/2025", False)
+    totals = []
+    out = []
+    for page in range(pages):
+        lines = [header, (f"Página {page + 1} de {pages}", False)]
+        if page == 0:
+            lines.append(None)  # Total a Pagar: preenchido quando as notas estiverem prontas
+        if page in starts:
+            lines.append(("NOTA FISCAL DE SERVIÇOS DE TELECOMUNICAÇÕES", True))
+            lines.append((f"TELEFONICA BRASIL S.A. CNPJ: {rng.choice(VIVO_CNPJS)} IE: 108.383.949.112", False))
+        while len(lines) < LINES_PER_PAGE - 2:
+            lines.append((f"Linha (11) 9{rng.randint(1000, 9999)}-{rng.randint(1000, 9999)} "
+                          f"Ligação {rng.randint(1, 59)}min {money(_random_cents(rng, 5))}", False))
+        if page in ends:
+            total = _random_cents(rng, 2000)
+            totals.append(total)
+            lines.append((f"TOTAL NOTA FISCAL TELEFONICA BRASIL S.A. {money(total)}", True))
+        out.append(lines)
+    out[0][2] = (f"Total a Pagar - R$ {money(sum(totals))}", True)
+    return out, sum(totals), {"notas_fiscais": len(totals), "totais": [money(t) for t in totals]}
+
+# Gera (ou reaproveita) o corpus na pasta e devolve o manifesto
+def build_corpus(directory, invoices=20, boletos=20, vivo=((10, 5),), seed=42, collections=10):
+    """vivo: pares (páginas, notas fiscais)"""
+    params = {"versao": CORPUS_VERSION, "faturas": invoices, "boletos": boletos,
+              "arrecadacao": collections, "vivo": [list(entry) for entry in vivo], "seed": seed}
+    manifest_path = os.path.join(directory, MANIFEST_FILE)
+    try:
+        with open(manifest_path, encoding="utf-8") as f:
+            manifest = json.load(f)
+        if manifest["parametros"] == params and all(
+                os.path.exists(os.path.join(directory, doc["arquivo"])) for doc in manifest["documentos"]):
+            return manifest
+    except (OSError, ValueError, KeyError):
+        pass
+
+    os.makedirs(directory, exist_ok=True)
+    rng = random.Random(seed)
+    documents = []
+
+    def add(kind, name, pages, total, extra):
+        write_pdf(os.path.join(directory, name), pages, {"producer": "benchmarks.corpus", "title": name})
+        documents.append({"arquivo": name, "tipo": kind, "paginas": len(pages),
+                          "total": money(total), **extra})
+
+    for i in range(invoices):
+        add("fatura", f"fatura_{i:04d}.pdf", *invoice_pages(rng))
+    for i in range(boletos):
+        add("boleto", f"boleto_{i:04d}.pdf", *boleto_pages(rng))
+    for i in range(collections):
+        add("arrecadacao", f"arrecadacao_{i:04d}.pdf", *collection_pages(rng))
+    for pages, notas in vivo:
+        add("vivo", f"vivo_movel_{pages}p_{notas}nf.pdf", *vivo_pages(rng, pages, notas))
+
+    manifest = {"parametros": params, "documentos": documents}
+    with open(manifest_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2)
+    return manifest
+
+# "100:50" -> (100, 50); "100" -> (100, 100)
+def parse_vivo_size(text):
+    pages, _, notas = text.partition(":")
+    return int(pages), int(notas or pages)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("pasta")
+    parser.add_argument("--faturas", type=int, default=20)
+    parser.add_argument("--boletos", type=int, default=20)
+    parser.add_argument("--arrecadacao", type=int, default=10)
+    parser.add_argument("--vivo", type=parse_vivo_size, nargs="*", default=[(10, 5), (100, 50), (1000, 1000)],
+                        help="Faturas Vivo Móvel como PÁGINAS:NOTAS")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args(argv)
+
+    manifest = build_corpus(args.pasta, args.faturas, args.boletos, args.vivo, args.seed, args.arrecadacao)
+    pages = sum(doc["paginas"] for doc in manifest["documentos"])
+    print(f"{len(manifest['documentos'])} documentos, {pages} páginas em {args.pasta}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,238 @@
+#load_sap.py
+"""Gerador de carga para o envio ao SAP: reenvia payloads a uma taxa fixa usando o mesmo código
+de envio do aplicativo (SubmissionWorker/ChunkedSubmissionWorker, sessão compartilhada,
+controle de concorrência e disjuntor) e mede vazão e percentis de latência.
+
+Os payloads são sintéticos ou lidos do histórico (cada reenvio ganha CR_NUMBER/TOPDESK_KEY novos).
+Sem --url, um servidor simulado (benchmarks.sap_stub) é iniciado no próprio processo com as
+opções de latência e erros dele.
+
+Uso (a partir da raiz do projeto):
+    python -m benchmarks.load_sap --taxa 5 --requisicoes 200 --taxa-erro 0.1
+    python -m benchmarks.load_sap --url http://127.0.0.1:8089/RESTAdapter/webshop --historico
+"""
+import argparse
+import datetime
+import json
+import random
+import statistics
+import sys
+import threading
+import time
+
+from benchmarks import sap_stub
+from history_store import HistoryStore
+from line_items import LineItem, renumber
+from sap_client import ChunkedSubmissionWorker, SubmissionWorker, close_session, new_request_ids, split_payload
+from sap_controller import CircuitOpenError, get_controller
+from tracing import percentile, get_tracer
+
+MATERIALS = ["1000000000", "1000000001", "2000000015", "3000000042"]
+
+# Payload no formato montado por SAPIntegrationDialog.build_payload
+def synthetic_payload(rng, item_count):
+    items = [
+        LineItem(rng.choice(MATERIALS), f"FORNECEDOR {rng.randint(1, 40):03d} NF {rng.randint(1000, 99999)}",
+                 f"{rng.randint(100, 500000) / 100:.2f}")
+        for _ in range(item_count)
+    ]
+    renumber(items)
+    topdesk_key, cr_number = new_request_ids()
+    return {
+        "ZSBR_MM_AZU_WEBSHOP_PREQ": {
+            "I_WEBSHOP": {
+                "TOPDESK_KEY": topdesk_key,
+                "CR_NUMBER": cr_number,
+                "REQUESTER": {"USER": topdesk_key, "NOME": "Teste de Carga", "EMAIL": "teste@example.com"},
+                "TEXT_LINE": "Teste de carga",
+                "DELIV_DATE": "01 Janeiro 2030",
+                "ACCTASSCAT": "K",
+                "COST_CENTER": "2201000000",
+                "ORDER": "",
+                "PLANT": "2201",
+                "CONTA_RAZAO": "4000000000",
+                "ITEMS": [item.to_sap() for item in items],
+            }
+        }
+    }
+
+# Últimos `limit` payloads do histórico
+def history_payloads(path, limit):
+    store = HistoryStore(path)
+    payloads = []
+    for row in store.page(0, limit):
+        payload, _ = store.details(row[0])
+        if payload:
+            payloads.append(payload)
+    return payloads
+
+# Cópia do payload com identificadores novos (o SAP recusa CR_NUMBER repetido)
+def with_new_ids(payload):
+    payload = json.loads(json.dumps(payload))
+    webshop = payload["ZSBR_MM_AZU_WEBSHOP_PREQ"]["I_WEBSHOP"]
+    webshop["TOPDESK_KEY"], webshop["CR_NUMBER"] = new_request_ids()
+    return payload
+
+def _outcome_label(response, error):
+    if response is not None:
+        return str(response.status_code)
+    if isinstance(error, CircuitOpenError):
+        return "circuito_aberto"
+    return f"erro:{type(error).__name__}"
+
+class LoadRun:
+    """Envia os payloads em ritmo constante (laço aberto: não espera as respostas) e coleta os resultados"""
+
+    def __init__(self, url, auth, timeout=30, chunk_size=None, max_workers=4):
+        self.url = url
+        self.auth = auth
+        self.timeout = timeout
+        self.chunk_size = chunk_size
+        self.max_workers = max_workers
+        self.lock = threading.Lock()
+        self.latencies = []  # (segundos, sucesso)
+        self.outcomes = {}
+        self.waiters = []
+
+    def _record(self, latency, labels):
+        with self.lock:
+            self.latencies.append((latency, all(label == "200" for label in labels)))
+            for label in labels:
+                self.outcomes[label] = self.outcomes.get(label, 0) + 1
+
+    # Espera o resultado de um worker (como o poll_submission da interface, mas bloqueando)
+    def _wait(self, worker, start):
+        while True:
+            kind, value = worker.events.get()
+            if kind in ("progress", "chunk"):
+                continue
+            latency = time.perf_counter() - start
+            if kind == "error":
+                labels = [_outcome_label(None, value)]
+            elif isinstance(worker, ChunkedSubmissionWorker):
+                labels = [_outcome_label(result.response, result.error) for result in value]
+            else:
+                labels = [_outcome_label(value, None)]
+            self._record(latency, labels)
+            return
+
+    def submit(self, payload):
+        if self.chunk_size:
+            chunks = list(enumerate(split_payload(payload, self.chunk_size)))
+            worker = ChunkedSubmissionWorker(self.url, chunks, self.auth, self.timeout, self.max_workers)
+        else:
+            worker = SubmissionWorker(self.url, payload, self.auth, self.timeout)
+        start = time.perf_counter()
+        worker.start()
+        waiter = threading.Thread(target=self._wait, args=(worker, start), daemon=True)
+        waiter.start()
+        self.waiters.append(waiter)
+
+    def run(self, payloads, rate, count, log=print):
+        start = time.perf_counter()
+        behind = 0
+        for i in range(count):
+            target = start + i / rate
+            delay = target - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            elif delay < -0.05:
+                behind += 1
+            self.submit(with_new_ids(payloads[i % len(payloads)]))
+            if (i + 1) % max(1, int(rate) * 5) == 0:
+                log(f"{i + 1}/{count} enviadas; {get_controller().format_stats()}")
+        sending_time = time.perf_counter() - start
+        for waiter in self.waiters:
+            waiter.join()
+        return sending_time, time.perf_counter() - start, behind
+
+    def report(self, sending_time, total_time, behind):
+        latencies = sorted(latency * 1000 for latency, _ in self.latencies)
+        ok_latencies = sorted(latency * 1000 for latency, ok in self.latencies if ok)
+        report = {
+            "envios": len(self.latencies),
+            "sucessos": len(ok_latencies),
+            "respostas_por_status": dict(sorted(self.outcomes.items())),
+            "tempo_envio_s": round(sending_time, 3),
+            "tempo_total_s": round(total_time, 3),
+            "taxa_obtida_por_s": round(len(self.latencies) / sending_time, 2) if sending_time else None,
+            "vazao_por_s": round(len(self.latencies) / total_time, 2) if total_time else None,
+            "vazao_sucessos_por_s": round(len(ok_latencies) / total_time, 2) if total_time else None,
+            "envios_atrasados": behind,
+            "controle": get_controller().stats(),
+        }
+        for name, values in (("latencia_ms", latencies), ("latencia_sucessos_ms", ok_latencies)):
+            if values:
+                report[name] = {
+                    "p50": round(percentile(values, 0.50), 1),
+                    "p90": round(percentile(values, 0.90), 1),
+                    "p95": round(percentile(values, 0.95), 1),
+                    "p99": round(percentile(values, 0.99), 1),
+                    "max": round(values[-1], 1),
+                    "media": round(statistics.fmean(values), 1),
+                }
+        return report
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--url", help="Endpoint (padrão: servidor simulado iniciado neste processo)")
+    parser.add_argument("--usuario", default="teste")
+    parser.add_argument("--senha", default="teste")
+    parser.add_argument("--taxa", type=float, default=2.0, help="Envios por segundo (padrão 2)")
+    parser.add_argument("--requisicoes", type=int, default=50, help="Quantidade de envios (padrão 50)")
+    parser.add_argument("--itens", type=int, default=20, help="Itens por payload sintético (padrão 20)")
+    parser.add_argument("--historico", nargs="?", const="", default=None,
+                        help="Reenvia os payloads do histórico (opcionalmente o caminho do banco)")
+    parser.add_argument("--limite-historico", type=int, default=100)
+    parser.add_argument("--lote", type=int, help="Envia cada payload em lotes deste tamanho")
+    parser.add_argument("--paralelos", type=int, default=4, help="Lotes simultâneos por envio (com --lote)")
+    parser.add_argument("--timeout", type=float, default=30)
+    parser.add_argument("--saida", help="Grava o relatório em JSON")
+    sap_stub.add_arguments(parser)
+    args = parser.parse_args(argv)
+
+    get_tracer().path = None
+    server = None
+    url = args.url
+    if not url:
+        server = sap_stub.start_in_thread(sap_stub.state_from_args(args))
+        url = server.url
+        print(f"Servidor simulado em {url}")
+    auth = (args.usuario, args.senha)
+    if args.credenciais:
+        credentials = sap_stub.load_credentials(args.credenciais)
+        auth = (credentials["usuario"], credentials["senha"])
+
+    if args.historico is not None:
+        payloads = history_payloads(args.historico or None, args.limite_historico)
+        if not payloads:
+            print("Nenhum payload no histórico", file=sys.stderr)
+            sys.exit(1)
+    else:
+        rng = random.Random(args.seed)
+        payloads = [synthetic_payload(rng, args.itens) for _ in range(min(args.requisicoes, 50))]
+    print(f"{args.requisicoes} envios a {args.taxa}/s com {len(payloads)} payload(s) distintos")
+
+    load = LoadRun(url, auth, args.timeout, args.lote, args.paralelos)
+    try:
+        report = load.report(*load.run(payloads, args.taxa, args.requisicoes))
+    finally:
+        close_session()
+        if server is not None:
+            server.shutdown()
+            server.server_close()
+    report.update({
+        "data": datetime.datetime.now().isoformat(timespec="seconds"),
+        "url": url,
+        "taxa_alvo_por_s": args.taxa,
+        "lote": args.lote,
+    })
+    if server is not None:
+        report["servidor"] = dict(sorted(server.state.counters.items()))
+    print(json.dumps(report, ensure_ascii=False, indent=2, default=str))
+    if args.saida:
+        with open(args.saida, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2, default=str)
+
+if __name__ == "__main__":
+    main()
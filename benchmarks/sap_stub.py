@@ -0,0 +1,249 @@
+#sap_stub.py
+"""Servidor HTTP local que imita o serviço ZSBR_MM_AZU_WEBSHOP_PREQ do SAP, para testes de carga
+sem tocar no SAP real.
+
+- Autenticação básica conferida com um arquivo no formato do credenciais.json
+  ({"usuario": ..., "senha": ...}); sem arquivo, aceita qualquer usuário.
+- O payload é validado como o aplicativo o monta (I_WEBSHOP com CR_NUMBER, TOPDESK_KEY e ITEMS com
+  PREQ_ITEM/MATERIAL/SHORT_TEXT/QUANTITY/PREQ_PRICE); CR_NUMBER repetido é recusado (409).
+- Latência por distribuição ("fixa:200", "uniforme:100:400", "lognormal:300:0.5",
+  "exponencial:250", em ms) mais um custo por item, taxa de erros 500/503 e taxa de timeouts (a
+  resposta só sai depois de --espera-timeout segundos).
+
+Uso (a partir da raiz do projeto):
+    python -m benchmarks.sap_stub --porta 8089 --latencia lognormal:300:0.5 --taxa-erro 0.05
+e no parametros.json: "URL_API": "http://127.0.0.1:8089/RESTAdapter/webshop"
+"""
+import argparse
+import base64
+import json
+import math
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from line_items import Money
+
+ITEM_FIELDS = ("PREQ_ITEM", "MATERIAL", "SHORT_TEXT", "QUANTITY", "PREQ_PRICE")
+HEADER_FIELDS = ("TOPDESK_KEY", "CR_NUMBER", "REQUESTER", "ITEMS")
+
+def parse_latency(text):
+    """"tipo:parâmetros" (ms) -> função sem argumentos que sorteia uma latência em segundos"""
+    kind, _, rest = text.partition(":")
+    try:
+        args = [float(value) for value in rest.split(":")] if rest else []
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"Latência inválida: {text!r}") from None
+    rng = random.Random()
+    distributions = {
+        # fixa:MS
+        "fixa": (1, lambda ms: ms),
+        # uniforme:MIN:MAX
+        "uniforme": (2, lambda low, high: rng.uniform(low, high)),
+        # lognormal:MEDIANA:SIGMA
+        "lognormal": (2, lambda median, sigma: rng.lognormvariate(math.log(median), sigma)),
+        # exponencial:MÉDIA
+        "exponencial": (1, lambda mean: rng.expovariate(1 / mean)),
+    }
+    if kind not in distributions or len(args) != distributions[kind][0]:
+        raise argparse.ArgumentTypeError(
+            f"Latência inválida: {text!r} (use fixa:MS, uniforme:MIN:MAX, lognormal:MEDIANA:SIGMA ou exponencial:MÉDIA)"
+        )
+    draw = distributions[kind][1]
+    return lambda: max(0.0, draw(*args)) / 1000
+
+# Erros de formato do payload (lista vazia se estiver correto)
+def validate_payload(payload):
+    errors = []
+    webshop = payload.get("ZSBR_MM_AZU_WEBSHOP_PREQ", {}).get("I_WEBSHOP") if isinstance(payload, dict) else None
+    if not isinstance(webshop, dict):
+        return ["ZSBR_MM_AZU_WEBSHOP_PREQ.I_WEBSHOP ausente"]
+    errors += [f"Campo {field} ausente" for field in HEADER_FIELDS if not webshop.get(field)]
+    items = webshop.get("ITEMS") or []
+    if not isinstance(items, list):
+        return errors + ["ITEMS deve ser uma lista"]
+    for position, item in enumerate(items, 1):
+        missing = [field for field in ITEM_FIELDS if field not in item]
+        if missing:
+            errors.append(f"Item {position}: campos ausentes {', '.join(missing)}")
+            continue
+        try:
+            Money.parse(item["PREQ_PRICE"])
+        except ValueError:
+            errors.append(f"Item {position}: PREQ_PRICE inválido {item['PREQ_PRICE']!r}")
+    return errors
+
+class StubState:
+    """Configuração e contadores do servidor (compartilhados pelas threads das requisições)"""
+
+    def __init__(self, credentials=None, latency=None, per_item_ms=0.0, error_rate=0.0,
+                 timeout_rate=0.0, timeout_seconds=60.0, seed=None):
+        self.credentials = credentials
+        self.latency = latency or (lambda: 0.0)
+        self.per_item_ms = per_item_ms
+        self.error_rate = error_rate
+        self.timeout_rate = timeout_rate
+        self.timeout_seconds = timeout_seconds
+        self.rng = random.Random(seed)
+        self.lock = threading.Lock()
+        self.cr_numbers = set()
+        self.counters = {}
+        self.next_preq_no = 10000000
+
+    def count(self, status):
+        with self.lock:
+            self.counters[status] = self.counters.get(status, 0) + 1
+
+    def draw(self):
+        with self.lock:
+            return self.rng.random()
+
+class StubHandler(BaseHTTPRequestHandler):
+    server_version = "SAPStub/1.0"
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        # Sem uma linha por requisição no terminal: o resumo sai ao encerrar
+        pass
+
+    @property
+    def state(self):
+        return self.server.state
+
+    def _reply(self, status, body):
+        data = json.dumps(body, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(data)))
+        if status == 401:
+            self.send_header("WWW-Authenticate", 'Basic realm="SAP PI"')
+        self.end_headers()
+        self.wfile.write(data)
+        self.state.count(status)
+
+    def _error(self, status, message):
+        self._reply(status, {"E_RETURN": {"TYPE": "E", "MESSAGE": message}})
+
+    def _authorized(self):
+        if not self.state.credentials:
+            return True
+        header = self.headers.get("Authorization", "")
+        if not header.startswith("Basic "):
+            return False
+        try:
+            user, _, password = base64.b64decode(header[6:]).decode("utf-8").partition(":")
+        except (ValueError, UnicodeDecodeError):
+            return False
+        return (user, password) == (self.state.credentials.get("usuario"), self.state.credentials.get("senha"))
+
+    def do_POST(self):
+        state = self.state
+        length = int(self.headers.get("Content-Length") or 0)
+        body = self.rfile.read(length)
+        if not self._authorized():
+            self._error(401, "Usuário ou senha inválidos")
+            return
+        try:
+            payload = json.loads(body.decode("utf-8"))
+        except (ValueError, UnicodeDecodeError):
+            self._error(400, "JSON inválido")
+            return
+        errors = validate_payload(payload)
+        if errors:
+            self._error(400, "; ".join(errors))
+            return
+
+        webshop = payload["ZSBR_MM_AZU_WEBSHOP_PREQ"]["I_WEBSHOP"]
+        time.sleep(state.latency() + state.per_item_ms * len(webshop["ITEMS"]) / 1000)
+        draw = state.draw()
+        if draw < state.timeout_rate:
+            # O cliente desiste antes (timeout); a requisição não é registrada
+            time.sleep(state.timeout_seconds)
+            self._error(504, "Tempo limite do adaptador excedido")
+            return
+        if draw < state.timeout_rate + state.error_rate:
+            if state.draw() < 0.5:
+                self._error(503, "Serviço temporariamente indisponível")
+            else:
+                self._error(500, "Erro interno ao criar a requisição de compra")
+            return
+
+        with state.lock:
+            if webshop["CR_NUMBER"] in state.cr_numbers:
+                duplicate = True
+            else:
+                duplicate = False
+                state.cr_numbers.add(webshop["CR_NUMBER"])
+                state.next_preq_no += 1
+                preq_no = f"00{state.next_preq_no}"
+        if duplicate:
+            self._error(409, f"{webshop['CR_NUMBER']} já foi processado")
+            return
+        self._reply(200, {"E_RETURN": {
+            "TYPE": "S",
+            "MESSAGE": f"Requisição de compra {preq_no} criada com {len(webshop['ITEMS'])} item(ns)",
+            "PREQ_NO": preq_no,
+            "CR_NUMBER": webshop["CR_NUMBER"],
+            "TOPDESK_KEY": webshop["TOPDESK_KEY"],
+        }})
+
+class StubServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, state):
+        super().__init__(address, StubHandler)
+        self.state = state
+
+    @property
+    def url(self):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}/RESTAdapter/webshop"
+
+# Inicia o servidor em uma thread; devolve o StubServer (encerrar com server.shutdown())
+def start_in_thread(state, host="127.0.0.1", port=0):
+    server = StubServer((host, port), state)
+    threading.Thread(target=server.serve_forever, daemon=True, name="sap-stub").start()
+    return server
+
+def load_credentials(path):
+    if not path:
+        return None
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+def add_arguments(parser):
+    """Opções do servidor (também usadas pelo gerador de carga com --servidor-local)"""
+    parser.add_argument("--credenciais", help="Arquivo no formato do credenciais.json (sem ele, aceita qualquer usuário)")
+    parser.add_argument("--latencia", type=parse_latency, default=parse_latency("lognormal:300:0.5"),
+                        help="Distribuição da latência em ms (padrão lognormal:300:0.5)")
+    parser.add_argument("--ms-por-item", type=float, default=5.0, help="Latência adicional por item (padrão 5 ms)")
+    parser.add_argument("--taxa-erro", type=float, default=0.0, help="Fração de respostas 500/503")
+    parser.add_argument("--taxa-timeout", type=float, default=0.0, help="Fração de requisições que não respondem a tempo")
+    parser.add_argument("--espera-timeout", type=float, default=60.0,
+                        help="Segundos até responder uma requisição sorteada para timeout (padrão 60)")
+    parser.add_argument("--seed", type=int)
+
+def state_from_args(args):
+    return StubState(load_credentials(args.credenciais), args.latencia, args.ms_por_item,
+                     args.taxa_erro, args.taxa_timeout, args.espera_timeout, args.seed)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--porta", type=int, default=8089)
+    add_arguments(parser)
+    args = parser.parse_args(argv)
+
+    server = StubServer((args.host, args.porta), state_from_args(args))
+    print(f"Servidor do SAP simulado em {server.url} (Ctrl+C para encerrar)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        print(f"Respostas por status: {dict(sorted(server.state.counters.items()))}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,195 @@
+#boleto.py
+"""Decodificação da linha digitável e do código de barras dos boletos (padrão FEBRABAN).
+
+- Boleto bancário: linha digitável de 47 dígitos (3 campos com DV módulo 10, DV geral módulo 11,
+  fator de vencimento e valor) ou código de barras de 44 dígitos.
+- Arrecadação/convênio (contas de consumo, tributos): 48 dígitos em 4 blocos de 11 + DV, ou
+  código de barras de 44 dígitos começando por 8. O terceiro dígito diz se o valor é efetivo em
+  reais (6 ou 8) e se os DVs usam módulo 10 (6, 7) ou módulo 11 (8, 9).
+
+Só linhas com todos os DVs corretos são aceitas; nesse caso o valor é considerado confiável. Como
+os DVs sozinhos ainda deixam passar sequências de tabelas com muitos números, o boleto bancário
+também precisa ter moeda 9 (real) e, na linha digitável, os 5 campos no formato impresso padrão
+("AAAAA.AAAAA BBBBB.BBBBBB CCCCC.CCCCCC D FFFFVVVVVVVVVV"); o código de barras precisa ser uma
+sequência única de 44 dígitos.
+"""
+import datetime
+import re
+from collections import namedtuple
+
+from line_items import Money
+
+KIND_BANK = "bancario"
+KIND_COLLECTION = "arrecadacao"
+
+SOURCE_LINE = "linha digitável"
+SOURCE_BARCODE = "código de barras"
+
+# Data base do fator de vencimento; o fator 9999 (21/02/2025) é seguido pelo 1000 (22/02/2025)
+FACTOR_BASE_DATE = datetime.date(1997, 10, 7)
+FACTOR_CYCLE_DAYS = 9000
+
+# Boleto decodificado: tipo, origem (linha digitável ou código de barras), os 44 dígitos do
+# código de barras, valor em centavos (None se não for em reais), vencimento (None se não houver),
+# banco (bancário) ou segmento (arrecadação) e a posição no texto
+BoletoInfo = namedtuple("BoletoInfo", [
+    "kind", "source", "barcode", "amount_cents", "due_date", "issuer", "position",
+])
+
+# Sequências de dígitos com espaços/pontos/hífens que podem ser uma linha digitável ou um código de
+# barras (a arrecadação costuma ser impressa com o DV de cada bloco depois de um hífen)
+_CANDIDATE_RE = re.compile(r"(?<!\d)\d[\d \t\r\n.-]{42,70}\d(?!\d)")
+_NON_DIGIT_RE = re.compile(r"\D")
+# Linha digitável bancária no formato impresso (os pontos dos 3 primeiros campos são opcionais)
+_BANK_LINE_RE = re.compile(r"\d{5}\.?\d{5}\s+\d{5}\.?\d{6}\s+\d{5}\.?\d{6}\s+\d\s+\d{14}")
+
+def mod10(digits):
+    """DV módulo 10 (pesos 2 e 1 a partir da direita, somando os algarismos dos produtos)"""
+    total = 0
+    for i, digit in enumerate(reversed(digits)):
+        product = int(digit) * (2 if i % 2 == 0 else 1)
+        total += product // 10 + product % 10
+    return (10 - total % 10) % 10
+
+def _mod11_sum(digits):
+    return sum(int(digit) * (2 + i % 8) for i, digit in enumerate(reversed(digits)))
+
+def mod11_bank(digits):
+    """DV geral do código de barras bancário (0, 10 e 11 viram 1)"""
+    dv = 11 - _mod11_sum(digits) % 11
+    return 1 if dv in (0, 10, 11) else dv
+
+def mod11_collection(digits):
+    """DV módulo 11 da arrecadação (restos 0 e 1 viram 0, resto 10 vira 1)"""
+    remainder = _mod11_sum(digits) % 11
+    if remainder in (0, 1):
+        return 0
+    if remainder == 10:
+        return 1
+    return 11 - remainder
+
+def due_date_from_factor(factor, reference=None):
+    """Data do fator de vencimento (None para 0000). Depois de 9999 o fator recomeça em 1000, então
+    cada fator corresponde a uma data a cada 9000 dias; fica a mais próxima de `reference` (hoje)."""
+    if not factor:
+        return None
+    reference = reference or datetime.date.today()
+    first = FACTOR_BASE_DATE + datetime.timedelta(days=factor)
+    if factor < 1000:
+        return first
+    cycles = max(0, round((reference - first).days / FACTOR_CYCLE_DAYS))
+    return first + datetime.timedelta(days=cycles * FACTOR_CYCLE_DAYS)
+
+def _bank_info(barcode, source, position, reference):
+    # Código da moeda: 9 = real
+    if barcode[3] != "9" or barcode[4] != str(mod11_bank(barcode[:4] + barcode[5:])):
+        return None
+    return BoletoInfo(KIND_BANK, source, barcode, int(barcode[9:19]) or None,
+                      due_date_from_factor(int(barcode[5:9]), reference), barcode[:3], position)
+
+def _collection_info(barcode, source, position):
+    identifier = barcode[2]
+    if identifier not in "6789":
+        return None
+    check = mod10 if identifier in "67" else mod11_collection
+    if barcode[3] != str(check(barcode[:3] + barcode[4:])):
+        return None
+    # 7 e 9: valor em moeda de referência (índice), não em reais
+    amount = int(barcode[4:15]) if identifier in "68" else 0
+    return BoletoInfo(KIND_COLLECTION, source, barcode, amount or None, None, barcode[1], position)
+
+# Linha digitável do boleto bancário (47 dígitos) -> BoletoInfo ou None
+def decode_bank_line(digits, position=0, reference=None):
+    fields = ((digits[0:9], digits[9]), (digits[10:20], digits[20]), (digits[21:31], digits[31]))
+    if any(str(mod10(field)) != dv for field, dv in fields):
+        return None
+    barcode = digits[0:4] + digits[32] + digits[33:47] + digits[4:9] + digits[10:20] + digits[21:31]
+    return _bank_info(barcode, SOURCE_LINE, position, reference)
+
+# Linha digitável da arrecadação (48 dígitos) -> BoletoInfo ou None
+def decode_collection_line(digits, position=0):
+    if digits[0] != "8" or digits[2] not in "6789":
+        return None
+    check = mod10 if digits[2] in "67" else mod11_collection
+    blocks = [digits[i:i + 11] for i in range(0, 48, 12)]
+    if any(str(check(block)) != digits[i + 11] for block, i in zip(blocks, range(0, 48, 12))):
+        return None
+    return _collection_info("".join(blocks), SOURCE_LINE, position)
+
+# Código de barras de 44 dígitos -> BoletoInfo ou None
+def decode_barcode(digits, position=0, reference=None):
+    if digits[0] == "8":
+        return _collection_info(digits, SOURCE_BARCODE, position)
+    return _bank_info(digits, SOURCE_BARCODE, position, reference)
+
+def decode(digits, position=0, reference=None):
+    """Decodifica 44, 47 ou 48 dígitos; devolve BoletoInfo só se todos os DVs conferirem"""
+    if len(digits) == 47:
+        return decode_bank_line(digits, position, reference)
+    if len(digits) == 48:
+        return decode_collection_line(digits, position)
+    if len(digits) == 44:
+        return decode_barcode(digits, position, reference)
+    return None
+
+# Grupos de dígitos ("23790.12345", "83640000001-1"...) de uma sequência candidata
+_GROUP_RE = re.compile(r"[\d.-]+")
+
+def _windows(text):
+    """Gera (dígitos, posição, texto impresso) das janelas de grupos consecutivos com 47 ou 48 dígitos
+    e dos grupos isolados de 44 dígitos (código de barras). A sequência encontrada pela expressão
+    pode ter números vizinhos colados (ex.: a data da linha seguinte), por isso as janelas."""
+    for match in _CANDIDATE_RE.finditer(text):
+        groups = [
+            (_NON_DIGIT_RE.sub("", group.group()), match.start() + group.start(), match.start() + group.end())
+            for group in _GROUP_RE.finditer(match.group())
+        ]
+        for i, (digits, position, end) in enumerate(groups):
+            if len(digits) == 44:
+                yield digits, position, text[position:end]
+            accumulated = ""
+            for j in range(i, len(groups)):
+                accumulated += groups[j][0]
+                if len(accumulated) in (47, 48):
+                    yield accumulated, position, text[position:groups[j][2]]
+                if len(accumulated) >= 48:
+                    break
+
+# A linha bancária e o código de barras precisam estar no formato impresso padrão
+def _printed_as_standard(digits, printed):
+    if len(digits) == 47:
+        return _BANK_LINE_RE.fullmatch(printed) is not None
+    if len(digits) == 44:
+        return printed.isdigit()
+    return True
+
+def iter_linhas_digitaveis(text):
+    """Dígitos das sequências com o tamanho de uma linha digitável (47 ou 48), sem validar os DVs"""
+    for digits, _, _ in _windows(text):
+        if len(digits) in (47, 48):
+            yield digits
+
+def find_boletos(text, reference=None):
+    """Boletos válidos do texto, na ordem em que aparecem (sem repetir o mesmo código de barras)"""
+    found = []
+    seen = set()
+    for digits, position, printed in _windows(text):
+        if not _printed_as_standard(digits, printed):
+            continue
+        info = decode(digits, position, reference)
+        if info is not None and info.barcode not in seen:
+            seen.add(info.barcode)
+            found.append(info)
+    return found
+
+def describe(info):
+    """Descrição curta para o log ("boleto bancário, banco 341, vencimento 19/10/2025")"""
+    if info.kind == KIND_BANK:
+        parts = [f"boleto bancário ({info.source})", f"banco {info.issuer}"]
+        if info.due_date:
+            parts.append(f"vencimento {info.due_date:%d/%m/%Y}")
+    else:
+        parts = [f"arrecadação ({info.source})", f"segmento {info.issuer}"]
+    if info.amount_cents:
+        parts.append(f"R$ {Money(info.amount_cents)}")
+    return ", ".join(parts)
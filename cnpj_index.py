@@ -0,0 +1,48 @@
+#cnpj_index.py
+import re
+from collections import namedtuple
+from pdf_reader import standardize_cnpj
+
+# CNPJ formatado (02.558.157/0001-62) ou só com os 14 dígitos, sem fazer parte de um número maior
+_CNPJ_RE = re.compile(r"(?<!\d)(?:\d{2}\.\d{3}\.\d{3}/\d{4}-\d{2}|\d{14})(?!\d)")
+
+# Fornecedor encontrado no texto: chave do fornecedores.json, código SAP, ocorrências e posição da primeira
+SupplierMatch = namedtuple("SupplierMatch", ["cnpj", "code", "count", "position"])
+
+# Detecta fornecedores conhecidos pelos CNPJs impressos no PDF
+class CnpjIndex:
+    """O texto é varrido uma única vez por uma expressão que só reconhece a forma de um CNPJ, e
+    cada ocorrência é procurada em um dicionário indexado pelos 14 dígitos. O custo cresce com o
+    tamanho do texto e não com o número de fornecedores cadastrados, o mesmo que um autômato de
+    Aho-Corasick daria sem ter que montar um autômato com todos os CNPJs."""
+
+    def __init__(self, supplier_data, extra_mapping=None):
+        # dígitos -> (chave como está no fornecedores.json, código SAP)
+        self.suppliers = {}
+        for cnpj, code in supplier_data.items():
+            self.suppliers[standardize_cnpj(cnpj)] = (cnpj, code)
+        # O fornecedores.json tem prioridade sobre o mapeamento fixo
+        for cnpj, code in (extra_mapping or {}).items():
+            self.suppliers.setdefault(standardize_cnpj(cnpj), (cnpj, code))
+
+    def __len__(self):
+        return len(self.suppliers)
+
+    def entries(self):
+        """Pares (CNPJ, código SAP) de todos os fornecedores conhecidos, os do fornecedores.json primeiro"""
+        return list(self.suppliers.values())
+
+    def detect(self, text):
+        """Devolve os fornecedores encontrados (um por código SAP), na ordem em que aparecem"""
+        matches = {}
+        for match in _CNPJ_RE.finditer(text):
+            supplier = self.suppliers.get(standardize_cnpj(match.group()))
+            if supplier is None:
+                continue
+            cnpj, code = supplier
+            found = matches.get(code)
+            if found is None:
+                matches[code] = SupplierMatch(cnpj, code, 1, match.start())
+            else:
+                matches[code] = found._replace(count=found.count + 1)
+        return list(matches.values())
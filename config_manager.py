@@ -1,41 +1,157 @@
 import os
 import json
-from tkinter import messagebox
+import pickle
+import sys
+import threading
 
 class ConfigManager:
+    """Os arquivos de configuração ficam em um cache compartilhado pelo processo inteiro: cada
+    arquivo só é lido de novo quando a data de modificação ou o tamanho mudam. Os dados devolvidos
+    são compartilhados entre todas as janelas e não devem ser alterados.
+
+    Uma cópia do cache (sem as credenciais) é gravada em SNAPSHOT_FILE (pickle), o que evita
+    decodificar catálogos grandes a cada abertura do aplicativo. A cópia só é usada para arquivos
+    que não mudaram.
+    """
     CONFIG_DIR = "config_files"
-    
-    @staticmethod
-    def load_json_file(filename):
-        """Carrega um arquivo JSON da pasta config_files"""
+    SNAPSHOT_FILE = os.path.join("cache", "config_snapshot.pickle")  # None desativa a cópia
+    SNAPSHOT_VERSION = 1
+    SNAPSHOT_EXCLUDE = frozenset({"credenciais.json"})  # Senhas não são copiadas para o cache
+
+    # Sem interface gráfica (ex.: batch_extract) os erros vão para o stderr em vez de um messagebox
+    headless = False
+
+    _cache = {}  # caminho -> (mtime_ns, tamanho, dados)
+    _snapshot_loaded = False
+    _lock = threading.RLock()
+
+    @classmethod
+    def report_error(cls, message):
+        if not cls.headless:
+            try:
+                from tkinter import messagebox, TclError
+                try:
+                    messagebox.showerror("Erro", message)
+                    return
+                except TclError:
+                    pass
+            except ImportError:
+                pass
+        print(f"Erro: {message}", file=sys.stderr)
+
+    # Carrega a cópia gravada em disco (uma vez por processo)
+    @classmethod
+    def _load_snapshot(cls):
+        cls._snapshot_loaded = True
+        if not cls.SNAPSHOT_FILE:
+            return
+        try:
+            with open(cls.SNAPSHOT_FILE, 'rb') as f:
+                snapshot = pickle.load(f)
+        except (OSError, pickle.PickleError, EOFError, AttributeError, ValueError):
+            return
+        if isinstance(snapshot, dict) and snapshot.get("versao") == cls.SNAPSHOT_VERSION:
+            for path, entry in snapshot.get("arquivos", {}).items():
+                cls._cache.setdefault(path, entry)
+
+    @classmethod
+    def _save_snapshot(cls):
+        if not cls.SNAPSHOT_FILE:
+            return
         try:
-            filepath = os.path.join(ConfigManager.CONFIG_DIR, filename)
-            with open(filepath, 'r', encoding='utf-8') as f:
-                return json.load(f)
-        except FileNotFoundError:
-            messagebox.showerror("Erro", f"Arquivo não encontrado: {filename}")
-            return {}
-        except json.JSONDecodeError:
-            messagebox.showerror("Erro", f"Erro ao decodificar: {filename}")
-            return {}
-    
+            directory = os.path.dirname(cls.SNAPSHOT_FILE)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            temp_path = f"{cls.SNAPSHOT_FILE}.{os.getpid()}.tmp"
+            files = {
+                path: entry for path, entry in cls._cache.items()
+                if os.path.basename(path) not in cls.SNAPSHOT_EXCLUDE
+            }
+            with open(temp_path, 'wb') as f:
+                pickle.dump({"versao": cls.SNAPSHOT_VERSION, "arquivos": files}, f,
+                            protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(temp_path, cls.SNAPSHOT_FILE)
+        except OSError:
+            # A cópia é só uma otimização
+            pass
+
+    # Devolve (dados, relido): relido indica que o arquivo foi decodificado de novo
+    @classmethod
+    def _load(cls, filename, config_dir=None):
+        filepath = os.path.join(config_dir or cls.CONFIG_DIR, filename)
+        with cls._lock:
+            if not cls._snapshot_loaded:
+                cls._load_snapshot()
+            try:
+                stat = os.stat(filepath)
+            except FileNotFoundError:
+                cls._cache.pop(filepath, None)
+                cls.report_error(f"Arquivo não encontrado: {filename}")
+                return {}, False
+
+            cached = cls._cache.get(filepath)
+            if cached and cached[0] == stat.st_mtime_ns and cached[1] == stat.st_size:
+                return cached[2], False
+
+            try:
+                with open(filepath, 'r', encoding='utf-8') as f:
+                    data = json.load(f)
+            except FileNotFoundError:
+                cls.report_error(f"Arquivo não encontrado: {filename}")
+                return {}, False
+            except json.JSONDecodeError:
+                cls.report_error(f"Erro ao decodificar: {filename}")
+                return {}, False
+            cls._cache[filepath] = (stat.st_mtime_ns, stat.st_size, data)
+            return data, True
+
+    @classmethod
+    def load_json_file(cls, filename, config_dir=None):
+        """Carrega um arquivo JSON da pasta config_files (do cache, se não mudou)"""
+        with cls._lock:
+            data, reloaded = cls._load(filename, config_dir)
+            if reloaded:
+                cls._save_snapshot()
+            return data
+
+    @classmethod
+    def load_optional_json_file(cls, filename, default=None, config_dir=None):
+        """Como load_json_file, mas um arquivo inexistente não é erro: devolve `default`"""
+        filepath = os.path.join(config_dir or cls.CONFIG_DIR, filename)
+        with cls._lock:
+            if not os.path.exists(filepath):
+                cls._cache.pop(filepath, None)
+                return default
+            data, reloaded = cls._load(filename, config_dir)
+            if reloaded:
+                cls._save_snapshot()
+            return data
+
     @classmethod
     def load_all_configs(cls):
         """Carrega todas as configurações necessárias"""
-        return {
-            'parametros': cls.load_json_file('parametros.json'),
-            'credenciais': cls.load_json_file('credenciais.json'),
-            'centros_contas': cls.load_json_file('centros_contas.json'),
-            'fornecedores': cls.load_json_file('fornecedores.json'),
-            'codigos_materiais': cls.load_json_file('codigos_materiais.json')
-        }
-    
+        with cls._lock:
+            configs = {}
+            changed = False
+            for key in ('parametros', 'credenciais', 'centros_contas', 'fornecedores', 'codigos_materiais'):
+                configs[key], reloaded = cls._load(f"{key}.json")
+                changed = changed or reloaded
+            if changed:
+                cls._save_snapshot()
+            return configs
+
+    @classmethod
+    def clear_cache(cls):
+        """Esquece os arquivos já carregados (a próxima leitura decodifica tudo de novo)"""
+        with cls._lock:
+            cls._cache = {}
+
     @classmethod
     def get_supplier_data(cls):
         """Carrega e processa dados dos fornecedores"""
         return cls.load_json_file('fornecedores.json')
-    
+
     @classmethod
     def get_material_codes(cls):
         """Carrega e retorna os códigos de materiais e serviços"""
-        return cls.load_json_file('codigos_materiais.json')
\ No newline at end of file
+        return cls.load_json_file('codigos_materiais.json')
@@ -0,0 +1,287 @@
+#document_loader.py
+import os
+import re
+from collections import namedtuple
+
+import fitz
+
+from boleto import describe, iter_linhas_digitaveis
+from extraction_cache import read_pdf
+from extraction_templates import TEMPLATES_FILE, TemplateRegistry
+from line_items import Money
+from pdf_reader import (
+    DocumentModel, EXTRACTOR_VERSION, _extract_values_from_model, _extract_values_streaming,
+    _parse_vivo_movel, extract_boleto_value, extract_linha_digitavel_value, extract_total_value,
+    extract_values_by_position, find_all_monetary_values, first_boleto_with_amount, standardize_cnpj, VALUE_STRATEGIES,
+)
+from tracing import span
+from value_scoring import ScoredValue, score_values
+
+# Layouts reconhecidos
+LAYOUT_VIVO_MOVEL = "vivo_movel"   # fatura composta da Vivo Móvel (várias notas fiscais)
+LAYOUT_BOLETO = "boleto"           # boleto bancário / ficha de compensação
+LAYOUT_NFSE = "nfse"               # nota fiscal de serviços eletrônica
+LAYOUT_TELECOM = "telecom"         # fatura de operadora de telecomunicações
+LAYOUT_GENERIC = "generico"
+
+LAYOUT_NAMES = {
+    LAYOUT_VIVO_MOVEL: "Fatura Vivo Móvel",
+    LAYOUT_BOLETO: "Boleto",
+    LAYOUT_NFSE: "NFS-e",
+    LAYOUT_TELECOM: "Fatura de telecom",
+    LAYOUT_GENERIC: "Genérico",
+}
+
+# Raiz do CNPJ (8 primeiros dígitos) das operadoras
+VIVO_CNPJ_ROOT = "02558157"
+TELECOM_CNPJ_ROOTS = {
+    VIVO_CNPJ_ROOT: "Telefônica Brasil (Vivo)",
+    "40432544": "Claro",
+    "02421421": "TIM",
+    "76535764": "Oi",
+    "33530486": "Embratel",
+}
+
+# Estratégias de valor por layout; o que não for encontrado cai na cadeia genérica completa
+LAYOUT_STRATEGIES = {
+    LAYOUT_BOLETO: (extract_linha_digitavel_value, extract_boleto_value, extract_total_value),
+    LAYOUT_NFSE: (extract_total_value, extract_values_by_position),
+    LAYOUT_TELECOM: (extract_total_value, find_all_monetary_values),
+    LAYOUT_GENERIC: VALUE_STRATEGIES,
+}
+
+_CNPJ_ROOT_RE = re.compile(r"(?<!\d)(\d{2})\.?(\d{3})\.?(\d{3})/?\d{4}-?\d{2}(?!\d)")
+_BOLETO_MARKERS = ("FICHA DE COMPENSAÇÃO", "LINHA DIGITÁVEL", "CEDENTE", "BENEFICIÁRIO", "NOSSO NÚMERO")
+_NFSE_MARKERS = ("NFS-E", "NOTA FISCAL DE SERVIÇOS ELETRÔNICA", "NOTA FISCAL ELETRÔNICA DE SERVIÇOS")
+_TELECOM_MARKERS = ("TOTAL VOGEL", "LÍQUIDO FATURA", "TELECOMUNICAÇÕES")
+_VIVO_MOVEL_MARKERS = ("Nº da Conta:", "Mês de referência:")
+
+Layout = namedtuple("Layout", ["name", "reasons"])
+
+# Raízes de CNPJ presentes no texto
+def _cnpj_roots(text):
+    return {"".join(match.groups()) for match in _CNPJ_ROOT_RE.finditer(text)}
+
+# CNPJs completos (14 dígitos) presentes no texto
+def _cnpjs(text):
+    return {standardize_cnpj(match.group()) for match in _CNPJ_ROOT_RE.finditer(text)}
+
+# Verifica se há uma sequência com os 47 ou 48 dígitos de uma linha digitável
+def _has_linha_digitavel(text):
+    return next(iter_linhas_digitaveis(text), None) is not None
+
+# Classifica o documento pela primeira página, pelos metadados e pela raiz do CNPJ
+def classify_layout(model, metadata=None, filename=""):
+    """Devolve Layout(nome, motivos); lê só a primeira página do modelo"""
+    if not len(model):
+        return Layout(LAYOUT_GENERIC, ["documento vazio"])
+    first_page = model.page(0).text
+    upper = first_page.upper()
+    metadata = metadata or {}
+    # Produtor, título e assunto do PDF entram na busca pelas palavras-chave
+    meta_text = " ".join(str(metadata.get(key) or "") for key in ("producer", "creator", "title", "subject")).upper()
+    roots = _cnpj_roots(first_page)
+
+    if VIVO_CNPJ_ROOT in roots:
+        markers = [marker for marker in _VIVO_MOVEL_MARKERS if marker in first_page]
+        name = os.path.basename(filename).upper()
+        if len(markers) == len(_VIVO_MOVEL_MARKERS):
+            return Layout(LAYOUT_VIVO_MOVEL, ["CNPJ da Telefônica", *markers])
+        # O nome do arquivo só desempata quando a primeira página não traz todos os marcadores
+        if markers and "VIVO" in name and "MOVEL" in name:
+            return Layout(LAYOUT_VIVO_MOVEL, ["CNPJ da Telefônica", *markers, "nome do arquivo"])
+
+    boleto_markers = [marker for marker in _BOLETO_MARKERS if marker in upper or marker in meta_text]
+    if boleto_markers and _has_linha_digitavel(first_page):
+        return Layout(LAYOUT_BOLETO, ["linha digitável", *boleto_markers])
+
+    nfse_markers = [marker for marker in _NFSE_MARKERS if marker in upper or marker in meta_text]
+    if nfse_markers:
+        return Layout(LAYOUT_NFSE, nfse_markers)
+
+    telecom_roots = [TELECOM_CNPJ_ROOTS[root] for root in roots if root in TELECOM_CNPJ_ROOTS]
+    telecom_markers = [marker for marker in _TELECOM_MARKERS if marker in upper]
+    if telecom_roots or telecom_markers:
+        return Layout(LAYOUT_TELECOM, telecom_roots + telecom_markers)
+
+    return Layout(LAYOUT_GENERIC, [])
+
+# Texto das páginas dadas e se ele é parcial (não inclui todas as páginas do documento)
+def _pages_text(model, pages):
+    pages = list(pages)
+    return "".join(page.text + "\n" for page in pages), len(pages) < len(model)
+
+# Caminho rápido: boleto com DVs corretos na primeira ou na última página (onde fica a ficha de
+# compensação). Devolve (texto das páginas lidas, parcial, BoletoInfo) ou None.
+def _extract_from_boleto(model):
+    if not len(model):
+        return None
+    info = first_boleto_with_amount(model.page(index) for index in sorted({0, len(model) - 1}))
+    if info is None:
+        return None
+    return (*_pages_text(model, model.loaded_pages()), info)
+
+# Tenta os modelos de região do fornecedor; devolve (texto das páginas lidas, parcial, TemplateMatch)
+# ou None
+def _extract_with_templates(model, layout, templates, log_callback=None):
+    candidates = templates.find(_cnpjs(model.page(0).text), layout.name)
+    for template in candidates:
+        match = template.extract(model)
+        if match:
+            if log_callback:
+                log_callback(f"Valor lido pelo modelo '{match.template}' (página {match.page + 1})", "info")
+            pages = [model.page(index) for index in sorted({0, match.page})]
+            return (*_pages_text(model, pages), match)
+    if candidates and log_callback:
+        names = ", ".join(template.name for template in candidates)
+        log_callback(f"Modelo(s) {names} não encontraram o valor; usando a extração genérica", "warning")
+    return None
+
+# Classifica e extrai um documento já aberto
+def _load_document(doc, filename="", streaming=False, log_callback=None, progress_callback=None, templates=None):
+    with doc, span("documento.extrair", paginas=len(doc)) as extraction:
+        model = DocumentModel(doc, progress_callback)
+        try:
+            with span("layout.classificar") as classification:
+                layout = classify_layout(model, doc.metadata, filename)
+                classification.set(layout=layout.name)
+            if log_callback:
+                reasons = f" ({', '.join(layout.reasons)})" if layout.reasons else ""
+                log_callback(f"Layout identificado: {LAYOUT_NAMES[layout.name]}{reasons}", "info")
+
+            result = {"layout": layout.name, "text": "", "values": None, "data": None, "template": None,
+                      "scores": [], "partial": False}
+            if layout.name == LAYOUT_VIVO_MOVEL:
+                result["text"], result["data"] = _parse_vivo_movel(model)
+                return result
+
+            # Fornecedor com modelo cadastrado: só as regiões do modelo são lidas
+            if templates:
+                with span("modelos.regiao", modelos=len(templates)) as lookup:
+                    found = _extract_with_templates(model, layout, templates, log_callback)
+                    lookup.set(encontrado=bool(found))
+                if found:
+                    text, partial, match = found
+                    scores = [ScoredValue(match.value, 1.0, [f"modelo {match.template}"])]
+                    result.update(text=text, partial=partial, values=[match.value], template=match.template,
+                                  scores=scores)
+                    return result
+
+            # O valor de uma linha digitável válida dispensa as estratégias por texto e posição
+            with span("boleto.decodificar") as decoding:
+                found = _extract_from_boleto(model)
+                decoding.set(encontrado=bool(found))
+            if found:
+                text, partial, info = found
+                value = str(Money(info.amount_cents))
+                if log_callback:
+                    log_callback(f"Valor lido: {describe(info)}", "info")
+                scores = [ScoredValue(value, 1.0, [describe(info)])]
+                result.update(text=text, partial=partial, values=[value], scores=scores)
+                return result
+
+            strategies = LAYOUT_STRATEGIES[layout.name]
+            partial = False
+            try:
+                if streaming:
+                    text, values, partial = _extract_values_streaming(model, log_callback, strategies)
+                else:
+                    text, values = _extract_values_from_model(model, strategies)
+            except ValueError:
+                text, values = model.text, None
+
+            # Nada encontrado pelas estratégias do layout: tenta as demais da cadeia genérica
+            remaining = [strategy for strategy in VALUE_STRATEGIES if strategy not in strategies]
+            if not values and remaining and text.strip():
+                try:
+                    text, values = _extract_values_from_model(model, remaining)
+                    partial = False
+                except ValueError:
+                    pass
+            # Candidatos ordenados pela pontuação, calculada sobre as páginas que já foram lidas
+            result["text"] = text
+            result["partial"] = partial
+            if values:
+                with span("valores.pontuar", candidatos=len(values)):
+                    result["scores"] = score_values(model, values)
+                values = [scored.value for scored in result["scores"]] or values
+            result["values"] = values
+            return result
+        finally:
+            extraction.set(paginas_lidas=len(model.loaded_pages()))
+
+# Carrega um PDF: identifica o layout e usa o extrator adequado, sem depender do nome do arquivo
+def load_document(filepath, cache=None, streaming=False, log_callback=None, progress_callback=None,
+                  templates=None):
+    """Devolve {"layout", "text", "values", "data", "template", "scores", "partial", "digest"}: values
+    para os layouts comuns (None se nenhum valor for encontrado), data (notas fiscais) para a Vivo
+    Móvel, o nome do modelo de região usado, se houver, scores (ScoredValue de cada valor, na mesma
+    ordem), partial (o texto tem só as páginas lidas pelo caminho rápido ou pelo streaming) e o
+    SHA-256 do PDF.
+    ExtractionCancelled e erros de leitura do PDF são propagados.
+    templates: TemplateRegistry; por padrão, o de config_files/templates_extracao.json."""
+    with span("documento.carregar", arquivo=os.path.basename(filepath), cache=False) as current:
+        result = _load_file(filepath, cache, streaming, log_callback, progress_callback, templates, current)
+        current.set(layout=result["layout"], candidatos=len(result["values"] or ()),
+                    notas_fiscais=len(result["data"]["notas_fiscais"]) if result["data"] else 0)
+        return result
+
+# Relê o PDF inteiro como fatura da Vivo Móvel, para quando o modo é ativado à mão: o texto de
+# load_document pode ter só as páginas lidas até o total ou até o boleto
+def load_vivo_movel(filepath, cache=None, progress_callback=None):
+    """Devolve (texto de todas as páginas, dados das notas fiscais)"""
+    with span("documento.vivo_movel", arquivo=os.path.basename(filepath), cache=False) as current:
+        data, digest = read_pdf(filepath)
+        version = f"{EXTRACTOR_VERSION}-vivo"
+        cached = cache.get(digest, version) if cache is not None else None
+        if cached and cached["texto"] and cached["dados_vivo"] is not None:
+            current.set(cache=True)
+            return cached["texto"], cached["dados_vivo"]
+        with span("pdf.abrir"):
+            doc = fitz.open(stream=data, filetype="pdf")
+        with doc:
+            text, vivo_data = _parse_vivo_movel(DocumentModel(doc, progress_callback))
+        current.set(notas_fiscais=len(vivo_data["notas_fiscais"]))
+        if cache is not None:
+            cache.put(digest, version, text=text, vivo_data=vivo_data, layout=LAYOUT_VIVO_MOVEL)
+        return text, vivo_data
+
+def _load_file(filepath, cache, streaming, log_callback, progress_callback, templates, current):
+    filename = os.path.basename(filepath)
+    if templates is None:
+        templates = TemplateRegistry.load()
+    if templates.errors and log_callback:
+        for error in templates.errors:
+            log_callback(f"{TEMPLATES_FILE}: {error}", "warning")
+    data, digest = read_pdf(filepath)
+    if cache is None:
+        with span("pdf.abrir"):
+            doc = fitz.open(stream=data, filetype="pdf")
+        result = _load_document(doc, filename, streaming, log_callback, progress_callback, templates)
+        result["digest"] = digest
+        return result
+
+    # Entradas próprias: a ordem das estratégias depende do layout e dos modelos cadastrados
+    version = f"{EXTRACTOR_VERSION}-doc{'-stream' if streaming else ''}"
+    if templates:
+        version += f"-t{templates.digest}"
+    cached = cache.get(digest, version)
+    if cached and cached["layout"] and cached["texto"] and (cached["valores"] or cached["dados_vivo"] is not None):
+        if log_callback:
+            log_callback("Resultado da extração obtido do cache", "info")
+        current.set(cache=True)
+        scores = [ScoredValue(*entry) for entry in cached["pontuacoes"] or ()]
+        return {"layout": cached["layout"], "text": cached["texto"], "values": cached["valores"],
+                "data": cached["dados_vivo"], "template": cached["modelo"], "scores": scores,
+                # Entradas antigas não sabem se o texto é parcial: na dúvida, é
+                "partial": cached["parcial"] is not False, "digest": digest}
+    with span("pdf.abrir"):
+        doc = fitz.open(stream=data, filetype="pdf")
+    result = _load_document(doc, filename, streaming, log_callback, progress_callback, templates)
+    result["digest"] = digest
+
+    if result["values"] or result["data"] is not None:
+        cache.put(digest, version, text=result["text"], values=result["values"],
+                  vivo_data=result["data"], layout=result["layout"], scores=result["scores"],
+                  template=result["template"], partial=result["partial"])
+    return result
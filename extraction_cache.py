@@ -0,0 +1,163 @@
+#extraction_cache.py
+import hashlib
+import json
+import os
+import sqlite3
+import time
+from contextlib import closing
+
+CACHE_DIR = "cache"
+CACHE_FILE = "extracoes.sqlite3"
+
+# Lê o PDF uma única vez: os mesmos bytes são usados no SHA-256 e no fitz.open(stream=...)
+# (o PyMuPDF não aceita um mmap como stream)
+def read_pdf(filepath):
+    """Devolve (bytes, sha256)"""
+    with open(filepath, 'rb') as f:
+        data = f.read()
+    if not data:
+        raise ValueError("Arquivo PDF vazio.")
+    return data, hashlib.sha256(data).hexdigest()
+
+# Cache em disco dos resultados de extração, indexado pelo hash do conteúdo do PDF
+class ExtractionCache:
+    """Cache SQLite (modo WAL) compartilhável entre várias instâncias do aplicativo.
+
+    Cada entrada é identificada pelo SHA-256 do PDF e pela versão do extrator, e guarda o texto,
+    os valores candidatos, os dados da Vivo Móvel, o layout identificado, a pontuação dos candidatos,
+    o modelo de região usado e se o texto é parcial. Entradas antigas ou que passem do tamanho
+    máximo são removidas, começando pelas acessadas há mais tempo.
+    """
+
+    EVICT_EVERY = 50  # Número de gravações entre duas limpezas
+
+    def __init__(self, path=None, max_bytes=200 * 1024 * 1024, max_age_days=30):
+        self.path = path or os.path.join(CACHE_DIR, CACHE_FILE)
+        self.max_bytes = max_bytes
+        self.max_age = max_age_days * 24 * 3600
+        self._writes = 0
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with closing(self._connect()) as conn, conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS extracoes (
+                    digest TEXT NOT NULL,
+                    versao TEXT NOT NULL,
+                    texto TEXT,
+                    valores TEXT,
+                    dados_vivo TEXT,
+                    tamanho INTEGER NOT NULL DEFAULT 0,
+                    criado_em REAL NOT NULL,
+                    acessado_em REAL NOT NULL,
+                    PRIMARY KEY (digest, versao)
+                )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_extracoes_acesso ON extracoes(acessado_em)")
+            # Bancos criados antes da classificação de layout não têm a coluna
+            columns = {row[1] for row in conn.execute("PRAGMA table_info(extracoes)")}
+            if "layout" not in columns:
+                conn.execute("ALTER TABLE extracoes ADD COLUMN layout TEXT")
+            if "pontuacoes" not in columns:
+                conn.execute("ALTER TABLE extracoes ADD COLUMN pontuacoes TEXT")
+            if "modelo" not in columns:
+                conn.execute("ALTER TABLE extracoes ADD COLUMN modelo TEXT")
+            if "parcial" not in columns:
+                conn.execute("ALTER TABLE extracoes ADD COLUMN parcial INTEGER")
+        self.evict()
+
+    # Uma conexão por operação: seguro entre threads e entre processos
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=10)
+        conn.execute("PRAGMA busy_timeout=10000")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    def get(self, digest, version):
+        """Devolve um dicionário com texto, valores, dados_vivo, layout, pontuacoes, modelo e parcial
+        (None nas entradas gravadas antes da coluna existir), ou None se não houver entrada"""
+        try:
+            with closing(self._connect()) as conn, conn:
+                row = conn.execute(
+                    "SELECT texto, valores, dados_vivo, layout, pontuacoes, modelo, parcial FROM extracoes "
+                    "WHERE digest = ? AND versao = ?",
+                    (digest, version)
+                ).fetchone()
+                if row is None:
+                    return None
+                conn.execute(
+                    "UPDATE extracoes SET acessado_em = ? WHERE digest = ? AND versao = ?",
+                    (time.time(), digest, version)
+                )
+        except sqlite3.Error:
+            # O cache é só uma otimização: se o banco estiver indisponível, extrai de novo
+            return None
+        texto, valores, dados_vivo, layout, pontuacoes, modelo, parcial = row
+        return {
+            "texto": texto,
+            "valores": json.loads(valores) if valores is not None else None,
+            "dados_vivo": json.loads(dados_vivo) if dados_vivo is not None else None,
+            "layout": layout,
+            "pontuacoes": json.loads(pontuacoes) if pontuacoes is not None else None,
+            "modelo": modelo,
+            "parcial": bool(parcial) if parcial is not None else None,
+        }
+
+    def put(self, digest, version, text=None, values=None, vivo_data=None, layout=None, scores=None,
+            template=None, partial=None):
+        """Grava (ou completa) a entrada; campos None mantêm o que já estava gravado"""
+        valores = json.dumps(values, ensure_ascii=False) if values is not None else None
+        dados_vivo = json.dumps(vivo_data, ensure_ascii=False) if vivo_data is not None else None
+        # Pontuações como listas [valor, confiança, motivos]
+        pontuacoes = json.dumps([list(entry) for entry in scores], ensure_ascii=False) if scores else None
+        size = sum(len(part.encode('utf-8')) for part in (text, valores, dados_vivo) if part)
+        now = time.time()
+        try:
+            with closing(self._connect()) as conn, conn:
+                conn.execute("""
+                    INSERT INTO extracoes (digest, versao, texto, valores, dados_vivo, layout, pontuacoes,
+                                           modelo, parcial, tamanho, criado_em, acessado_em)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                    ON CONFLICT (digest, versao) DO UPDATE SET
+                        texto = COALESCE(excluded.texto, texto),
+                        valores = COALESCE(excluded.valores, valores),
+                        dados_vivo = COALESCE(excluded.dados_vivo, dados_vivo),
+                        layout = COALESCE(excluded.layout, layout),
+                        pontuacoes = COALESCE(excluded.pontuacoes, pontuacoes),
+                        modelo = COALESCE(excluded.modelo, modelo),
+                        parcial = COALESCE(excluded.parcial, parcial),
+                        tamanho = MAX(excluded.tamanho, tamanho),
+                        acessado_em = excluded.acessado_em
+                """, (digest, version, text, valores, dados_vivo, layout, pontuacoes, template,
+                      None if partial is None else int(partial), size, now, now))
+        except sqlite3.Error:
+            return
+
+        self._writes += 1
+        if self._writes % self.EVICT_EVERY == 0:
+            self.evict()
+
+    def evict(self):
+        """Remove entradas expiradas e, se passar do tamanho máximo, as menos acessadas"""
+        try:
+            with closing(self._connect()) as conn, conn:
+                conn.execute("DELETE FROM extracoes WHERE acessado_em < ?", (time.time() - self.max_age,))
+                total = conn.execute("SELECT COALESCE(SUM(tamanho), 0) FROM extracoes").fetchone()[0]
+                if total <= self.max_bytes:
+                    return
+                rows = conn.execute(
+                    "SELECT digest, versao, tamanho FROM extracoes ORDER BY acessado_em"
+                ).fetchall()
+                for digest, version, size in rows:
+                    if total <= self.max_bytes:
+                        break
+                    conn.execute("DELETE FROM extracoes WHERE digest = ? AND versao = ?", (digest, version))
+                    total -= size
+        except sqlite3.Error:
+            # Banco bloqueado por outra instância: a limpeza fica para a próxima vez
+            return
+
+    def clear(self):
+        with closing(self._connect()) as conn, conn:
+            conn.execute("DELETE FROM extracoes")
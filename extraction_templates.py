@@ -0,0 +1,126 @@
+#extraction_templates.py
+"""Modelos de extração por fornecedor, lidos de config_files/templates_extracao.json (opcional).
+
+Cada modelo indica onde fica o total na página, em coordenadas relativas (0 a 1):
+
+    [
+        {
+            "nome": "Operadora X",
+            "cnpj": "11.222.333/0001-81",
+            "layout": "telecom",
+            "pagina": 0,
+            "regioes": [[0.5, 0.6, 1.0, 0.9]],
+            "rotulos": ["TOTAL A PAGAR", "VALOR COBRADO"]
+        }
+    ]
+
+- "cnpj" (14 dígitos ou só a raiz de 8) e/ou "layout": o modelo vale quando todos os campos
+  informados batem com a primeira página do documento;
+- "pagina": índice da página (negativo conta a partir do fim, -1 é a última);
+- "regioes": retângulos [x0, y0, x1, y1] lidos em ordem com get_text(clip=...);
+- "rotulos": o valor é o primeiro NN.NNN,NN depois de um dos rótulos; sem rótulos, o primeiro
+  valor da região.
+
+Se nenhuma região devolver um valor, a extração segue pela cadeia genérica.
+"""
+import hashlib
+import json
+from collections import namedtuple
+
+from config_manager import ConfigManager
+from pdf_reader import _AMOUNT_RE, standardize_cnpj
+
+TEMPLATES_FILE = "templates_extracao.json"
+
+# Resultado de um modelo: valor, nome do modelo e página onde o valor foi lido
+TemplateMatch = namedtuple("TemplateMatch", ["value", "template", "page"])
+
+class ExtractionTemplate:
+    __slots__ = ("name", "cnpj", "layout", "page", "regions", "labels")
+
+    def __init__(self, spec):
+        self.name = spec.get("nome", "sem nome")
+        self.cnpj = standardize_cnpj(spec.get("cnpj", "")) or None
+        self.layout = spec.get("layout")
+        self.page = int(spec.get("pagina", 0))
+        self.regions = [tuple(float(v) for v in region) for region in spec.get("regioes", [])]
+        self.labels = [label.upper() for label in spec.get("rotulos", [])]
+        if not self.regions:
+            raise ValueError(f"Modelo '{self.name}' sem regiões")
+        if any(len(region) != 4 for region in self.regions):
+            raise ValueError(f"Modelo '{self.name}': cada região deve ter 4 coordenadas")
+        if not self.cnpj and not self.layout:
+            raise ValueError(f"Modelo '{self.name}' precisa de cnpj ou layout")
+
+    def matches(self, cnpjs, layout):
+        """cnpjs: CNPJs (14 dígitos) da primeira página"""
+        if self.layout and self.layout != layout:
+            return False
+        if self.cnpj:
+            return any(cnpj.startswith(self.cnpj) for cnpj in cnpjs)
+        return True
+
+    # Primeiro valor depois de um dos rótulos (ou o primeiro valor, sem rótulos)
+    def _find_value(self, text):
+        if not self.labels:
+            match = _AMOUNT_RE.search(text)
+            return match.group() if match else None
+        upper = text.upper()
+        best = None
+        for label in self.labels:
+            position = upper.find(label)
+            if position < 0:
+                continue
+            match = _AMOUNT_RE.search(text, position + len(label))
+            if match and (best is None or position < best[0]):
+                best = (position, match.group())
+        return best[1] if best else None
+
+    def extract(self, model):
+        """Lê só as regiões do modelo; devolve TemplateMatch ou None"""
+        if not len(model) or not -len(model) <= self.page < len(model):
+            return None
+        page = model.page(self.page % len(model))
+        width, height = page.rect.width, page.rect.height
+        for x0, y0, x1, y1 in self.regions:
+            text = page.clipped_text((x0 * width, y0 * height, x1 * width, y1 * height))
+            value = self._find_value(text)
+            if value:
+                return TemplateMatch(value, self.name, page.number)
+        return None
+
+# Conjunto de modelos carregado do arquivo de configuração
+class TemplateRegistry:
+    _loaded_specs = None
+    _loaded = None
+
+    def __init__(self, specs=()):
+        self.templates = []
+        self.errors = []
+        for spec in specs:
+            try:
+                self.templates.append(ExtractionTemplate(spec))
+            except (TypeError, ValueError, AttributeError) as e:
+                self.errors.append(str(e))
+        # Entra na chave do cache: alterar os modelos invalida as extrações feitas com eles
+        self.digest = hashlib.sha256(
+            json.dumps(list(specs), sort_keys=True, ensure_ascii=False).encode("utf-8")
+        ).hexdigest()[:12]
+
+    def __len__(self):
+        return len(self.templates)
+
+    def find(self, cnpjs, layout):
+        """Modelos que valem para o documento, na ordem do arquivo"""
+        return [template for template in self.templates if template.matches(cnpjs, layout)]
+
+    @classmethod
+    def load(cls, config_dir=None):
+        """Registro atual; só é remontado quando o arquivo muda (cache do ConfigManager)"""
+        specs = ConfigManager.load_optional_json_file(TEMPLATES_FILE, config_dir=config_dir)
+        if not isinstance(specs, list):
+            specs = ()
+        if cls._loaded is None or specs is not cls._loaded_specs:
+            cls._loaded_specs = specs
+            cls._loaded = cls(specs)
+        return cls._loaded
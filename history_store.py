@@ -0,0 +1,146 @@
+#history_store.py
+import json
+import os
+import re
+import sqlite3
+from contextlib import closing
+from datetime import datetime
+from line_items import Money
+
+HISTORY_DIR = "historico"
+HISTORY_FILE = "historico.sqlite3"
+
+# Código do fornecedor dentro do SHORT_TEXT: "[S,1000029760] Descrição"
+_SHORT_TEXT_SUPPLIER_RE = re.compile(r"^\[[SM],([^\]]+)\]")
+
+# Histórico de envios ao SAP: só recebe inserções e é consultado por página
+class HistoryStore:
+    """Cada envio vira uma linha com as colunas usadas nos filtros (data, CR, fornecedores...).
+    O payload e a resposta completos só são lidos quando o usuário abre um registro."""
+
+    def __init__(self, path=None):
+        self.path = path or os.path.join(HISTORY_DIR, HISTORY_FILE)
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with closing(self._connect()) as conn, conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript("""
+                CREATE TABLE IF NOT EXISTS envios (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    data_hora TEXT NOT NULL,
+                    cr_number TEXT,
+                    topdesk_key TEXT,
+                    fornecedores TEXT,
+                    total_centavos INTEGER,
+                    status_code INTEGER,
+                    payload TEXT,
+                    resposta TEXT
+                );
+                CREATE INDEX IF NOT EXISTS idx_envios_data ON envios(data_hora);
+                CREATE INDEX IF NOT EXISTS idx_envios_cr ON envios(cr_number);
+                CREATE TABLE IF NOT EXISTS envios_fornecedores (
+                    envio_id INTEGER NOT NULL REFERENCES envios(id),
+                    fornecedor TEXT NOT NULL
+                );
+                CREATE INDEX IF NOT EXISTS idx_envios_fornecedores ON envios_fornecedores(fornecedor, envio_id);
+            """)
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=10)
+        conn.execute("PRAGMA busy_timeout=10000")
+        return conn
+
+    @staticmethod
+    def summarize_payload(payload):
+        """Extrai CR_NUMBER, TOPDESK_KEY, fornecedores e total (em centavos) do payload"""
+        webshop = payload.get("ZSBR_MM_AZU_WEBSHOP_PREQ", {}).get("I_WEBSHOP", {})
+        suppliers = []
+        total_cents = 0
+        for item in webshop.get("ITEMS", []):
+            match = _SHORT_TEXT_SUPPLIER_RE.match(item.get("SHORT_TEXT", ""))
+            if match and match.group(1) not in suppliers:
+                suppliers.append(match.group(1))
+            try:
+                total_cents += Money.parse(item.get("PREQ_PRICE", "0")).cents
+            except ValueError:
+                pass
+        return {
+            "cr_number": webshop.get("CR_NUMBER", ""),
+            "topdesk_key": webshop.get("TOPDESK_KEY", ""),
+            "fornecedores": suppliers,
+            "total_centavos": total_cents,
+        }
+
+    def add(self, payload, response):
+        """Registra um envio e devolve o id"""
+        summary = self.summarize_payload(payload or {})
+        status_code = getattr(response, 'status_code', None)
+        response_text = response.text if hasattr(response, 'text') else str(response)
+        with closing(self._connect()) as conn, conn:
+            cursor = conn.execute("""
+                INSERT INTO envios (data_hora, cr_number, topdesk_key, fornecedores,
+                                    total_centavos, status_code, payload, resposta)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+            """, (
+                datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+                summary["cr_number"],
+                summary["topdesk_key"],
+                ", ".join(summary["fornecedores"]),
+                summary["total_centavos"],
+                status_code,
+                json.dumps(payload, ensure_ascii=False),
+                response_text,
+            ))
+            envio_id = cursor.lastrowid
+            conn.executemany(
+                "INSERT INTO envios_fornecedores (envio_id, fornecedor) VALUES (?, ?)",
+                [(envio_id, supplier) for supplier in summary["fornecedores"]]
+            )
+        return envio_id
+
+    # Monta o WHERE a partir dos filtros (datas no formato AAAA-MM-DD)
+    @staticmethod
+    def _filters(date_from=None, date_to=None, supplier=None, cr_number=None):
+        clauses = []
+        params = []
+        if date_from:
+            clauses.append("data_hora >= ?")
+            params.append(date_from)
+        if date_to:
+            clauses.append("data_hora < date(?, '+1 day')")
+            params.append(date_to)
+        if supplier:
+            clauses.append("id IN (SELECT envio_id FROM envios_fornecedores WHERE fornecedor LIKE ?)")
+            params.append(f"{supplier}%")
+        if cr_number:
+            clauses.append("cr_number LIKE ?")
+            params.append(f"%{cr_number}%")
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        return where, params
+
+    def count(self, **filters):
+        where, params = self._filters(**filters)
+        with closing(self._connect()) as conn:
+            return conn.execute(f"SELECT COUNT(*) FROM envios {where}", params).fetchone()[0]
+
+    def page(self, page=0, page_size=50, **filters):
+        """Devolve os envios da página (mais recentes primeiro), sem payload nem resposta"""
+        where, params = self._filters(**filters)
+        with closing(self._connect()) as conn:
+            return conn.execute(f"""
+                SELECT id, data_hora, cr_number, topdesk_key, fornecedores, total_centavos, status_code
+                FROM envios {where}
+                ORDER BY id DESC
+                LIMIT ? OFFSET ?
+            """, params + [page_size, page * page_size]).fetchall()
+
+    def details(self, envio_id):
+        """Devolve (payload, resposta) de um envio"""
+        with closing(self._connect()) as conn:
+            row = conn.execute(
+                "SELECT payload, resposta FROM envios WHERE id = ?", (envio_id,)
+            ).fetchone()
+        if row is None:
+            return None, None
+        return json.loads(row[0]) if row[0] else None, row[1]
@@ -0,0 +1,189 @@
+#invoice_index.py
+import os
+import re
+import sqlite3
+from collections import namedtuple
+from contextlib import closing
+from datetime import datetime
+
+from history_store import HISTORY_DIR
+
+INDEX_FILE = "faturas.sqlite3"
+
+# Identificação de uma fatura: hash do PDF, código do fornecedor, CNPJ, valor em centavos e mês
+# de referência (MM/AAAA, vazio se não encontrado)
+Fingerprint = namedtuple("Fingerprint", ["pdf_hash", "supplier", "cnpj", "cents", "month"])
+
+# Fatura já lançada: motivo ("mesmo PDF" ou "mesmos dados"), CR_NUMBER, data/hora e arquivo
+DuplicateHit = namedtuple("DuplicateHit", ["reason", "cr_number", "date", "filename"])
+
+REASON_SAME_PDF = "mesmo PDF"
+REASON_SAME_DATA = "mesmo fornecedor, CNPJ, valor e mês de referência"
+
+# Mês de referência impresso na fatura; sem ele, o mês da data de emissão
+_REFERENCE_MONTH_RES = [
+    re.compile(r"(?:M[êe]s\s+(?:de\s+)?refer[êe]ncia|Compet[êe]ncia|Refer[êe]ncia)\s*:?\s*(\d{2})\s*/\s*(\d{4})", re.I),
+    re.compile(r"(?:Emiss[ãa]o|Data\s+de\s+emiss[ãa]o)\s*:?\s*\d{2}/(\d{2})/(\d{4})", re.I),
+]
+
+def reference_month(text):
+    """MM/AAAA do mês de referência (ou da emissão) encontrado no texto; "" se não houver"""
+    for pattern in _REFERENCE_MONTH_RES:
+        match = pattern.search(text or "")
+        if match and 1 <= int(match.group(1)) <= 12:
+            return f"{match.group(1)}/{match.group(2)}"
+    return ""
+
+def make_fingerprint(pdf_hash, supplier, cnpj, cents, month):
+    """Normaliza os campos: código sem zeros à esquerda, CNPJ só com dígitos, mês MM/AAAA"""
+    return Fingerprint(
+        pdf_hash or "",
+        (supplier or "").strip().upper().lstrip("0"),
+        re.sub(r"\D", "", cnpj or ""),
+        int(cents or 0),
+        (month or "").strip(),
+    )
+
+def data_key(fingerprint):
+    """Chave dos dados da fatura; None se faltar valor, mês ou fornecedor/CNPJ (evita juntar as
+    mensalidades de valor fixo de meses diferentes)"""
+    if not fingerprint.cents or not fingerprint.month or not (fingerprint.supplier or fingerprint.cnpj):
+        return None
+    return f"{fingerprint.supplier}|{fingerprint.cnpj}|{fingerprint.cents}|{fingerprint.month}"
+
+# Motivos pelos quais duas impressões digitais são da mesma fatura (lista vazia se não forem)
+def match_reasons(fingerprint, other):
+    reasons = []
+    if fingerprint.pdf_hash and fingerprint.pdf_hash == other.pdf_hash:
+        reasons.append(REASON_SAME_PDF)
+    key = data_key(fingerprint)
+    if key is not None and key == data_key(other):
+        reasons.append(REASON_SAME_DATA)
+    return reasons
+
+# Índice das faturas já enviadas ao SAP, para avisar de lançamentos em duplicidade
+class InvoiceIndex:
+    """Tabela SQLite com a impressão digital de cada fatura enviada e dois conjuntos em memória
+    (hashes de PDF e chaves de dados). A consulta normal não toca no banco: ele só é lido quando
+    um dos conjuntos acusa uma repetição (para buscar CR_NUMBER e data) ou quando o arquivo foi
+    alterado por outra instância do aplicativo (só as linhas novas são lidas)."""
+
+    def __init__(self, path=None):
+        self.path = path or os.path.join(HISTORY_DIR, INDEX_FILE)
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with closing(self._connect()) as conn, conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript("""
+                CREATE TABLE IF NOT EXISTS faturas (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    data_hora TEXT NOT NULL,
+                    hash_pdf TEXT,
+                    chave TEXT,
+                    fornecedor TEXT,
+                    cnpj TEXT,
+                    valor_centavos INTEGER,
+                    mes_referencia TEXT,
+                    arquivo TEXT,
+                    cr_number TEXT
+                );
+                CREATE INDEX IF NOT EXISTS idx_faturas_hash ON faturas(hash_pdf);
+                CREATE INDEX IF NOT EXISTS idx_faturas_chave ON faturas(chave);
+            """)
+        self._hashes = set()
+        self._keys = set()
+        self._last_id = 0
+        self._signature = None
+        self._sync()
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=10)
+        conn.execute("PRAGMA busy_timeout=10000")
+        return conn
+
+    # Tamanho e data de modificação do banco e do WAL: mudam quando outra instância grava
+    def _file_signature(self):
+        signature = []
+        for path in (self.path, f"{self.path}-wal"):
+            try:
+                stat = os.stat(path)
+                signature.append((stat.st_size, stat.st_mtime_ns))
+            except OSError:
+                signature.append(None)
+        return tuple(signature)
+
+    # Acrescenta aos conjuntos as linhas gravadas desde a última leitura
+    def _sync(self):
+        signature = self._file_signature()
+        if signature == self._signature:
+            return
+        with closing(self._connect()) as conn:
+            rows = conn.execute(
+                "SELECT id, hash_pdf, chave FROM faturas WHERE id > ? ORDER BY id", (self._last_id,)
+            ).fetchall()
+        for row_id, pdf_hash, key in rows:
+            if pdf_hash:
+                self._hashes.add(pdf_hash)
+            if key:
+                self._keys.add(key)
+            self._last_id = row_id
+        self._signature = signature
+
+    def check(self, fingerprint):
+        """Devolve a lista de DuplicateHit (vazia se a fatura nunca foi enviada)"""
+        self._sync()
+        key = data_key(fingerprint)
+        same_pdf = bool(fingerprint.pdf_hash) and fingerprint.pdf_hash in self._hashes
+        same_data = key is not None and key in self._keys
+        if not same_pdf and not same_data:
+            return []
+        hits = []
+        with closing(self._connect()) as conn:
+            for reason, column, value, found in ((REASON_SAME_PDF, "hash_pdf", fingerprint.pdf_hash, same_pdf),
+                                                 (REASON_SAME_DATA, "chave", key, same_data)):
+                if not found:
+                    continue
+                rows = conn.execute(
+                    f"SELECT cr_number, data_hora, arquivo FROM faturas WHERE {column} = ? ORDER BY id DESC",
+                    (value,)
+                ).fetchall()
+                hits.extend(DuplicateHit(reason, *row) for row in rows)
+        return hits
+
+    def record(self, fingerprint, cr_number, filename=""):
+        """Registra uma fatura enviada ao SAP"""
+        key = data_key(fingerprint)
+        with closing(self._connect()) as conn, conn:
+            conn.execute("""
+                INSERT INTO faturas (data_hora, hash_pdf, chave, fornecedor, cnpj, valor_centavos,
+                                     mes_referencia, arquivo, cr_number)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+            """, (
+                datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+                fingerprint.pdf_hash or None,
+                key,
+                fingerprint.supplier,
+                fingerprint.cnpj,
+                fingerprint.cents,
+                fingerprint.month,
+                filename,
+                cr_number,
+            ))
+        self._sync()
+
+# Texto do aviso de duplicidade, uma linha por lançamento anterior
+def describe_hits(hits):
+    lines = []
+    for hit in hits:
+        try:
+            date = datetime.strptime(hit.date, "%Y-%m-%d %H:%M:%S").strftime("%d/%m/%Y %H:%M")
+        except (TypeError, ValueError):
+            date = hit.date or "data desconhecida"
+        if hit.cr_number:
+            where = f"enviada ao SAP em {date} ({hit.cr_number})"
+        else:
+            where = "já está no JSON atual"
+        file_note = f", arquivo {hit.filename}" if hit.filename else ""
+        lines.append(f"- {hit.reason}: {where}{file_note}")
+    return "\n".join(lines)
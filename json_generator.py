@@ -1,65 +1,59 @@
 #json_generator.py
 import json
 from pdf_reader import standardize_cnpj
+from line_items import LineItem, Money
+from tracing import span
 
-def format_number(value):
-    """Converte números do formato brasileiro para o internacional"""
-    if isinstance(value, str):
-        # Remove pontos de milhar e substitui vírgula por ponto
-        value = value.replace('.', '')  # Remove separador de milhar
-        value = value.replace(',', '.')  # Converte decimal para ponto
-    return value
+# Mapeamento fixo de CNPJs da Vivo para códigos SAP
+VIVO_CNPJ_MAPPING = {
+    "02558157000162": "1000029760",
+    "02558157000243": "1000029762",
+    "02558157000324": "1000029764",
+    "02558157000839": "1000029766",
+    "02558157000910": "1000029794",
+    "02558157001134": "1000029796",
+    "02558157001304": "1000029798",
+    "02558157001487": "1000029800",
+    "02558157001720": "1000029802",
+    "02558157002297": "1000029804",
+    "02558157002459": "1000029806",
+    "02558157013574": "1000029808",
+    "02558157015941": "1000029810",
+    "02558157018703": "1000032155",
+    "02558157051824": "1000029812",
+    "02558157075685": "1000029814"
+}
 
-def generate_json_input(pdf_text, short_text, is_servico, supplier_code, total_value, material_code="ZA040282"):
+# Função que gera o item da requisição para um PDF comum
+def build_line_items(pdf_text, short_text, is_servico, supplier_code, total_value, material_code="ZA040282"):
+    """Devolve uma lista de LineItem; total_value pode ser Money ou o texto lido do PDF ("1.234,56")"""
     if not pdf_text:
-        return None
-    
-    item_type = "S" if is_servico else "M"
-    formatted_short_text = f"[{item_type},{supplier_code}] {short_text}"
-    
-    # Converter valor aqui
-    formatted_value = format_number(total_value)
+        return []
     
-    json_input = [
-        {
-            "PREQ_ITEM": "0010",
-            "MATERIAL": material_code,  
-            "SHORT_TEXT": formatted_short_text, 
-            "QUANTITY": "1",  
-            "PREQ_PRICE": formatted_value  # Usar valor convertido
-        }
-    ]
-    
-    return json.dumps(json_input, indent=4)
+    with span("json.itens", itens=1):
+        item_type = "S" if is_servico else "M"
+        formatted_short_text = f"[{item_type},{supplier_code}] {short_text}"
 
-# Função que gera o JSON de entrada pra Vivo Móvel, faturas compostas
-def generate_json_input_vivo_movel(data, is_servico, supplier_data, material_code="ZA040282"):
-    json_input = []
+        return [LineItem(material_code, formatted_short_text, Money.parse_br(total_value))]
+
+def generate_json_input(pdf_text, short_text, is_servico, supplier_code, total_value, material_code="ZA040282"):
+    items = build_line_items(pdf_text, short_text, is_servico, supplier_code, total_value, material_code)
+    if not items:
+        return None
+    return json.dumps([item.to_sap() for item in items], indent=4)
+
+# Função que gera os itens da Vivo Móvel, faturas compostas (um item por nota fiscal)
+def build_line_items_vivo_movel(data, is_servico, supplier_data, material_code="ZA040282"):
+    with span("json.itens_vivo_movel", itens=len(data["notas_fiscais"])):
+        return _build_line_items_vivo_movel(data, is_servico, supplier_data, material_code)
+
+def _build_line_items_vivo_movel(data, is_servico, supplier_data, material_code):
+    items = []
     preq_item = 10
 
     #auto_description = f"MesRef{data['mes_referencia']} NumConta{data['numero_conta']}"
     auto_description = "Fatura Vivo Movel"
     
-    # Mapeamento fixo de CNPJs da Vivo para códigos SAP
-    vivo_mapping = {
-        "02558157000162": "1000029760",
-        "02558157000243": "1000029762",
-        "02558157000324": "1000029764",
-        "02558157000839": "1000029766",
-        "02558157000910": "1000029794",
-        "02558157001134": "1000029796",
-        "02558157001304": "1000029798",
-        "02558157001487": "1000029800",
-        "02558157001720": "1000029802",
-        "02558157002297": "1000029804",
-        "02558157002459": "1000029806",
-        "02558157013574": "1000029808",
-        "02558157015941": "1000029810",
-        "02558157018703": "1000032155",
-        "02558157051824": "1000029812",
-        "02558157075685": "1000029814"
-    }
-    
     for nf in data["notas_fiscais"]:
         item_type = "S" if is_servico else "M"
         cnpj = standardize_cnpj(nf['cnpj'])
@@ -69,7 +63,7 @@ def generate_json_input_vivo_movel(data, is_servico, supplier_data, material_cod
         
         # Se não encontrou, tentar do mapeamento fixo
         if not supplier_code:
-            supplier_code = vivo_mapping.get(cnpj)
+            supplier_code = VIVO_CNPJ_MAPPING.get(cnpj)
         
         formatted_short_text = (
             f"[{item_type},{supplier_code}] {auto_description}"
@@ -77,16 +71,13 @@ def generate_json_input_vivo_movel(data, is_servico, supplier_data, material_cod
             else f"[{item_type},{cnpj}] {auto_description}"
         )
         
-        # Converter valor aqui
-        formatted_value = format_number(nf["total"])
-        
-        json_input.append({
-            "PREQ_ITEM": f"{preq_item:04}",
-            "MATERIAL": material_code,
-            "SHORT_TEXT": formatted_short_text,
-            "QUANTITY": "1",
-            "PREQ_PRICE": formatted_value  # Usar valor convertido
-        })
+        items.append(LineItem(
+            material_code, formatted_short_text, Money.parse_br(nf["total"]), preq_item=preq_item
+        ))
         preq_item += 10
     
-    return json.dumps(json_input, indent=4)
\ No newline at end of file
+    return items
+
+def generate_json_input_vivo_movel(data, is_servico, supplier_data, material_code="ZA040282"):
+    items = build_line_items_vivo_movel(data, is_servico, supplier_data, material_code)
+    return json.dumps([item.to_sap() for item in items], indent=4)
@@ -0,0 +1,121 @@
+#line_items.py
+import re
+from decimal import Decimal, InvalidOperation, ROUND_HALF_UP
+from functools import total_ordering
+
+# Valor sem centavos com separadores de milhar: "2.000", "1.234.567"
+_THOUSANDS_ONLY_RE = re.compile(r"-?\d{1,3}(?:\.\d{3})+")
+
+# Valor monetário exato, guardado em centavos inteiros
+@total_ordering
+class Money:
+    """Aceita o formato brasileiro ("1.234,56") e o formato do SAP ("1234.56").
+    str() devolve o formato brasileiro e to_sap() o formato enviado em PREQ_PRICE."""
+
+    __slots__ = ("cents",)
+
+    def __init__(self, cents=0):
+        self.cents = int(cents)
+
+    @classmethod
+    def parse(cls, value):
+        """Converte texto digitado (ou Money) em Money; com vírgula o texto é lido no formato
+        brasileiro, sem vírgula o ponto é o separador decimal. Levanta ValueError se for inválido."""
+        if isinstance(value, Money):
+            return value
+        text = str(value).strip().replace("R$", "").replace(" ", "")
+        if "," in text:
+            return cls.parse_br(text)
+        return cls._from_decimal(text, value)
+
+    @classmethod
+    def parse_br(cls, value):
+        """Converte um valor lido do PDF ("1.234,56"); o ponto é sempre separador de milhar"""
+        if isinstance(value, Money):
+            return value
+        text = str(value).strip().replace("R$", "").replace(" ", "")
+        return cls._from_decimal(text.replace(".", "").replace(",", "."), value)
+
+    @classmethod
+    def parse_typed(cls, value):
+        """Converte um valor digitado no formato exibido ("1.234,56"). Sem vírgula, o ponto só é
+        aceito como separador de milhar ("2.000" = R$ 2.000,00); "2000.50" é ambíguo e levanta
+        ValueError, como os valores inválidos."""
+        if isinstance(value, Money):
+            return value
+        text = str(value).strip().replace("R$", "").replace(" ", "")
+        if "," not in text and "." in text and not _THOUSANDS_ONLY_RE.fullmatch(text):
+            raise ValueError(f"Valor ambíguo: {value!r}")
+        return cls.parse_br(text)
+
+    @classmethod
+    def _from_decimal(cls, text, value):
+        try:
+            amount = Decimal(text)
+        except InvalidOperation:
+            raise ValueError(f"Valor monetário inválido: {value!r}") from None
+        if not amount.is_finite():
+            raise ValueError(f"Valor monetário inválido: {value!r}")
+        return cls(int((amount * 100).quantize(Decimal(1), rounding=ROUND_HALF_UP)))
+
+    def to_sap(self):
+        sign = "-" if self.cents < 0 else ""
+        whole, fraction = divmod(abs(self.cents), 100)
+        return f"{sign}{whole}.{fraction:02}"
+
+    def __str__(self):
+        sign = "-" if self.cents < 0 else ""
+        whole, fraction = divmod(abs(self.cents), 100)
+        return f"{sign}{whole:,}".replace(",", ".") + f",{fraction:02}"
+
+    def __repr__(self):
+        return f"Money({self.cents})"
+
+    def __eq__(self, other):
+        if not isinstance(other, Money):
+            return NotImplemented
+        return self.cents == other.cents
+
+    def __lt__(self, other):
+        if not isinstance(other, Money):
+            return NotImplemented
+        return self.cents < other.cents
+
+    def __hash__(self):
+        return hash(self.cents)
+
+    def __add__(self, other):
+        if not isinstance(other, Money):
+            return NotImplemented
+        return Money(self.cents + other.cents)
+
+    def __bool__(self):
+        return self.cents != 0
+
+# Item da requisição; só vira dicionário (formato do SAP) ao montar o payload
+class LineItem:
+    __slots__ = ("preq_item", "material", "short_text", "quantity", "price")
+
+    def __init__(self, material, short_text, price, quantity=1, preq_item=10):
+        self.preq_item = preq_item
+        self.material = material
+        self.short_text = short_text
+        self.quantity = quantity
+        self.price = Money.parse(price)
+
+    def to_sap(self):
+        return {
+            "PREQ_ITEM": f"{self.preq_item:04}",
+            "MATERIAL": self.material,
+            "SHORT_TEXT": self.short_text,
+            "QUANTITY": str(self.quantity),
+            "PREQ_PRICE": self.price.to_sap(),
+        }
+
+    def __repr__(self):
+        return f"LineItem({self.preq_item:04}, {self.material!r}, {self.short_text!r}, {self.price})"
+
+# Renumera PREQ_ITEM (10, 20, 30...) a partir da posição indicada
+def renumber(items, start=0):
+    for index in range(start, len(items)):
+        items[index].preq_item = (index + 1) * 10
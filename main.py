@@ -1,16 +1,29 @@
 from datetime import datetime
+import queue
+import threading
 import tkinter as tk
 from tkinter import filedialog, messagebox, ttk
 import json
-import fitz
-from pdf_reader import extract_text_from_pdf, extrair_dados_vivo_movel
-from json_generator import generate_json_input, generate_json_input_vivo_movel
+from pdf_reader import extrair_dados_vivo_movel, ExtractionCancelled
+from document_loader import load_document, load_vivo_movel, LAYOUT_NAMES, LAYOUT_VIVO_MOVEL
+from extraction_cache import ExtractionCache
+from history_store import HistoryStore
+from invoice_index import DuplicateHit, InvoiceIndex, describe_hits, make_fingerprint, match_reasons, reference_month
+from json_generator import build_line_items, build_line_items_vivo_movel, VIVO_CNPJ_MAPPING
+from cnpj_index import CnpjIndex
+from line_items import Money, renumber
 from sap_integration import SAPIntegrationDialog
+from sap_client import close_session
+from sap_controller import STATE_CLOSED, get_controller
+from app_logging import setup_logging, stop_logging, LogView, LEVELS
 from config_manager import ConfigManager
+from search_index import SearchIndex
+from tracing import get_tracer, span
+from value_scoring import AUTO_ACCEPT_THRESHOLD, auto_accept
 
 # Classe para a janela de seleção de valores caso encontre mais de um valor no PDF
 class ValueSelectorDialog:
-    def __init__(self, parent, values):
+    def __init__(self, parent, values, scores=None):
         self.dialog = tk.Toplevel(parent)
         self.dialog.title("Selecionar Valor")
         self.dialog.grab_set()
@@ -20,6 +33,8 @@ class ValueSelectorDialog:
         # Valor selecionado
         self.selected_value = None
         self.values = values
+        # Confiança de cada valor (os valores já vêm ordenados pela pontuação)
+        self.confidences = {scored.value: scored.confidence for scored in scores or ()}
         
         # Container principal
         container = ttk.Frame(self.dialog)
@@ -76,9 +91,13 @@ class ValueSelectorDialog:
         self.listbox.delete(0, tk.END)
         for i in range(0, len(self.values), batch_size):
             batch = self.values[i:i + batch_size]
-            self.listbox.insert(tk.END, *[f"R$ {v}" for v in batch])
+            self.listbox.insert(tk.END, *[self.format_value(v) for v in batch])
             self.dialog.update_idletasks()  # Atualiza UI periodicamente
     
+    def format_value(self, value):
+        confidence = self.confidences.get(value)
+        return f"R$ {value}" if confidence is None else f"R$ {value}  ({confidence:.0%})"
+
     # Centraliza a janela em relação ao pai
     def center_window(self, parent):
         parent_x = parent.winfo_x()
@@ -97,9 +116,105 @@ class ValueSelectorDialog:
     # Handler para otimizado seleção
     def on_select(self):
         if sel := self.listbox.curselection():
-            self.selected_value = self.listbox.get(sel[0]).replace("R$ ", "")
+            # Pelo índice: o texto da linha traz "R$" e a confiança, que não fazem parte do valor
+            self.selected_value = self.values[sel[0]]
             self.dialog.destroy()
 
+# Janela para editar material, descrição e valor de um item do JSON
+class ItemEditDialog:
+    def __init__(self, parent, item):
+        self.dialog = tk.Toplevel(parent)
+        self.dialog.title(f"Editar Item {item.preq_item:04}")
+        self.dialog.grab_set()
+        self.dialog.resizable(False, False)
+        self.result = None
+        
+        container = ttk.Frame(self.dialog, padding=10)
+        container.pack(fill='both', expand=True)
+        container.columnconfigure(1, weight=1)
+        
+        self.entries = {}
+        for row, (key, label) in enumerate((
+            ("material", "Material/Serviço:"), ("short_text", "Descrição:"), ("price", "Valor:")
+        )):
+            ttk.Label(container, text=label).grid(row=row, column=0, sticky="w", pady=2)
+            entry = ttk.Entry(container, width=50)
+            entry.insert(0, str(getattr(item, key)))
+            entry.grid(row=row, column=1, sticky="ew", padx=5, pady=2)
+            self.entries[key] = entry
+        
+        ttk.Button(container, text="Salvar", command=self.on_save).grid(row=3, column=1, sticky="e", pady=(10, 0))
+        self.dialog.bind("<Return>", lambda e: self.on_save())
+        
+        self.dialog.focus_force()
+        self.dialog.wait_window()
+    
+    def on_save(self):
+        values = {key: entry.get().strip() for key, entry in self.entries.items()}
+        if not values["material"] or not values["short_text"]:
+            messagebox.showerror("Erro", "Material e descrição são obrigatórios!", parent=self.dialog)
+            return
+        try:
+            values["price"] = Money.parse_typed(values["price"])
+        except ValueError:
+            messagebox.showerror("Erro", "Valor inválido! Use o formato 1.234,56.", parent=self.dialog)
+            return
+        self.result = values
+        self.dialog.destroy()
+
+# Janela somente leitura com o JSON acumulado
+class JsonViewDialog:
+    def __init__(self, parent, items):
+        self.dialog = tk.Toplevel(parent)
+        self.dialog.title("JSON")
+        self.dialog.geometry("600x500")
+        self.dialog.columnconfigure(0, weight=1)
+        self.dialog.rowconfigure(0, weight=1)
+        
+        y_scroll = ttk.Scrollbar(self.dialog, orient="vertical")
+        x_scroll = ttk.Scrollbar(self.dialog, orient="horizontal")
+        self.text = tk.Text(self.dialog, wrap=tk.NONE, yscrollcommand=y_scroll.set, xscrollcommand=x_scroll.set)
+        self.text.grid(row=0, column=0, sticky="nsew")
+        y_scroll.grid(row=0, column=1, sticky="ns")
+        x_scroll.grid(row=1, column=0, sticky="ew")
+        y_scroll.config(command=self.text.yview)
+        x_scroll.config(command=self.text.xview)
+        
+        self.text.insert("1.0", json.dumps([item.to_sap() for item in items], indent=4, ensure_ascii=False))
+        self.text.config(state=tk.DISABLED)
+        ttk.Button(self.dialog, text="Copiar", command=self.copy).grid(row=2, column=0, pady=5)
+    
+    def copy(self):
+        self.dialog.clipboard_clear()
+        self.dialog.clipboard_append(self.text.get("1.0", "end-1c"))
+
+HISTORY_PAGE_SIZE = 50
+
+# Combobox editável: cada tecla filtra as opções pelo SearchIndex e só as primeiras aparecem na lista
+class SearchableCombobox(ttk.Combobox):
+    IGNORED_KEYS = frozenset({
+        "Up", "Down", "Left", "Right", "Home", "End", "Return", "KP_Enter", "Escape", "Tab",
+        "Shift_L", "Shift_R", "Control_L", "Control_R", "Alt_L", "Alt_R",
+    })
+
+    def __init__(self, parent, search_index=None, max_results=50, **kwargs):
+        super().__init__(parent, **kwargs)
+        self.max_results = max_results
+        self.set_search_index(search_index or SearchIndex([]))
+        self.bind("<KeyRelease>", self.on_key_release)
+        # Ao entrar no campo o texto fica selecionado, pronto para ser substituído pela busca
+        self.bind("<FocusIn>", lambda e: self.select_range(0, tk.END))
+
+    def set_search_index(self, search_index):
+        self.search_index = search_index
+        self['values'] = search_index.search("", self.max_results)
+
+    def on_key_release(self, event):
+        if event.keysym in self.IGNORED_KEYS:
+            return
+        self['values'] = self.search_index.search(self.get(), self.max_results)
+
+
 # Carrega os dados dos fornecedores do arquivo fornecedores.json
 def load_supplier_data():
     return ConfigManager.get_supplier_data()
@@ -112,9 +227,27 @@ class PDFtoJSONApp:
         
         # Inicialização de variáveis primeiro
         self.pdf_text = ""
-        self.total_value = ""
+        self.pdf_text_partial = False
+        self.total_value = None
         self.current_pdf_path = ""
-        self.accumulated_json = []
+        self.vivo_data = None
+        self.current_pdf_digest = ""
+        self.accumulated_items = []
+        # Faturas do JSON atual ainda não registradas: (impressão digital, arquivo, itens, {id(item): CR_NUMBER}).
+        # O dicionário acumula os itens já aceitos pelo SAP: um envio em lotes pode aceitar só parte de uma
+        # fatura e o restante em um envio seguinte
+        self.pending_invoices = []
+        self.invoice_index = None
+        self.load_worker = None
+        self.loading_path = ""
+        self.load_events = None
+        self.load_cancel_event = None
+        self.history_store = None
+        self.history_page = 0
+        self.history_filters = {}
+        
+        # Log em arquivo rotativo + aba Log, alimentados por uma fila (seguro entre threads)
+        self.logger, self.log_handler = setup_logging()
         
         # Configuração da janela principal
         self.root = root
@@ -133,6 +266,13 @@ class PDFtoJSONApp:
         self.supplier_data = load_supplier_data()
         self.material_codes = ConfigManager.get_material_codes()
         
+        # Índices de busca dos comboboxes (os de material são montados na primeira vez que a lista é usada)
+        # CNPJs conhecidos (fornecedores.json + mapeamento da Vivo) para detectar o fornecedor no PDF.
+        # O dropdown oferece os mesmos CNPJs, para que todo fornecedor detectado possa ser selecionado
+        self.cnpj_index = CnpjIndex(self.supplier_data, VIVO_CNPJ_MAPPING)
+        self.supplier_index = self.build_supplier_index()
+        self.material_indexes = {}
+        
         # 1. Criar notebook e frames primeiro
         self.notebook = ttk.Notebook(root)
         self.json_frame = ttk.Frame(self.notebook, padding=(5, 5))
@@ -149,40 +289,101 @@ class PDFtoJSONApp:
         self.notebook.add(self.log_frame, text="Log")
         self.notebook.add(self.history_frame, text="Histórico")
         
-        # 2. Configurar widgets do histórico
+        # 2. Configurar widgets do histórico (lista paginada; detalhes só ao selecionar um envio)
+        self.history_frame.rowconfigure(0, weight=0)
+        self.history_frame.rowconfigure(1, weight=2)
+        self.history_frame.rowconfigure(3, weight=1)
+        
+        history_filter_frame = ttk.Frame(self.history_frame)
+        history_filter_frame.grid(row=0, column=0, columnspan=2, sticky="ew", pady=(0, 5))
+        self.history_date_from_var = tk.StringVar()
+        self.history_date_to_var = tk.StringVar()
+        self.history_supplier_var = tk.StringVar()
+        self.history_cr_var = tk.StringVar()
+        filter_fields = (
+            ("De (DD/MM/AAAA):", self.history_date_from_var, 11),
+            ("Até:", self.history_date_to_var, 11),
+            ("Fornecedor:", self.history_supplier_var, 12),
+            ("CR:", self.history_cr_var, 12),
+        )
+        for column, (label, variable, width) in enumerate(filter_fields):
+            ttk.Label(history_filter_frame, text=label).grid(row=0, column=column * 2, sticky="w", padx=(0, 2))
+            entry = ttk.Entry(history_filter_frame, textvariable=variable, width=width)
+            entry.grid(row=0, column=column * 2 + 1, sticky="w", padx=(0, 8))
+            entry.bind("<Return>", lambda e: self.apply_history_filters())
+        ttk.Button(history_filter_frame, text="Filtrar", command=self.apply_history_filters).grid(row=0, column=8, padx=2)
+        ttk.Button(history_filter_frame, text="Limpar", command=self.clear_history_filters).grid(row=0, column=9, padx=2)
+        
+        history_columns = ("data", "cr", "topdesk", "fornecedores", "total", "status")
         history_y_scroll = ttk.Scrollbar(self.history_frame, orient="vertical")
-        history_x_scroll = ttk.Scrollbar(self.history_frame, orient="horizontal")
-        self.text_history = tk.Text(
+        self.history_tree = ttk.Treeview(
             self.history_frame,
+            columns=history_columns,
+            show="headings",
+            selectmode="browse",
             yscrollcommand=history_y_scroll.set,
-            xscrollcommand=history_x_scroll.set,
+            height=8
+        )
+        for column, heading, width in (
+            ("data", "Data/Hora", 130), ("cr", "CR", 90), ("topdesk", "TOPdesk", 90),
+            ("fornecedores", "Fornecedores", 150), ("total", "Total", 100), ("status", "Status", 60),
+        ):
+            self.history_tree.heading(column, text=heading)
+            self.history_tree.column(column, width=width, stretch=(column == "fornecedores"))
+        self.history_tree.grid(row=1, column=0, sticky="nsew")
+        history_y_scroll.grid(row=1, column=1, sticky="ns")
+        history_y_scroll.config(command=self.history_tree.yview)
+        self.history_tree.bind("<<TreeviewSelect>>", self.show_history_details)
+        
+        history_page_frame = ttk.Frame(self.history_frame)
+        history_page_frame.grid(row=2, column=0, columnspan=2, sticky="ew", pady=5)
+        history_page_frame.columnconfigure(1, weight=1)
+        self.btn_history_prev = ttk.Button(history_page_frame, text="< Anterior", command=lambda: self.change_history_page(-1))
+        self.btn_history_prev.grid(row=0, column=0)
+        self.history_page_label = ttk.Label(history_page_frame, text="", anchor="center")
+        self.history_page_label.grid(row=0, column=1, sticky="ew")
+        self.btn_history_next = ttk.Button(history_page_frame, text="Próxima >", command=lambda: self.change_history_page(1))
+        self.btn_history_next.grid(row=0, column=2)
+        
+        details_y_scroll = ttk.Scrollbar(self.history_frame, orient="vertical")
+        self.text_history = tk.Text(
+            self.history_frame,
+            yscrollcommand=details_y_scroll.set,
             wrap=tk.NONE,
-            state=tk.DISABLED  # Começa em modo somente leitura
+            height=8,
+            state=tk.DISABLED  # Somente leitura
         )
+        self.text_history.grid(row=3, column=0, sticky="nsew")
+        details_y_scroll.grid(row=3, column=1, sticky="ns")
+        details_y_scroll.config(command=self.text_history.yview)
         
-        # Layout do histórico
-        self.text_history.grid(row=0, column=0, sticky="nsew")
-        history_y_scroll.grid(row=0, column=1, sticky="ns")
-        history_x_scroll.grid(row=1, column=0, sticky="ew")
-        history_y_scroll.config(command=self.text_history.yview)
-        history_x_scroll.config(command=self.text_history.xview)
-        
-        # 3. Configurar widgets do JSON
-        json_y_scroll = ttk.Scrollbar(self.json_frame, orient="vertical")
-        json_x_scroll = ttk.Scrollbar(self.json_frame, orient="horizontal")
-        self.text_json_input = tk.Text(
-            self.json_frame, 
-            yscrollcommand=json_y_scroll.set,
-            xscrollcommand=json_x_scroll.set,
-            wrap=tk.NONE
+        # 3. Configurar tabela de itens (só recebe as linhas novas; o JSON é montado ao pedir)
+        item_columns = ("PREQ_ITEM", "MATERIAL", "SHORT_TEXT", "PREQ_PRICE")
+        items_y_scroll = ttk.Scrollbar(self.json_frame, orient="vertical")
+        self.items_tree = ttk.Treeview(
+            self.json_frame,
+            columns=item_columns,
+            show="headings",
+            selectmode="browse",
+            yscrollcommand=items_y_scroll.set
         )
+        for column, width in zip(item_columns, (80, 100, 300, 100)):
+            self.items_tree.heading(column, text=column)
+            self.items_tree.column(column, width=width, stretch=(column == "SHORT_TEXT"),
+                                   anchor="e" if column == "PREQ_PRICE" else "w")
+        self.items_tree.grid(row=0, column=0, sticky="nsew")
+        items_y_scroll.grid(row=0, column=1, sticky="ns")
+        items_y_scroll.config(command=self.items_tree.yview)
+        self.items_tree.bind("<Double-Button-1>", lambda e: self.edit_selected_item())
+        self.items_tree.bind("<Delete>", lambda e: self.remove_selected_item())
         
-        # Layout do JSON
-        self.text_json_input.grid(row=0, column=0, sticky="nsew")
-        json_y_scroll.grid(row=0, column=1, sticky="ns")
-        json_x_scroll.grid(row=1, column=0, sticky="ew")
-        json_y_scroll.config(command=self.text_json_input.yview)
-        json_x_scroll.config(command=self.text_json_input.xview)
+        items_button_frame = ttk.Frame(self.json_frame)
+        items_button_frame.grid(row=1, column=0, columnspan=2, sticky="ew", pady=(5, 0))
+        ttk.Button(items_button_frame, text="Editar item", command=self.edit_selected_item).pack(side="left", padx=5)
+        ttk.Button(items_button_frame, text="Remover item", command=self.remove_selected_item).pack(side="left", padx=5)
+        ttk.Button(items_button_frame, text="Ver JSON", command=self.show_json).pack(side="left", padx=5)
+        self.items_count_label = ttk.Label(items_button_frame, text="0 itens")
+        self.items_count_label.pack(side="right", padx=5)
         
         # 4. Configurar widgets do log
         log_y_scroll = ttk.Scrollbar(self.log_frame, orient="vertical")
@@ -205,6 +406,14 @@ class PDFtoJSONApp:
         self.text_log.tag_configure("error", foreground="red")
         self.text_log.tag_configure("warning", foreground="orange")
         
+        ttk.Button(self.log_frame, text="Resumo de desempenho", command=self.show_trace_summary).grid(
+            row=1, column=0, sticky="w", pady=(5, 0)
+        )
+
+        # A aba Log é atualizada em lotes por timer e guarda só as últimas linhas
+        self.log_view = LogView(self.text_log, self.log_handler, max_lines=1000)
+        self.log_view.start()
+        
         # 5. Frame para exibição do PDF carregado
         self.pdf_info_frame = ttk.LabelFrame(root, text="PDF Atual", padding=(10, 5))
         self.pdf_info_frame.grid(row=0, column=0, sticky="nsew", padx=10, pady=5)
@@ -212,12 +421,22 @@ class PDFtoJSONApp:
         self.current_pdf_label = ttk.Label(self.pdf_info_frame, text="Nenhum PDF carregado")
         self.current_pdf_label.grid(row=0, column=0, sticky="ew")
         
+        # Progresso do carregamento (visível só enquanto o PDF é lido)
+        self.load_progress = ttk.Progressbar(self.pdf_info_frame, mode="determinate")
+        self.load_progress.grid(row=1, column=0, sticky="ew", pady=(5, 0))
+        self.load_status_label = ttk.Label(self.pdf_info_frame, text="")
+        self.load_status_label.grid(row=2, column=0, sticky="w")
+        self.load_progress.grid_remove()
+        self.load_status_label.grid_remove()
+        
         # 6. Frame de botões do PDF
         self.button_frame = ttk.Frame(root)
         self.button_frame.grid(row=1, column=0, sticky="ew", pady=5, padx=10)
         self.button_frame.columnconfigure(1, weight=1)
         self.btn_load_pdf = ttk.Button(self.button_frame, text="Carregar PDF", command=self.load_pdf)
         self.btn_load_pdf.grid(row=0, column=0, padx=5)
+        self.btn_cancel_load = ttk.Button(self.button_frame, text="Cancelar", command=self.cancel_pdf_load, state="disabled")
+        self.btn_cancel_load.grid(row=0, column=1, padx=5, sticky="w")
         self.btn_clear_pdf = ttk.Button(self.button_frame, text="Limpar PDF Atual", command=self.clear_current_pdf)
         self.btn_clear_pdf.grid(row=0, column=2, padx=5)
         
@@ -245,7 +464,7 @@ class PDFtoJSONApp:
         self.label_supplier_code = ttk.Label(input_frame, text="Fornecedor:")
         self.label_supplier_code.grid(row=1, column=0, sticky="w", pady=2)
         self.supplier_code_var = tk.StringVar()
-        self.supplier_code_dropdown = ttk.Combobox(input_frame, textvariable=self.supplier_code_var, values=self.get_supplier_options(), state="readonly")
+        self.supplier_code_dropdown = SearchableCombobox(input_frame, self.supplier_index, textvariable=self.supplier_code_var)
         self.supplier_code_dropdown.grid(row=1, column=1, sticky="ew", padx=5)
         self.supplier_code_var.set("Selecione o fornecedor")
         
@@ -253,7 +472,7 @@ class PDFtoJSONApp:
         self.label_material_code = ttk.Label(input_frame, text="Material/Serviço:")
         self.label_material_code.grid(row=2, column=0, sticky="w", pady=2)
         self.material_code_var = tk.StringVar()
-        self.material_code_dropdown = ttk.Combobox(input_frame, textvariable=self.material_code_var, state="readonly")
+        self.material_code_dropdown = SearchableCombobox(input_frame, textvariable=self.material_code_var)
         self.material_code_dropdown.grid(row=2, column=1, sticky="ew", padx=5)
         
         # Inicializar o dropdown de materiais
@@ -284,9 +503,34 @@ class PDFtoJSONApp:
         self.sap_response_frame.columnconfigure(0, weight=1)
         self.sap_response_label = ttk.Label(self.sap_response_frame, text="Nenhuma requisição enviada ainda")
         self.sap_response_label.grid(row=0, column=0, sticky="ew")
+        # Estado do disjuntor e latências do endpoint (atualizado periodicamente)
+        self.sap_health_label = ttk.Label(self.sap_response_frame, text="")
+        self.sap_health_label.grid(row=1, column=0, sticky="ew")
+        self.refresh_sap_health()
         
         # Log inicial
         self.add_log("Aplicação iniciada", "info")
+        
+        # Cache de extração em disco (compartilhado com outras instâncias do aplicativo)
+        try:
+            self.extraction_cache = ExtractionCache()
+        except Exception as e:
+            self.extraction_cache = None
+            self.add_log(f"Cache de extração desativado: {e}", "warning")
+        
+        # Histórico de envios ao SAP em disco
+        try:
+            self.history_store = HistoryStore()
+        except Exception as e:
+            self.history_store = None
+            self.add_log(f"Histórico de envios desativado: {e}", "warning")
+        self.refresh_history()
+        
+        # Índice das faturas já enviadas (aviso de duplicidade)
+        try:
+            self.invoice_index = InvoiceIndex()
+        except Exception as e:
+            self.add_log(f"Verificação de faturas duplicadas desativada: {e}", "warning")
     
     # Método para atualizar o dropdown de materiais conforme o checkbox
     def update_material_dropdown(self):
@@ -298,14 +542,19 @@ class PDFtoJSONApp:
         # Determinar qual lista usar
         category = "servicos" if is_servico else "materiais"
         
-        # Obter lista de códigos formatados
-        codes = [f"{item['codigo']} - {item['descricao']}" for item in self.material_codes.get(category, [])]
+        # O índice de cada lista é montado uma única vez
+        index = self.material_indexes.get(category)
+        if index is None:
+            index = self.material_indexes[category] = SearchIndex([
+                (f"{item['codigo']} - {item['descricao']}", (item['codigo'], item['descricao']))
+                for item in self.material_codes.get(category, [])
+            ])
         
         # Atualizar dropdown
-        self.material_code_dropdown['values'] = codes
+        self.material_code_dropdown.set_search_index(index)
         
         # Selecionar o primeiro item como padrão se houver itens
-        if codes:
+        if len(index):
             self.material_code_dropdown.current(0)
         
         self.add_log(f"Atualizada lista de {'serviços' if is_servico else 'materiais'}", "info")
@@ -314,57 +563,164 @@ class PDFtoJSONApp:
     def update_sap_response(self, response):
         """Exibe apenas a resposta da API no label do SAP."""
         try:
-            status = response.status_code if hasattr(response, 'status_code') else "N/A"
-            text = response.text if hasattr(response, 'text') else str(response)
-            msg = f"Status: {status}\n{text}"
+            if hasattr(response, 'chunks'):
+                # Envio em lotes: um status combinado e uma linha por lote
+                msg = "Envio em lotes: " + response.text
+            else:
+                status = response.status_code if hasattr(response, 'status_code') else "N/A"
+                text = response.text if hasattr(response, 'text') else str(response)
+                msg = f"Status: {status}\n{text}"
             
             self.sap_response_label.config(text=msg) 
 
         except Exception as e:
             self.add_log(f"Erro ao atualizar resposta SAP: {e}", "error")
 
+    # Atualiza a linha com o estado do circuito, o limite de simultâneas e as latências do SAP
+    def refresh_sap_health(self):
+        controller = get_controller()
+        self.sap_health_label.config(
+            text=controller.format_stats(),
+            foreground="" if controller.state == STATE_CLOSED else "red"
+        )
+        self.root.after(1000, self.refresh_sap_health)
+
     # Função para adicionar entrada ao histórico
     def add_to_history(self, payload, response):
-        """Registra o payload enviado e a resposta do SAP no histórico."""
+        """Registra o payload enviado e a resposta do SAP no histórico persistente."""
+        if self.history_store is None:
+            self.add_log("Histórico desativado: envio não registrado", "warning")
+            return
         try:
-            self.text_history.config(state=tk.NORMAL)  
-            
-            timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-            status_code = response.status_code if hasattr(response, 'status_code') else "N/A"
-            response_text = response.text if hasattr(response, 'text') else str(response)
-            
-            entry = f"""
-    {'='*80}
-    DATA/HORA: {timestamp}
-    STATUS: {status_code}
+            self.history_store.add(payload, response)
+        except Exception as e:
+            self.add_log(f"Erro ao gravar o histórico: {e}", "error")
+            return
+        self.history_page = 0
+        self.refresh_history()
+
+    # Converte a data digitada (DD/MM/AAAA) para o formato do banco (AAAA-MM-DD)
+    def parse_history_date(self, text):
+        text = text.strip()
+        if not text:
+            return None
+        return datetime.strptime(text, "%d/%m/%Y").strftime("%Y-%m-%d")
+
+    # Lê os campos de filtro do histórico
+    def read_history_filters(self):
+        return {
+            "date_from": self.parse_history_date(self.history_date_from_var.get()),
+            "date_to": self.parse_history_date(self.history_date_to_var.get()),
+            "supplier": self.history_supplier_var.get().strip() or None,
+            "cr_number": self.history_cr_var.get().strip() or None,
+        }
+
+    def apply_history_filters(self):
+        try:
+            self.history_filters = self.read_history_filters()
+        except ValueError:
+            messagebox.showerror("Erro", "Data inválida! Use o formato DD/MM/AAAA.")
+            return
+        self.history_page = 0
+        self.refresh_history()
 
-    PAYLOAD ENVIADO:
-    {json.dumps(payload, indent=2, ensure_ascii=False)}
+    def clear_history_filters(self):
+        for variable in (self.history_date_from_var, self.history_date_to_var,
+                         self.history_supplier_var, self.history_cr_var):
+            variable.set("")
+        self.apply_history_filters()
 
-    RESPOSTA RECEBIDA:
-    {response_text}
-    {'='*80}
-    """
+    def change_history_page(self, step):
+        self.history_page = max(0, self.history_page + step)
+        self.refresh_history()
 
-            self.text_history.insert("1.0", entry)
-            self.text_history.see("1.0")  
+    # Carrega só a página atual do histórico (o payload completo fica no banco até ser selecionado)
+    def refresh_history(self):
+        self.history_tree.delete(*self.history_tree.get_children())
+        self.set_history_details("")
+        if self.history_store is None:
+            self.history_page_label.config(text="Histórico indisponível")
+            self.btn_history_prev.config(state="disabled")
+            self.btn_history_next.config(state="disabled")
+            return
+        try:
+            total = self.history_store.count(**self.history_filters)
+            pages = max(1, -(-total // HISTORY_PAGE_SIZE))
+            self.history_page = min(self.history_page, pages - 1)
+            rows = self.history_store.page(self.history_page, HISTORY_PAGE_SIZE, **self.history_filters)
+        except Exception as e:
+            self.add_log(f"Erro ao consultar o histórico: {e}", "error")
+            return
+        for envio_id, data_hora, cr_number, topdesk_key, suppliers, total_cents, status_code in rows:
+            self.history_tree.insert("", "end", iid=str(envio_id), values=(
+                data_hora, cr_number, topdesk_key, suppliers,
+                f"R$ {Money(total_cents)}" if total_cents is not None else "", status_code if status_code is not None else "N/A"
+            ))
+        self.history_page_label.config(text=f"Página {self.history_page + 1} de {pages} ({total} envios)")
+        self.btn_history_prev.config(state="normal" if self.history_page > 0 else "disabled")
+        self.btn_history_next.config(state="normal" if self.history_page < pages - 1 else "disabled")
+
+    # Mostra o payload e a resposta do envio selecionado
+    def show_history_details(self, event=None):
+        selection = self.history_tree.selection()
+        if not selection or self.history_store is None:
+            return
+        try:
+            payload, response_text = self.history_store.details(int(selection[0]))
+        except Exception as e:
+            self.add_log(f"Erro ao ler o envio do histórico: {e}", "error")
+            return
+        self.set_history_details(
+            f"PAYLOAD ENVIADO:\n{json.dumps(payload, indent=2, ensure_ascii=False)}\n\n"
+            f"RESPOSTA RECEBIDA:\n{response_text}"
+        )
 
+    def set_history_details(self, text):
+        self.text_history.config(state=tk.NORMAL)
+        try:
+            self.text_history.delete("1.0", tk.END)
+            self.text_history.insert("1.0", text)
         finally:
-            self.text_history.config(state=tk.DISABLED)  
+            self.text_history.config(state=tk.DISABLED)
 
     # Função para adicionar entradas ao log
     def add_log(self, message, level="info"):
-        """Adiciona apenas mensagens e a resposta do SAP ao log, sem incluir payloads grandes."""
-        timestamp = datetime.now().strftime("%H:%M:%S")
-        self.text_log.insert(tk.END, f"[{timestamp}] ", "info")
-        self.text_log.insert(tk.END, f"{message}\n", level)
-        self.text_log.see(tk.END)  
-        self.root.update_idletasks() 
-
-    # Retorna as opções de fornecedores para o dropdown 
-    def get_supplier_options(self):
-        return [f"{cnpj} - {code}" for cnpj, code in self.supplier_data.items()]
+        """Adiciona apenas mensagens e a resposta do SAP ao log, sem incluir payloads grandes.
+        Pode ser chamada de qualquer thread: a exibição é feita pelo LogView."""
+        self.logger.log(LEVELS.get(level, LEVELS["info"]), message)
+
+    # Mostra no Log o p50/p95 de cada etapa medida nesta sessão (spans do tracing)
+    def show_trace_summary(self):
+        for line in get_tracer().format_summary().splitlines():
+            self.add_log(line, "info")
+
+    # Índice de busca das opções de fornecedores do dropdown (por CNPJ ou código SAP), incluindo os
+    # CNPJs da Vivo que só existem no mapeamento fixo
+    def build_supplier_index(self):
+        # Montado em uma thread: com dezenas de milhares de fornecedores leva mais de um segundo
+        return SearchIndex([(f"{cnpj} - {code}", (cnpj, code)) for cnpj, code in self.cnpj_index.entries()],
+                           background=True)
     
+    # Pré-seleciona o fornecedor pelos CNPJs impressos no PDF; devolve a linha para o label do PDF
+    def detect_supplier(self):
+        # O dropdown tem todos os CNPJs do índice, então qualquer fornecedor encontrado pode ser selecionado
+        matches = self.cnpj_index.detect(self.pdf_text)
+        if not matches:
+            self.add_log("Nenhum CNPJ de fornecedor cadastrado encontrado no PDF", "info")
+            return ""
+
+        # O CNPJ do emitente costuma ser o primeiro do documento
+        chosen = matches[0]
+        self.supplier_code_var.set(f"{chosen.cnpj} - {chosen.code}")
+        if len(matches) == 1:
+            self.add_log(f"Fornecedor detectado pelo CNPJ: {chosen.cnpj} ({chosen.code})", "success")
+            return f"\nFornecedor detectado: {chosen.code}"
+
+        others = ", ".join(f"{match.cnpj} ({match.code})" for match in matches[1:])
+        self.add_log(f"Vários fornecedores encontrados no PDF. Selecionado {chosen.cnpj} ({chosen.code}); "
+                     f"também aparecem: {others}. Confira o fornecedor.", "warning")
+        return f"\nFornecedor detectado: {chosen.code} ({len(matches)} possíveis, confira)"
+
     # Mostra ou esconde os campos de seleção de fornecedor dependendo da seleção do checkbox da Vivo Móvel
     def toggle_supplier_selection(self):
         if self.is_vivo_movel_var.get():
@@ -384,78 +740,340 @@ class PDFtoJSONApp:
     # Limpa o PDF atual
     def clear_current_pdf(self):
         self.pdf_text = ""
-        self.total_value = ""
+        self.pdf_text_partial = False
+        self.total_value = None
         self.current_pdf_path = ""
+        self.vivo_data = None
+        self.current_pdf_digest = ""
         self.current_pdf_label.config(text="Nenhum PDF carregado")
         self.add_log("PDF atual limpo", "info")
     
     # Limpa o JSON acumulado
     def clear_json(self):
         """Limpa o JSON acumulado"""
-        if self.accumulated_json:
+        if self.accumulated_items:
             if messagebox.askyesno("Confirmar", "Deseja realmente limpar o JSON?"):
-                self.accumulated_json = []
-                self.text_json_input.delete("1.0", tk.END)
+                self.clear_items()
                 self.add_log("JSON limpo", "info")
         else:
             self.add_log("Nenhum JSON para limpar", "warning")
     
-    # Carrega um PDF
+    # Acrescenta itens ao JSON acumulado (numerando PREQ_ITEM) e insere só as linhas novas na tabela
+    def append_items(self, items):
+        start = len(self.accumulated_items)
+        self.accumulated_items.extend(items)
+        renumber(self.accumulated_items, start)
+        for item in items:
+            self.items_tree.insert("", "end", values=self.item_row(item))
+        children = self.items_tree.get_children()
+        if children:
+            self.items_tree.see(children[-1])
+        self.update_items_count()
+
+    def clear_items(self):
+        self.accumulated_items = []
+        self.pending_invoices = []
+        self.items_tree.delete(*self.items_tree.get_children())
+        self.update_items_count()
+
+    # Remove os itens informados (mesmos objetos) e renumera os restantes
+    def remove_items(self, items):
+        removed = {id(item) for item in items}
+        remaining = [item for item in self.accumulated_items if id(item) not in removed]
+        pending = self.pending_invoices
+        self.clear_items()
+        self.append_items(remaining)
+        self.pending_invoices = pending
+        self.prune_pending_invoices()
+
+    @staticmethod
+    def item_row(item):
+        return (f"{item.preq_item:04}", item.material, item.short_text, str(item.price))
+
+    def update_items_count(self):
+        count = len(self.accumulated_items)
+        self.items_count_label.config(text=f"{count} {'item' if count == 1 else 'itens'}")
+
+    # Renumera PREQ_ITEM (10, 20, 30...) a partir da posição indicada; as linhas anteriores não mudam
+    def renumber_items(self, start):
+        renumber(self.accumulated_items, start)
+        children = self.items_tree.get_children()
+        for index in range(start, len(self.accumulated_items)):
+            self.items_tree.set(children[index], "PREQ_ITEM", f"{self.accumulated_items[index].preq_item:04}")
+
+    # Devolve (iid, posição) da linha selecionada na tabela de itens
+    def selected_item(self):
+        selection = self.items_tree.selection()
+        if not selection:
+            messagebox.showwarning("Aviso", "Selecione um item na tabela.")
+            return None, None
+        return selection[0], self.items_tree.index(selection[0])
+
+    def remove_selected_item(self):
+        iid, index = self.selected_item()
+        if iid is None:
+            return
+        item = self.accumulated_items.pop(index)
+        self.items_tree.delete(iid)
+        self.renumber_items(index)
+        self.update_items_count()
+        self.prune_pending_invoices()
+        self.add_log(f"Item {item.preq_item:04} removido do JSON", "info")
+
+    def edit_selected_item(self):
+        iid, index = self.selected_item()
+        if iid is None:
+            return
+        item = self.accumulated_items[index]
+        dialog = ItemEditDialog(self.root, item)
+        if dialog.result:
+            for attribute, value in dialog.result.items():
+                setattr(item, attribute, value)
+            self.items_tree.item(iid, values=self.item_row(item))
+            self.add_log(f"Item {item.preq_item:04} alterado", "info")
+
+    # Esquece as faturas pendentes que não têm mais nenhum item no JSON
+    def prune_pending_invoices(self):
+        current = {id(item) for item in self.accumulated_items}
+        self.pending_invoices = [
+            invoice for invoice in self.pending_invoices
+            if any(id(item) in current for item in invoice[2])
+        ]
+
+    # Impressão digital do PDF carregado (hash, fornecedor, CNPJ, valor e mês de referência)
+    def current_fingerprint(self):
+        if self.is_vivo_movel_var.get() and self.vivo_data:
+            notas = self.vivo_data["notas_fiscais"]
+            return make_fingerprint(
+                self.current_pdf_digest,
+                f"VIVO {self.vivo_data['numero_conta']}",
+                notas[0]["cnpj"] if notas else "",
+                sum(Money.parse_br(nf["total"]).cents for nf in notas),
+                self.vivo_data["mes_referencia"]
+            )
+        supplier = self.supplier_code_var.get()
+        cnpj, code = supplier.split(" - ", 1) if supplier in self.supplier_index else ("", "")
+        return make_fingerprint(
+            self.current_pdf_digest, code, cnpj,
+            self.total_value.cents if self.total_value else 0,
+            reference_month(self.pdf_text)
+        )
+
+    # Lançamentos anteriores da fatura: enviados ao SAP (índice) ou já no JSON atual
+    def find_duplicates(self, fingerprint):
+        with span("duplicidade.verificar") as current:
+            hits = self.invoice_index.check(fingerprint) if self.invoice_index is not None else []
+            for pending, filename, _, _ in self.pending_invoices:
+                hits += [DuplicateHit(reason, None, None, filename) for reason in match_reasons(fingerprint, pending)]
+            current.set(repeticoes=len(hits))
+        return hits
+
+    # Avisa (sem bloquear) se o PDF recém-carregado já foi lançado
+    def warn_duplicates(self):
+        hits = self.find_duplicates(self.current_fingerprint())
+        if hits:
+            details = describe_hits(hits)
+            self.add_log(f"Fatura possivelmente duplicada:\n{details}", "warning")
+            messagebox.showwarning("Fatura possivelmente duplicada",
+                                   f"Esta fatura parece já ter sido lançada:\n\n{details}")
+
+    # Acrescenta os itens de uma fatura ao JSON, confirmando antes se ela parece duplicada
+    def add_invoice_items(self, new_items):
+        fingerprint = self.current_fingerprint()
+        hits = self.find_duplicates(fingerprint)
+        if hits:
+            details = describe_hits(hits)
+            if not messagebox.askyesno("Fatura possivelmente duplicada",
+                                       f"Esta fatura parece já ter sido lançada:\n\n{details}\n\n"
+                                       "Adicionar ao JSON mesmo assim?"):
+                self.add_log(f"Fatura duplicada não adicionada ao JSON:\n{details}", "warning")
+                return False
+            self.add_log(f"Fatura possivelmente duplicada adicionada por confirmação do usuário:\n{details}", "warning")
+        self.append_items(new_items)
+        self.pending_invoices.append((fingerprint, self.current_pdf_path.split("/")[-1], list(new_items), {}))
+        self.add_log(f"Adicionados {len(new_items)} itens ao JSON", "success")
+        return True
+
+    # Registra no índice as faturas cujos itens foram todos aceitos pelo SAP, somando os aceitos em
+    # envios anteriores; as faturas registradas saem da lista de pendentes
+    def record_sent_invoices(self, cr_by_item):
+        if self.invoice_index is None or not cr_by_item:
+            return
+        remaining = []
+        for invoice in self.pending_invoices:
+            fingerprint, filename, items, accepted = invoice
+            accepted.update((id(item), cr_by_item[id(item)]) for item in items if id(item) in cr_by_item)
+            if len(accepted) < len(items):
+                remaining.append(invoice)
+                continue
+            try:
+                self.invoice_index.record(fingerprint, ", ".join(sorted(set(accepted.values()))), filename)
+            except Exception as e:
+                self.add_log(f"Erro ao registrar a fatura {filename} no índice de duplicidade: {e}", "error")
+        self.pending_invoices = remaining
+
+    # Mostra o JSON acumulado (montado só quando pedido)
+    def show_json(self):
+        JsonViewDialog(self.root, self.accumulated_items)
+
+    # Carrega um PDF: a extração roda em uma thread e o resultado volta ao loop do Tk via after()
     def load_pdf(self):
+        if self.load_worker is not None:
+            return
         filepath = filedialog.askopenfilename(filetypes=[("PDF Files", "*.pdf")])
         if not filepath:
             return
+        filename = filepath.split("/")[-1]
+        self.add_log(f"Carregando PDF: {filename}", "info")
+
+        self.loading_path = filepath
+        self.load_events = queue.Queue()
+        self.load_cancel_event = threading.Event()
+        self.load_worker = threading.Thread(
+            target=self.load_pdf_worker,
+            args=(filepath, self.load_events, self.load_cancel_event),
+            daemon=True
+        )
+        self.set_loading(True)
+        self.load_worker.start()
+        self.root.after(100, self.poll_pdf_load)
+
+    # Executado na thread de carregamento: não pode tocar em widgets, só publica eventos na fila
+    # (add_log pode ser usado, pois só grava no logger)
+    def load_pdf_worker(self, filepath, events, cancel_event):
+        def progress(done, total):
+            if cancel_event.is_set():
+                raise ExtractionCancelled()
+            events.put(("progress", (done, total)))
+
+        try:
+            # O layout (Vivo Móvel, boleto, NFS-e...) é identificado pelo conteúdo do PDF
+            result = load_document(
+                filepath, self.extraction_cache, streaming=True,
+                log_callback=self.add_log, progress_callback=progress
+            )
+            events.put(("done", result))
+        except ExtractionCancelled:
+            events.put(("cancelled", None))
+        except Exception as e:
+            events.put(("error", e))
+
+    # Lê os eventos da thread de carregamento
+    def poll_pdf_load(self):
+        try:
+            while True:
+                kind, value = self.load_events.get_nowait()
+                if kind == "progress":
+                    done, total = value
+                    self.load_progress.config(maximum=total, value=done)
+                    self.load_status_label.config(text=f"Lendo página {done} de {total}")
+                else:
+                    filepath = self.loading_path
+                    self.load_worker = None
+                    self.set_loading(False)
+                    if kind == "done":
+                        self.finish_pdf_load(filepath, value)
+                    elif kind == "cancelled":
+                        self.add_log("Carregamento do PDF cancelado", "warning")
+                    else:
+                        self.add_log(f"Erro ao ler o PDF: {value}", "error")
+                        messagebox.showerror("Erro", f"Erro ao ler o PDF: {value}")
+                    return
+        except queue.Empty:
+            pass
+        self.root.after(100, self.poll_pdf_load)
+
+    # Cancela o carregamento em andamento (a thread para na próxima página)
+    def cancel_pdf_load(self):
+        if self.load_worker is not None:
+            self.load_cancel_event.set()
+            self.load_status_label.config(text="Cancelando...")
+
+    # Mostra/esconde a barra de progresso e ajusta os botões durante o carregamento
+    def set_loading(self, loading):
+        if loading:
+            self.load_progress.config(value=0)
+            self.load_progress.grid()
+            self.load_status_label.grid()
+            self.btn_load_pdf.config(state="disabled")
+            self.btn_cancel_load.config(state="normal")
+        else:
+            self.load_progress.grid_remove()
+            self.load_status_label.grid_remove()
+            self.load_status_label.config(text="")
+            self.btn_load_pdf.config(state="normal")
+            self.btn_cancel_load.config(state="disabled")
+
+    # Conclui o carregamento no loop do Tk com o resultado da thread
+    def finish_pdf_load(self, filepath, result):
         try:
             filename = filepath.split("/")[-1]
-            self.add_log(f"Carregando PDF: {filename}", "info")
-
-            # Verificação para Vivo Móvel pelo nome do arquivo
-            if "VIVO" in filename.upper() and "MOVEL" in filename.upper():
-                # Para Vivo Móvel, apenas extrair o texto sem processamento de valores
-                doc = fitz.open(filepath)
-                self.pdf_text = ""
-                for page in doc:
-                    page_text = page.get_text("text")
-                    page_text = " ".join(page_text.splitlines())
-                    self.pdf_text += page_text + "\n"
-                doc.close()
+            self.current_pdf_digest = result.get("digest", "")
+            # Guardado antes de tudo: o modo Vivo Móvel ativado à mão relê o arquivo
+            self.current_pdf_path = filepath
+
+            if result["layout"] == LAYOUT_VIVO_MOVEL:
+                self.pdf_text, self.vivo_data = result["text"], result["data"]
 
                 self.is_vivo_movel_var.set(True)
                 self.toggle_supplier_selection()
-                self.current_pdf_path = filepath
                 self.current_pdf_label.config(text=f"PDF Atual: {filename}\nFatura Vivo Móvel Detectada")
                 self.add_log("Fatura Vivo Móvel detectada e carregada com sucesso", "success")
                 messagebox.showinfo("Sucesso", "Fatura Vivo Móvel Detectada e Carregada!")
+                self.warn_duplicates()
                 return
 
             # Para outros tipos de PDF, mantém o processamento normal
-            self.pdf_text, values = extract_text_from_pdf(filepath)
-            if values and len(values) > 1:
+            self.pdf_text, values = result["text"], result["values"]
+            self.pdf_text_partial = result.get("partial", False)
+            scores = result.get("scores") or []
+            accepted = auto_accept(scores, self.auto_accept_threshold())
+            # O valor escolhido é convertido uma única vez para centavos
+            if values and len(values) > 1 and accepted:
+                self.total_value = Money.parse_br(accepted.value)
+                self.add_log(f"Valor aceito automaticamente: R$ {self.total_value} "
+                             f"(confiança {accepted.confidence:.0%}: {', '.join(accepted.reasons)})", "info")
+            elif values and len(values) > 1:
                 self.add_log(f"Múltiplos valores encontrados: {len(values)}", "warning")
-                dialog = ValueSelectorDialog(self.root, values)
+                # O tempo que o usuário leva para escolher também aparece no resumo de desempenho
+                with span("dialogo.selecao_valor", candidatos=len(values)) as current:
+                    dialog = ValueSelectorDialog(self.root, values, scores)
+                    current.set(selecionado=bool(dialog.selected_value))
                 if dialog.selected_value:
-                    self.total_value = dialog.selected_value
+                    self.total_value = Money.parse_br(dialog.selected_value)
                     self.add_log(f"Valor selecionado: R$ {self.total_value}", "info")
                 else:
-                    self.total_value = values[0]
+                    self.total_value = Money.parse_br(values[0])
                     self.add_log(f"Nenhum valor selecionado. Usando o primeiro: R$ {self.total_value}", "warning")
             elif values:
-                self.total_value = values[0]
+                self.total_value = Money.parse_br(values[0])
                 self.add_log(f"Valor encontrado: R$ {self.total_value}", "info")
             else:
                 self.add_log("Valor total não encontrado no PDF", "error")
                 messagebox.showwarning("Aviso", "Valor total não encontrado no PDF.")
                 return
 
-            self.current_pdf_path = filepath
-            self.current_pdf_label.config(text=f"PDF Atual: {filename}\nValor total: R$ {self.total_value}")
+            supplier_note = self.detect_supplier()
+            self.current_pdf_label.config(
+                text=f"PDF Atual: {filename} ({LAYOUT_NAMES[result['layout']]})\n"
+                     f"Valor total: R$ {self.total_value}{supplier_note}"
+            )
             self.add_log(f"PDF carregado com sucesso: {filename}", "success")
             messagebox.showinfo("Sucesso", f"PDF carregado com sucesso! Valor total: {self.total_value}")
+            self.warn_duplicates()
 
         except Exception as e:
             self.add_log(f"Erro ao ler o PDF: {e}", "error")
             messagebox.showerror("Erro", f"Erro ao ler o PDF: {e}")
 
+    # Limiar de confiança para aceitar o valor sem abrir a seleção (parametros.json)
+    def auto_accept_threshold(self):
+        params = ConfigManager.load_json_file('parametros.json')
+        try:
+            return float(params.get("limiar_aceite_automatico", AUTO_ACCEPT_THRESHOLD))
+        except (TypeError, ValueError):
+            return AUTO_ACCEPT_THRESHOLD
+
     # Gera o JSON baseado no PDF carregado
     def generate_json(self):
         if not self.pdf_text:
@@ -467,13 +1085,13 @@ class PDFtoJSONApp:
         
         try:
             # Verifica se o fornecedor foi selecionado corretamente
-            if not is_vivo_movel and self.supplier_code_var.get() == "Selecione o fornecedor":
+            if not is_vivo_movel and self.supplier_code_var.get() not in self.supplier_index:
                 self.add_log("Tentativa de gerar JSON sem selecionar fornecedor", "error")
                 messagebox.showerror("Erro", "Selecione um fornecedor válido!")
                 return
             
             # Verificar se material/serviço foi selecionado
-            if not self.material_code_var.get():
+            if self.material_code_var.get() not in self.material_code_dropdown.search_index:
                 self.add_log("Tentativa de gerar JSON sem selecionar material/serviço", "error")
                 messagebox.showerror("Erro", "Selecione um material ou serviço!")
                 return
@@ -481,18 +1099,23 @@ class PDFtoJSONApp:
             # Extrair o código do material selecionado (antes do " - ")
             material_code = self.material_code_var.get().split(" - ")[0]
             
-            # Calcular próximo PREQ_ITEM baseado no JSON acumulado
-            next_preq_item = 10
-            if self.accumulated_json:
-                last_preq_item = int(self.accumulated_json[-1]["PREQ_ITEM"])
-                next_preq_item = last_preq_item + 10
+            # Calcular próximo PREQ_ITEM baseado nos itens acumulados
+            next_preq_item = (len(self.accumulated_items) + 1) * 10
             
             self.add_log(f"Gerando JSON, próximo PREQ_ITEM: {next_preq_item}", "info")
             
             # Extrair dados da fatura da Vivo Móvel
             if is_vivo_movel:
                 self.add_log("Processando fatura Vivo Móvel", "info")
-                data = extrair_dados_vivo_movel(self.pdf_text)
+                # Os dados já vêm prontos do carregamento. Se o modo foi ativado à mão e o texto do
+                # carregamento é parcial (só as páginas lidas até o total ou o boleto), o PDF é relido inteiro
+                if self.vivo_data is None and self.pdf_text_partial:
+                    self.add_log("Relendo o PDF inteiro como fatura Vivo Móvel", "info")
+                    self.pdf_text, self.vivo_data = load_vivo_movel(self.current_pdf_path, self.extraction_cache)
+                    self.pdf_text_partial = False
+                elif self.vivo_data is None:
+                    self.vivo_data = extrair_dados_vivo_movel(self.pdf_text)
+                data = self.vivo_data
                 if not data["notas_fiscais"]:
                     self.add_log("Nenhuma nota fiscal encontrada na fatura Vivo Móvel", "error")
                     messagebox.showerror("Erro", "Nenhuma nota fiscal encontrada na fatura.")
@@ -500,20 +1123,15 @@ class PDFtoJSONApp:
                 
                 # Gerar JSON base com o código de material selecionado
                 self.add_log(f"Notas fiscais encontradas: {len(data['notas_fiscais'])}", "info")
-                new_json = json.loads(generate_json_input_vivo_movel(
+                new_items = build_line_items_vivo_movel(
                     data, 
                     is_servico, 
                     self.supplier_data, 
                     material_code
-                ))
-                
-                # Atualizar PREQ_ITEM para cada item
-                for item in new_json:
-                    item["PREQ_ITEM"] = f"{next_preq_item:04}"
-                    next_preq_item += 10
+                )
                 
-                self.accumulated_json.extend(new_json)
-                self.add_log(f"Adicionados {len(new_json)} itens ao JSON", "success")
+                if not self.add_invoice_items(new_items):
+                    return
             else:
                 short_text = self.entry_short_text.get()
                 if not short_text:
@@ -525,26 +1143,17 @@ class PDFtoJSONApp:
                 self.add_log(f"Processando PDF com fornecedor: {supplier_code}", "info")
                 
                 # Gerar JSON base com o código de material selecionado
-                new_json = json.loads(generate_json_input(
+                new_items = build_line_items(
                     self.pdf_text, 
                     short_text, 
                     is_servico, 
                     supplier_code, 
                     self.total_value,
                     material_code
-                ))
-                
-                # Atualizar PREQ_ITEM
-                for item in new_json:
-                    item["PREQ_ITEM"] = f"{next_preq_item:04}"
-                    next_preq_item += 10
+                )
                 
-                self.accumulated_json.extend(new_json)
-                self.add_log(f"Adicionados {len(new_json)} itens ao JSON", "success")
-            
-            # Atualizar display com JSON acumulado
-            self.text_json_input.delete("1.0", tk.END)
-            self.text_json_input.insert(tk.END, json.dumps(self.accumulated_json, indent=4))
+                if not self.add_invoice_items(new_items):
+                    return
             
             # Limpar PDF atual após adicionar ao JSON
             self.clear_current_pdf()
@@ -556,7 +1165,7 @@ class PDFtoJSONApp:
     # Envia o JSON acumulado para o SAP
     def enviar_para_sap(self):
         """Envia o JSON acumulado para o SAP"""
-        if not self.accumulated_json:
+        if not self.accumulated_items:
             self.add_log("Tentativa de enviar ao SAP sem JSON", "error")
             messagebox.showerror("Erro", "Nenhum JSON para enviar!")
             return
@@ -564,7 +1173,7 @@ class PDFtoJSONApp:
         try:
             dialog = SAPIntegrationDialog(
                 parent=self.root, 
-                json_data=self.accumulated_json,
+                json_data=self.accumulated_items,
                 log_callback=self.add_log
             )
             
@@ -573,17 +1182,25 @@ class PDFtoJSONApp:
             
             # Processar resultado após o diálogo fechar
             if dialog.response:
-                # Atualizar histórico
-                self.add_to_history(dialog.last_payload, dialog.response)
+                # Atualizar histórico (um registro por lote no envio em lotes)
+                for payload, response in dialog.history_entries():
+                    self.add_to_history(payload, response)
+                # Faturas aceitas entram no índice de duplicidade com o CR_NUMBER do envio
+                self.record_sent_invoices(dialog.sent_cr_numbers())
                 
                 # Atualizar label de resposta
                 self.update_sap_response(dialog.response)
                 
                 # Se sucesso, limpar JSON
                 if dialog.result:
-                    self.accumulated_json = []
-                    self.text_json_input.delete("1.0", tk.END)
+                    self.clear_items()
                     self.add_log("JSON limpo após envio bem-sucedido", "success")
+                elif dialog.sent_items:
+                    # Envio em lotes incompleto: ficam só os itens dos lotes não aceitos
+                    sent = dialog.sent_items
+                    self.remove_items(sent)
+                    self.add_log(f"{len(sent)} itens aceitos pelo SAP removidos do JSON; "
+                                 f"restam {len(self.accumulated_items)}", "warning")
                 
                 # Mudar para aba de histórico
                 self.notebook.select(2)
@@ -595,4 +1212,9 @@ class PDFtoJSONApp:
 if __name__ == "__main__":
     root = tk.Tk()
     app = PDFtoJSONApp(root)
-    root.mainloop()
\ No newline at end of file
+    root.mainloop()
+    close_session()
+    # Resumo da sessão no arquivo de log
+    app.add_log(f"Resumo de desempenho da sessão:\n{get_tracer().format_summary()}", "info")
+    get_tracer().close()
+    stop_logging()
\ No newline at end of file
@@ -1,82 +1,407 @@
 #pdf_reader.py
-import fitz
 import re
+from collections import namedtuple
+from boleto import describe, find_boletos
+from line_items import Money
+from tracing import span
+
+# Versão do extrator: faz parte da chave do cache e deve mudar sempre que o resultado da extração mudar
+EXTRACTOR_VERSION = "7"
+
+# Span de texto da camada "dict" do PyMuPDF com a sua posição na página
+Span = namedtuple("Span", ["text", "bbox", "size", "flags"])
+
+# Modelo de uma página: texto, spans, boletos e retângulo, cada um extraído uma única vez
+class PageModel:
+    __slots__ = ("_page", "number", "rect", "_textpage", "_raw_text", "_text", "_spans", "_tokens", "_boletos")
+
+    def __init__(self, page):
+        self._page = page
+        self.number = page.number
+        self.rect = page.rect
+        self._textpage = None
+        self._raw_text = None
+        self._text = None
+        self._spans = None
+        self._tokens = None
+        self._boletos = None
+
+    # A camada de texto do MuPDF é montada uma vez e serve tanto para o texto quanto para os spans
+    def _get_textpage(self):
+        if self._textpage is None:
+            self._textpage = self._page.get_textpage()
+        return self._textpage
+
+    def release_textpage(self):
+        """Descarta a camada de texto guardada (os spans, se pedidos depois, a montam de novo)"""
+        self._textpage = None
+
+    @property
+    def raw_text(self):
+        """Texto da página como devolvido por get_text("text")"""
+        if self._raw_text is None:
+            self._raw_text = self._page.get_text("text", textpage=self._get_textpage())
+        return self._raw_text
+
+    @property
+    def text(self):
+        """Texto da página com as quebras de linha trocadas por espaço"""
+        if self._text is None:
+            self._text = " ".join(self.raw_text.splitlines())
+        return self._text
+
+    @property
+    def tokens(self):
+        """Valores monetários só desta página (tokenize_monetary_values), calculados uma vez"""
+        if self._tokens is None:
+            self._tokens = tokenize_monetary_values(self.text)
+        return self._tokens
+
+    def clipped_text(self, rect):
+        """Texto só do retângulo (x0, y0, x1, y1), sem ler o resto da página"""
+        return self._page.get_text("text", clip=rect)
+
+    @property
+    def spans(self):
+        """Spans com bbox da camada "dict"; só é gerada se alguma estratégia precisar"""
+        if self._spans is None:
+            spans = []
+            for b in self._page.get_text("dict", textpage=self._get_textpage())["blocks"]:
+                for l in b.get("lines", ()):
+                    for s in l["spans"]:
+                        spans.append(Span(s["text"], tuple(s["bbox"]), s["size"], s["flags"]))
+            self._spans = spans
+            self.release_textpage()
+        return self._spans
+
+    @property
+    def has_spans(self):
+        """Se a camada "dict" já foi lida (consultar não lê nada)"""
+        return self._spans is not None
+
+    @property
+    def boletos(self):
+        """Linhas digitáveis/códigos de barras válidos da página (find_boletos), calculados uma vez"""
+        if self._boletos is None:
+            self._boletos = find_boletos(self.raw_text)
+        return self._boletos
+
+# Extração interrompida pelo usuário (lançada pelo progress_callback)
+class ExtractionCancelled(Exception):
+    pass
+
+# Modelo do documento: as páginas são carregadas sob demanda e reaproveitadas por todas as estratégias
+class DocumentModel:
+    def __init__(self, doc, progress_callback=None):
+        self.doc = doc
+        # Chamado como progress_callback(páginas_lidas, total) sempre que uma página nova é lida
+        self.progress_callback = progress_callback
+        self._loaded = 0
+        self._pages = [None] * len(doc)
+        self._last = None
+        self._text = None
+        self._tokens = None
+
+    def __len__(self):
+        return len(self._pages)
+
+    def __iter__(self):
+        for index in range(len(self._pages)):
+            yield self.page(index)
+
+    def page(self, index):
+        if self._pages[index] is None:
+            # Só a página lida por último guarda a camada de texto: é nela que o streaming encontra o total
+            # e de onde os spans costumam ser pedidos; guardar de todas pesaria em documentos longos
+            if self._last is not None:
+                self._last.release_textpage()
+            self._pages[index] = self._last = PageModel(self.doc[index])
+            self._loaded += 1
+            if self.progress_callback:
+                self.progress_callback(self._loaded, len(self._pages))
+        return self._pages[index]
+
+    def loaded_pages(self):
+        """Páginas já lidas, em ordem, sem ler nenhuma página nova"""
+        return [page for page in self._pages if page is not None]
+
+    @property
+    def text(self):
+        """Texto de todas as páginas, uma página por linha"""
+        if self._text is None:
+            self._text = "".join(page.text + "\n" for page in self)
+        return self._text
+
+    @property
+    def tokens(self):
+        """Valores monetários do documento (tokenize_monetary_values), calculados uma vez"""
+        if self._tokens is None:
+            self._tokens = tokenize_monetary_values(self.text)
+        return self._tokens
+
+# Aceita um DocumentModel ou um documento do fitz
+def _as_model(doc):
+    return doc if isinstance(doc, DocumentModel) else DocumentModel(doc)
+
+# Aceita um DocumentModel (tokens já calculados) ou o texto já extraído
+def _tokens_of(source):
+    return source.tokens if isinstance(source, DocumentModel) else tokenize_monetary_values(source)
 
 # Função que padroniza o CNPJ
 def standardize_cnpj(cnpj):
     """Remove all non-numeric characters from CNPJ"""
     return re.sub(r'[^0-9]', '', cnpj)
 
-# Função que extrai o texto de um PDF
-def extract_text_from_pdf(filepath):
-    text = ""
-    total_value = None  
-    try:
-        with fitz.open(filepath) as doc:
-            # Extrair texto normal primeiro
-            for page in doc:
-                page_text = page.get_text("text")
-                page_text = " ".join(page_text.splitlines())
-                text += page_text + "\n"
-        
-            if not text.strip():
-                raise ValueError("Nenhum texto extraído do PDF.")
-            
-            # Tentar métodos de extração em ordem de prioridade
-            total_value = extract_total_value(text)
-            
-            # Se não encontrar valor pelo texto, tentar por posição
-            if not total_value:
-                total_value = extract_values_by_position(doc)
-            
-            # Tentar o método genérico de busca de valores monetários
-            if not total_value:
-                total_value = find_all_monetary_values(text)
-            
-            # Método específico para boletos
-            if not total_value:
-                total_value = extract_boleto_value(doc)
-            
-            if not total_value:
-                raise ValueError("Não foi possível encontrar o valor total da fatura.")
-        
-    except Exception as e:
-        text = f"Erro ao ler o PDF: {e}"
+# Texto e notas fiscais da Vivo Móvel, processando cada página assim que ela é lida
+def _parse_vivo_movel(model):
+    with span("vivo_movel.parse", paginas=len(model)) as current:
+        parser = VivoMovelParser()
+        page_texts = []
+        for page in model:
+            page_texts.append(page.text + "\n")
+            parser.feed(page.text, page.number + 1)
+        current.set(notas_fiscais=len(parser.data["notas_fiscais"]))
+        return "".join(page_texts), parser.result()
+
+def _extract_vivo_movel(doc, progress_callback=None):
+    with doc:
+        return _parse_vivo_movel(DocumentModel(doc, progress_callback))
+
+# Rótulos que, quando aparecem colados a um valor, identificam o total com segurança
+STRONG_TOTAL_LABELS = frozenset({
+    "TOTAL A PAGAR", "VALOR DO DOCUMENTO", "VALOR A PAGAR", "VALOR COBRADO",
+    "TOTAL FATURA", "LÍQUIDO FATURA",
+})
+
+# Estratégias sobre o documento inteiro, na ordem dada (por padrão, a cadeia completa VALUE_STRATEGIES)
+def _extract_values_from_model(model, strategies=None):
+    text = model.text
+
+    if not text.strip():
+        raise ValueError("Nenhum texto extraído do PDF.")
+    
+    # Tentar métodos de extração em ordem de prioridade
+    for strategy in strategies or VALUE_STRATEGIES:
+        with span(f"estrategia.{strategy.__name__}") as current:
+            total_value = strategy(model)
+            current.set(candidatos=len(total_value or ()))
+        if total_value:
+            return text, total_value
+
+    raise ValueError("Não foi possível encontrar o valor total da fatura.")
+
+# Lê página por página e para assim que encontrar um total com rótulo forte
+def _extract_values_streaming(model, log_callback=None, strategies=None):
+    """Devolve (texto, valores, parcial); parcial quando o texto não chega à última página"""
+    with span("extracao.streaming", paginas=len(model)) as current:
+        text, values, pages_in_text = _read_until_strong_total(model, log_callback, strategies)
+        current.set(paginas_lidas=len(model.loaded_pages()), candidatos=len(values or ()))
+        return text, values, pages_in_text < len(model)
+
+def _read_until_strong_total(model, log_callback=None, strategies=None):
+    total_pages = len(model)
+    page_texts = []
+    for page in model:
+        page_texts.append(page.text + "\n")
+        # Linha digitável com DVs corretos: o valor é confiável e a leitura para aqui
+        boleto = first_boleto_with_amount((page,))
+        if boleto is not None:
+            if log_callback:
+                log_callback(f"Valor lido na página {page.number + 1}: {describe(boleto)}", "info")
+            return "".join(page_texts), [str(Money(boleto.amount_cents))], len(page_texts)
+        strong_values = [
+            token.value for token in page.tokens
+            if token.label in STRONG_TOTAL_LABELS
+        ]
+        if not strong_values:
+            continue
+
+        text = "".join(page_texts)
+        # Valores com rótulo forte primeiro, depois os demais das páginas lidas
+        unique_values = []
+        seen = set()
+        for value in strong_values + (extract_total_value(text) or []):
+            if value not in seen:
+                unique_values.append(value)
+                seen.add(value)
+        if log_callback:
+            log_callback(f"Total encontrado na página {page.number + 1}: "
+                         f"{len(page_texts)} de {total_pages} páginas lidas", "info")
+        return text, unique_values, len(page_texts)
+
+    # Nenhum total confiável: varredura completa (as páginas já lidas ficam no modelo)
+    if log_callback:
+        log_callback(f"Nenhum total confiável encontrado; varredura completa "
+                     f"({total_pages} de {total_pages} páginas lidas)", "warning")
+    text, values = _extract_values_from_model(model, strategies)
+    return text, values, total_pages
+
+# Tokenizador de valores monetários: o texto é varrido uma vez para os valores NN.NNN,NN e uma
+# vez para os rótulos, e as duas sequências são intercaladas em ordem. Rótulos nunca se sobrepõem
+# aos valores, então o resultado é o mesmo de uma única varredura com todas as alternativas.
+_AMOUNT_RE = re.compile(r"[\d\.]+,\d{2}")
+
+# Rótulos (aplicado ao texto em maiúsculas). A ordem das alternativas importa: primeiro os rótulos
+# colados ao valor, depois "LÍQUIDO FATURA", os rótulos genéricos (só anotam o valor) e o "R$".
+# Os genéricos terminados em R deixam o R de fora para que "PAGAR$ 10,00" ainda conte como R$.
+_LABEL_PATTERN = (
+    r"(?P<direct_label>VALOR\s*DO\s*DOCUMENTO|VALOR\s*COBRADO|VALOR\s*A\s*PAGAR|PAGAMENTO|VALOR\s*LÍQUIDO)"
+    r"(?P<direct>\s*R?\$?\s*)(?=[\d\.]+,\d{2})"
+    r"|(?P<vogel>TOTAL VOGEL SOL\. EM TEL\. E INF\. S\.A\.\s*)(?=[\d\.]+,\d{2})"
+    r"|(?P<liquido>LÍQUIDO FATURA)"
+    r"|(?P<label>TOTAL\s+A\s+PAGA(?=R)|TOTAL\s+FATURA|TOTAL|VALO(?=R))"
+    r"|(?P<cifrao>R\$\s*)(?=[\d\.]+,\d{2})"
+)
+_LABEL_RE = re.compile(_LABEL_PATTERN)
+_LABEL_RE_IGNORECASE = re.compile(_LABEL_PATTERN, re.IGNORECASE)
+
+# Todo rótulo começa com uma destas palavras; procurar só por elas é muito mais rápido
+_LABEL_START_PATTERN = r"VALOR|PAGAMENTO|LÍQUIDO FATURA|TOTAL|R\$"
+_LABEL_START_RE = re.compile(_LABEL_START_PATTERN)
+_LABEL_START_RE_IGNORECASE = re.compile(_LABEL_START_PATTERN, re.IGNORECASE)
+
+# Percorre os rótulos do texto com a mesma semântica de label_re.finditer
+def _iter_labels(text, start_re, label_re):
+    search = start_re.search
+    match = label_re.match
+    pos = 0
+    while True:
+        candidate = search(text, pos)
+        if candidate is None:
+            return
+        found = match(text, candidate.start())
+        if found is None:
+            pos = candidate.start() + 1
+            continue
+        yield found
+        pos = found.end()
+
+# Distância máxima (em caracteres) entre um rótulo e o valor ao qual ele é associado
+LABEL_WINDOW = 200
+
+# Grupos de candidatos, na mesma ordem em que os padrões antigos de extract_total_value eram aplicados
+RANK_CIFRAO = 0          # R$ NN,NN (cobre também TOTAL...R$, VALOR...R$ etc.)
+RANK_LIQUIDO_FATURA = 1  # primeiro valor após LÍQUIDO FATURA
+RANK_VOGEL = 2           # TOTAL VOGEL SOL. EM TEL. E INF. S.A. NN,NN
+RANK_ISOLATED = 8        # valor isolado entre espaços
 
-    return text, total_value
+# Rótulos seguidos diretamente do valor: chave normalizada -> (nome, grupo)
+_DIRECT_LABELS = {
+    "VALORDODOCUMENTO": ("VALOR DO DOCUMENTO", 3),
+    "VALORCOBRADO": ("VALOR COBRADO", 4),
+    "VALORAPAGAR": ("VALOR A PAGAR", 5),
+    "PAGAMENTO": ("PAGAMENTO", 6),
+    "VALORLÍQUIDO": ("VALOR LÍQUIDO", 7),
+}
+
+# Valor monetário encontrado pelo tokenizador
+MoneyToken = namedtuple("MoneyToken", ["value", "position", "label", "ranks"])
+
+# Nomes dos rótulos genéricos (o R final não faz parte do match)
+_GENERIC_LABELS = {
+    "TOTALAPAGA": "TOTAL A PAGAR",
+    "TOTALFATURA": "TOTAL FATURA",
+    "TOTAL": "TOTAL",
+    "VALO": "VALOR",
+}
+
+# Função que percorre o texto e devolve todos os valores monetários encontrados
+def tokenize_monetary_values(text, window=LABEL_WINDOW):
+    """Devolve uma lista de MoneyToken na ordem em que os valores aparecem no texto"""
+    # Buscar os rótulos no texto em maiúsculas evita o IGNORECASE, que é bem mais lento.
+    # Se a conversão mudar o tamanho do texto (caracteres raros), as posições não batem mais.
+    upper_text = text.upper()
+    if len(upper_text) == len(text):
+        labels = _iter_labels(upper_text, _LABEL_START_RE, _LABEL_RE)
+    else:
+        labels = _iter_labels(text, _LABEL_START_RE_IGNORECASE, _LABEL_RE_IGNORECASE)
+    next_label = next(labels, None)
+
+    tokens = []
+    text_length = len(text)
+    prefix_end = -1        # posição onde começa o valor colado ao último rótulo/R$
+    prefix_ranks = ()
+    prefix_label = None
+    pending_label = None   # (nome, posição final) do último rótulo ainda não associado
+    pending_liquido = None # posição final do último LÍQUIDO FATURA ainda não associado
+    isolated_end = 0       # fim do último valor isolado, incluindo o espaço consumido depois dele
+
+    for match in _AMOUNT_RE.finditer(text):
+        start, end = match.span()
+
+        # Consome os rótulos que terminam antes deste valor
+        while next_label is not None and next_label.end() <= start:
+            kind = next_label.lastgroup
+            if kind == "direct":
+                key = "".join(next_label.group("direct_label").upper().split())
+                prefix_label, rank = _DIRECT_LABELS[key]
+                # O R do R$ pode ser a última letra do rótulo ("VALOR A PAGAR$ 10,00")
+                has_cifrao = "R$" in (key[-1] + next_label.group("direct").upper())
+                prefix_ranks = (RANK_CIFRAO, rank) if has_cifrao else (rank,)
+                prefix_end = next_label.end()
+            elif kind == "vogel":
+                prefix_label, prefix_ranks, prefix_end = "TOTAL VOGEL", (RANK_VOGEL,), next_label.end()
+            elif kind == "cifrao":
+                prefix_label, prefix_ranks, prefix_end = None, (RANK_CIFRAO,), next_label.end()
+            elif kind == "liquido":
+                pending_liquido = next_label.end()
+                pending_label = ("LÍQUIDO FATURA", next_label.end())
+            else:
+                key = "".join(next_label.group("label").upper().split())
+                pending_label = (_GENERIC_LABELS[key], next_label.end())
+            next_label = next(labels, None)
+
+        # "S.A." colado ao valor: o ponto final do rótulo da Vogel vira o início do valor
+        vogel_value = None
+        if next_label is not None and next_label.lastgroup == "vogel" and next_label.end() == start + 1:
+            vogel_value = MoneyToken(match.group()[1:], start + 1, "TOTAL VOGEL", (RANK_VOGEL,))
+            next_label = next(labels, None)
+
+        ranks = list(prefix_ranks) if prefix_end == start else []
+
+        # Primeiro valor depois de LÍQUIDO FATURA, dentro da janela
+        if pending_liquido is not None:
+            if start - pending_liquido <= window:
+                ranks.append(RANK_LIQUIDO_FATURA)
+            pending_liquido = None
+
+        # Valor isolado: precedido e seguido por espaço (ou início/fim do texto).
+        # O espaço depois de um valor isolado não serve de separador para o próximo,
+        # assim como acontecia com re.findall.
+        before_ok = start == 0 or (text[start - 1].isspace() and start - 1 >= isolated_end)
+        if before_ok and (end == text_length or text[end].isspace()):
+            ranks.append(RANK_ISOLATED)
+            isolated_end = end + 1
+
+        label = prefix_label if prefix_end == start else None
+        if label is None and pending_label is not None and start - pending_label[1] <= window:
+            label = pending_label[0]
+        pending_label = None
+
+        tokens.append(MoneyToken(match.group(), start, label, tuple(ranks)))
+        if vogel_value is not None:
+            tokens.append(vogel_value)
+
+    return tokens
 
 # Função que extrai o valor total de uma fatura
 def extract_total_value(text):
-    patterns = [
-        r"R\$\s*([\d\.]+,\d{2})",  # Padrão básico para R$ seguido de valor
-        r"VALOR.*?R\$\s*([\d\.]+,\d{2})",
-        r"TOTAL\s*R\$\s*([\d\.]+,\d{2})",
-        r"TOTAL.*?R\$\s*([\d\.]+,\d{2})",
-        r"TOTAL FATURA.*?R\$\s*([\d\.]+,\d{2})",
-        r"LÍQUIDO FATURA.*?([\d\.]+,\d{2})",
-        r"TOTAL\s+LÍQUIDO\s+FATURA\s*R\$\s*([\d\.]+,\d{2})",
-        r"TOTAL\s+FATURA\s*R\$\s*([\d\.]+,\d{2})",
-        r"TOTAL\s+FATURA.*?R\$\s*([\d\.]+,\d{2})",
-        r"VALOR TOTAL\s*R\$\s*([\d\.]+,\d{2})",
-        r"TOTAL SERVIÇOS DE TELECOMUNICAÇÕES\s*R\$\s*([\d\.]+,\d{2})",
-        r"TOTAL VOGEL SOL\. EM TEL\. E INF\. S\.A\.\s*([\d\.]+,\d{2})",
-        r"VALOR\s*DO\s*DOCUMENTO\s*R?\$?\s*([\d\.]+,\d{2})",  # Boletos
-        r"VALOR\s*COBRADO\s*R?\$?\s*([\d\.]+,\d{2})",         # Boletos
-        r"VALOR\s*A\s*PAGAR\s*R?\$?\s*([\d\.]+,\d{2})",       # Boletos
-        r"PAGAMENTO\s*R?\$?\s*([\d\.]+,\d{2})",               # Diversos
-        r"VALOR\s*LÍQUIDO\s*R?\$?\s*([\d\.]+,\d{2})",         # Diversos
-        r"(?:^|\s)([\d\.]{1,},[0-9]{2})(?:$|\s)",             # Valor isolado no formato NN.NNN,NN
-    ]
-    all_values = []
-    for pattern in patterns:
-        matches = re.findall(pattern, text, re.IGNORECASE | re.DOTALL) 
-        all_values.extend(matches)
+    """Devolve os valores candidatos, sem repetição, agrupados por tipo de padrão"""
+    tokens = _tokens_of(text)
+
+    # Cada grupo mantém a ordem do texto; os grupos são concatenados na ordem de prioridade
+    groups = [[] for _ in range(RANK_ISOLATED + 1)]
+    for token in tokens:
+        for rank in token.ranks:
+            groups[rank].append(token.value)
+
     unique_values = []
     seen = set()
-    for value in all_values:
-        if value not in seen:
-            unique_values.append(value)
-            seen.add(value)  
+    for group in groups:
+        for value in group:
+            if value not in seen:
+                unique_values.append(value)
+                seen.add(value)
     return unique_values if unique_values else None
 
 # Nova função: extrai valores baseados na sua posição no PDF
@@ -85,43 +410,35 @@ def extract_values_by_position(doc):
     all_values = []
     
     # Posições comuns para valores totais (bottom-right, por exemplo)
-    for page_num in range(len(doc)):
-        page = doc[page_num]
-        
-        # Extrai blocos de texto com suas posições
-        blocks = page.get_text("dict")["blocks"]
+    for page in _as_model(doc):
+        page_width = page.rect.width
+        page_height = page.rect.height
         
-        for b in blocks:
-            if "lines" not in b:
-                continue
-                
-            for l in b["lines"]:
-                for s in l["spans"]:
-                    text = s["text"].strip()
-                    
-                    # Verifica se o texto parece ser um valor monetário
-                    currency_match = re.search(r"R?\$?\s*([\d\.]+,\d{2})", text)
-                    if currency_match:
-                        value = currency_match.group(1)
-                        all_values.append(value)
-                    
-                    # Textos isolados que parecem valores monetários
-                    if re.match(r"^[\d\.]+,\d{2}$", text):
-                        all_values.append(text)
-                    
-                    # Verificar se o texto está na parte inferior direita (comum em valores totais)
-                    # Verificamos a posição relativa na página
-                    bbox = s["bbox"]  # [x0, y0, x1, y1]
-                    page_width = page.rect.width
-                    page_height = page.rect.height
-                    
-                    # Posição relativa (0 a 1)
-                    rel_x = bbox[0] / page_width
-                    rel_y = bbox[1] / page_height
-                    
-                    # Se estiver no quadrante inferior direito e parecer um valor
-                    if rel_x > 0.5 and rel_y > 0.5 and re.match(r"^[\d\.]+,\d{2}$", text):
-                        all_values.append(text)
+        # Spans de texto com suas posições (camada dict gerada uma única vez por página)
+        for s in page.spans:
+            text = s.text.strip()
+            
+            # Verifica se o texto parece ser um valor monetário
+            currency_match = re.search(r"R?\$?\s*([\d\.]+,\d{2})", text)
+            if currency_match:
+                value = currency_match.group(1)
+                all_values.append(value)
+            
+            # Textos isolados que parecem valores monetários
+            if re.match(r"^[\d\.]+,\d{2}$", text):
+                all_values.append(text)
+            
+            # Verificar se o texto está na parte inferior direita (comum em valores totais)
+            # Verificamos a posição relativa na página
+            bbox = s.bbox  # [x0, y0, x1, y1]
+            
+            # Posição relativa (0 a 1)
+            rel_x = bbox[0] / page_width
+            rel_y = bbox[1] / page_height
+            
+            # Se estiver no quadrante inferior direito e parecer um valor
+            if rel_x > 0.5 and rel_y > 0.5 and re.match(r"^[\d\.]+,\d{2}$", text):
+                all_values.append(text)
     
     # Remover duplicatas
     unique_values = []
@@ -136,31 +453,47 @@ def extract_values_by_position(doc):
 # Nova função: encontra todos os valores monetários no documento
 def find_all_monetary_values(text):
     """Encontra todos os valores que parecem ser monetários no formato brasileiro"""
-    # Padrão genérico para valores monetários no formato brasileiro
-    pattern = r"(?:^|\s)([\d\.]{1,},[0-9]{2})(?:$|\s)"
+    # Valores isolados no formato brasileiro, vindos do tokenizador
+    tokens = _tokens_of(text)
+    matches = [token.value for token in tokens if RANK_ISOLATED in token.ranks]
     
-    matches = re.findall(pattern, text)
+    # Cada valor é convertido uma única vez para centavos
+    amounts = [(Money.parse_br(v).cents, v) for v in matches]
     
     # Filtra valores muito pequenos (ex: menos de 10 reais) que provavelmente não são valor total
-    filtered_values = [v for v in matches if float(v.replace(".", "").replace(",", ".")) >= 10]
-    
-    # Ordena por valor decrescente - normalmente o valor total é um dos maiores
-    sorted_values = sorted(filtered_values, 
-                         key=lambda x: float(x.replace(".", "").replace(",", ".")), 
-                         reverse=True)
+    # e ordena por valor decrescente - normalmente o valor total é um dos maiores
+    sorted_values = [v for cents, v in sorted(
+        (amount for amount in amounts if amount[0] >= 1000),
+        key=lambda amount: amount[0],
+        reverse=True
+    )]
     
     return sorted_values if sorted_values else None
 
+# Primeiro boleto válido (DVs conferidos) que traz valor em reais, nas páginas dadas, na ordem
+def first_boleto_with_amount(pages):
+    for page in pages:
+        for info in page.boletos:
+            if info.amount_cents:
+                return info
+    return None
+
+# Caminho rápido: valor da linha digitável ou do código de barras com os DVs conferidos
+def extract_linha_digitavel_value(doc):
+    """Devolve [valor] do primeiro boleto válido do documento; o valor é confiável, então as demais
+    estratégias não precisam ser executadas"""
+    info = first_boleto_with_amount(_as_model(doc))
+    return [str(Money(info.amount_cents))] if info is not None else None
+
 # Nova função: extração específica para boletos bancários
 def extract_boleto_value(doc):
     """Extrai valores específicos de boletos bancários"""
     all_values = []
     
-    for page_num in range(len(doc)):
-        page = doc[page_num]
+    for page in _as_model(doc):
         
         # 1. Verifica se existe o texto indicativo de boleto
-        text = page.get_text("text")
+        text = page.raw_text
         is_boleto = any(term in text.upper() for term in [
             "BOLETO", "CÓDIGO DE BARRAS", "FICHA DE COMPENSAÇÃO", 
             "PAGAMENTO", "VENCIMENTO", "CEDENTE"
@@ -180,34 +513,10 @@ def extract_boleto_value(doc):
             matches = re.findall(pattern, text, re.IGNORECASE)
             all_values.extend(matches)
             
-        # 3. Verificar a linha digitável/código de barras para extrair o valor
-        barcode_pattern = r"[\d\s]{47,48}"  # Padrão básico de linha digitável
-        barcode_matches = re.findall(barcode_pattern, text)
-        
-        for barcode in barcode_matches:
-            # Remover espaços
-            barcode = barcode.replace(" ", "")
-            
-            # Tentar extrair valor do código de barras se for um boleto convencional
-            if len(barcode) >= 47:
-                # O valor geralmente está em posições específicas
-                try:
-                    # Posição do valor depende do formato do boleto
-                    if barcode[0] == "8":  # Arrecadação (contas, tributos)
-                        value_str = barcode[4:15]
-                        # Verificar se são dígitos e converter para formato de moeda
-                        if value_str.isdigit():
-                            value = int(value_str) / 100  # Converter para reais
-                            formatted_value = f"{value:.2f}".replace(".", ",")
-                            all_values.append(formatted_value)
-                    else:  # Boleto bancário convencional
-                        value_str = barcode[37:47]
-                        if value_str.isdigit():
-                            value = int(value_str) / 100
-                            formatted_value = f"{value:.2f}".replace(".", ",")
-                            all_values.append(formatted_value)
-                except:
-                    pass
+        # 3. Valor da linha digitável/código de barras, só se os dígitos verificadores conferirem
+        for info in find_boletos(text):
+            if info.amount_cents:
+                all_values.append(str(Money(info.amount_cents)))
     
     # Remove duplicatas
     unique_values = []
@@ -219,38 +528,104 @@ def extract_boleto_value(doc):
             
     return unique_values if unique_values else None
 
+# Cadeia genérica de estratégias, em ordem de prioridade: linha digitável válida (rápida e confiável),
+# valor pelo texto, por posição, valores monetários soltos e, por último, o específico para boletos
+VALUE_STRATEGIES = (
+    extract_linha_digitavel_value,
+    extract_total_value,
+    extract_values_by_position,
+    find_all_monetary_values,
+    extract_boleto_value,
+)
+
+# Padrões da fatura da Vivo Móvel. Cada nota fiscal é: cabeçalho, primeiro CNPJ depois dele e
+# primeiro "TOTAL NOTA FISCAL" depois do CNPJ.
+_VIVO_CONTA_RE = re.compile(r"Nº da Conta:\s*(\d+)")
+_VIVO_MES_REF_RE = re.compile(r"Mês de referência:\s*(\d{2}/\d{4})")
+_VIVO_TOTAL_PAGAR_RE = re.compile(r"Total a Pagar - R\$\s*([\d.,]+)")
+_VIVO_NF_HEADER_RE = re.compile(r"NOTA FISCAL DE SERVIÇOS DE TELECOMUNICAÇÕES")
+_VIVO_NF_CNPJ_RE = re.compile(r"CNPJ:\s*([\d.-]+/[\d-]+)")
+_VIVO_NF_TOTAL_RE = re.compile(r"TOTAL NOTA FISCAL TELEFONICA BRASIL S.A.\s*([\d.,]+)", re.DOTALL)
+
+# Parser incremental da fatura da Vivo Móvel: consome o texto página por página
+class VivoMovelParser:
+    """Máquina de estados (cabeçalho -> CNPJ -> total) que avança sempre para frente no texto.
+
+    Um trecho do fim de cada página é guardado para que um rótulo e o seu valor possam estar em
+    páginas diferentes, como acontecia com o texto concatenado.
+    """
+
+    # Tamanho do trecho guardado entre páginas (maior que qualquer rótulo + espaços)
+    CARRY = 128
+
+    _HEADER, _CNPJ, _TOTAL = range(3)
+
+    def __init__(self):
+        self.data = {
+            "numero_conta": "",
+            "mes_referencia": "",
+            "total_a_pagar": "",
+            "notas_fiscais": []
+        }
+        self._state = self._HEADER
+        self._cnpj = None
+        self._carry = ""
+        self._page_number = 0
+
+    def feed(self, page_text, page_number=None):
+        """Processa o texto de uma página e devolve as notas fiscais encontradas nela"""
+        self._page_number = page_number if page_number is not None else self._page_number + 1
+        buffer = self._carry + page_text + "\n"
+        data = self.data
+
+        # Campos do cabeçalho da fatura: só a primeira ocorrência interessa
+        for key, pattern in (("numero_conta", _VIVO_CONTA_RE),
+                             ("mes_referencia", _VIVO_MES_REF_RE),
+                             ("total_a_pagar", _VIVO_TOTAL_PAGAR_RE)):
+            if not data[key]:
+                match = pattern.search(buffer)
+                if match:
+                    data[key] = match.group(1)
+
+        found = []
+        pos = 0
+        while True:
+            if self._state == self._HEADER:
+                match = _VIVO_NF_HEADER_RE.search(buffer, pos)
+                if not match:
+                    break
+                self._state = self._CNPJ
+            elif self._state == self._CNPJ:
+                match = _VIVO_NF_CNPJ_RE.search(buffer, pos)
+                if not match:
+                    break
+                self._cnpj = standardize_cnpj(match.group(1))
+                self._state = self._TOTAL
+            else:
+                match = _VIVO_NF_TOTAL_RE.search(buffer, pos)
+                if not match:
+                    break
+                nf = {"cnpj": self._cnpj, "total": match.group(1), "pagina": self._page_number}
+                data["notas_fiscais"].append(nf)
+                found.append(nf)
+                self._cnpj = None
+                self._state = self._HEADER
+            pos = match.end()
+
+        # Guarda só o que ainda não foi consumido, limitado ao fim da página
+        self._carry = buffer[max(pos, len(buffer) - self.CARRY):]
+        return found
+
+    def result(self):
+        return self.data
+
 # Função que extrai os dados de uma fatura da Vivo Móvel
 def extrair_dados_vivo_movel(text):
-    data = {
-        "numero_conta": "",
-        "mes_referencia": "",
-        "total_a_pagar": "",
-        "notas_fiscais": []
-    }
-    
-    conta_match = re.search(r"Nº da Conta:\s*(\d+)", text)
-    if conta_match:
-        data["numero_conta"] = conta_match.group(1)
-    
-    mes_ref_match = re.search(r"Mês de referência:\s*(\d{2}/\d{4})", text)
-    if mes_ref_match:
-        data["mes_referencia"] = mes_ref_match.group(1)
-    
-    total_pagar_match = re.search(r"Total a Pagar - R\$\s*([\d.,]+)", text)
-    if total_pagar_match:
-        data["total_a_pagar"] = total_pagar_match.group(1)
-    
-    nf_matches = re.finditer(
-        r"NOTA FISCAL DE SERVIÇOS DE TELECOMUNICAÇÕES.*?"
-        r"CNPJ:\s*([\d.-]+/[\d-]+).*?"
-        r"TOTAL NOTA FISCAL TELEFONICA BRASIL S.A.\s*([\d.,]+)",
-        text, re.DOTALL)
-    
-    for match in nf_matches:
-        cnpj_raw = match.group(1)
-        data["notas_fiscais"].append({
-            "cnpj": standardize_cnpj(cnpj_raw),
-            "total": match.group(2)
-        })
-    
-    return data
\ No newline at end of file
+    """Aplica o VivoMovelParser ao texto já extraído (uma página por linha)"""
+    parser = VivoMovelParser()
+    pages = text.split("\n")
+    if pages and not pages[-1]:
+        pages.pop()
+    for page_number, page_text in enumerate(pages, start=1):
+        parser.feed(page_text, page_number)
+    return parser.result()
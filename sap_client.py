@@ -0,0 +1,210 @@
+#sap_client.py
+import copy
+import queue
+import threading
+import uuid
+from collections import namedtuple
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+import requests
+from requests.adapters import HTTPAdapter
+from sap_controller import get_controller
+from tracing import span
+
+_session = None
+_session_lock = threading.Lock()
+
+# Sessão HTTP compartilhada: conexões keep-alive e sessão TLS são abertas uma vez por execução do aplicativo
+def get_session():
+    global _session
+    with _session_lock:
+        if _session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=4, pool_maxsize=8)
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+            session.headers.update({'Content-Type': 'application/json'})
+            _session = session
+        return _session
+
+# Fecha a sessão compartilhada (chamado ao encerrar o aplicativo)
+def close_session():
+    global _session
+    with _session_lock:
+        if _session is not None:
+            _session.close()
+            _session = None
+
+# Identificadores de uma requisição: (TOPDESK_KEY, CR_NUMBER)
+def new_request_ids():
+    return str(uuid.uuid4()), f"CR-{datetime.now().strftime('%y%m')}-{str(uuid.uuid4())[:5]}"
+
+# Divide um payload em um payload por lote de `size` itens, cada um com CR_NUMBER/TOPDESK_KEY
+# novos e PREQ_ITEM a partir de 0010
+def split_payload(payload, size):
+    base = copy.deepcopy(payload)
+    items = base["ZSBR_MM_AZU_WEBSHOP_PREQ"]["I_WEBSHOP"].pop("ITEMS")
+    payloads = []
+    for start in range(0, len(items), size):
+        chunk = copy.deepcopy(base)
+        webshop = chunk["ZSBR_MM_AZU_WEBSHOP_PREQ"]["I_WEBSHOP"]
+        webshop["TOPDESK_KEY"], webshop["CR_NUMBER"] = new_request_ids()
+        webshop["ITEMS"] = [
+            dict(item, PREQ_ITEM=f"{(position + 1) * 10:04}")
+            for position, item in enumerate(items[start:start + size])
+        ]
+        payloads.append(chunk)
+    return payloads
+
+# Envia um payload usando a sessão compartilhada
+def post_payload(url, payload, auth, timeout=30):
+    return get_session().post(url, json=payload, auth=auth, timeout=timeout)
+
+# Envia um payload passando pelo controle de concorrência e pelo disjuntor (sap_controller).
+# Levanta CircuitOpenError sem contatar o SAP se o circuito estiver aberto; devolve None se
+# `should_stop()` ficar verdadeiro enquanto espera uma vaga
+def submit_payload(url, payload, auth, timeout=30, should_stop=None):
+    return get_controller().call(lambda: post_payload(url, payload, auth, timeout), should_stop)
+
+# Thread que envia o payload ao SAP sem bloquear a interface
+class SubmissionWorker(threading.Thread):
+    """Publica eventos (tipo, dado) na fila `events`:
+
+    - ("progress", mensagem)
+    - ("done", response)
+    - ("error", exceção): inclusive CircuitOpenError, sem contato com o SAP
+
+    Depois de cancel() nenhum evento é publicado. A requisição já enviada não pode ser
+    interrompida; o SAP ainda pode processá-la.
+    """
+
+    def __init__(self, url, payload, auth, timeout=30, trace_parent=None):
+        super().__init__(daemon=True)
+        # Span da interface que originou o envio (o contexto não passa sozinho para a thread)
+        self.trace_parent = trace_parent
+        self.url = url
+        self.payload = payload
+        self.auth = auth
+        self.timeout = timeout
+        self.events = queue.Queue()
+        self._cancel_event = threading.Event()
+
+    def cancel(self):
+        self._cancel_event.set()
+
+    @property
+    def cancelled(self):
+        return self._cancel_event.is_set()
+
+    def _publish(self, kind, value):
+        if not self.cancelled:
+            self.events.put((kind, value))
+
+    def run(self):
+        self._publish("progress", "Enviando requisição...")
+        try:
+            with span("sap.http", parent=self.trace_parent) as current:
+                response = submit_payload(self.url, self.payload, self.auth, self.timeout, lambda: self.cancelled)
+                current.set(status_http=getattr(response, "status_code", None), circuito=get_controller().state)
+        except Exception as e:
+            self._publish("error", e)
+            return
+        if response is not None:
+            self._publish("done", response)
+
+# Resultado do envio de um lote: posição, payload, resposta (None se houve erro) e exceção
+class ChunkResult(namedtuple("ChunkResult", ["index", "payload", "response", "error"])):
+    __slots__ = ()
+
+    @property
+    def ok(self):
+        return self.response is not None and self.response.status_code == 200
+
+    @property
+    def cr_number(self):
+        return self.payload["ZSBR_MM_AZU_WEBSHOP_PREQ"]["I_WEBSHOP"]["CR_NUMBER"]
+
+    def describe(self):
+        if self.response is not None:
+            status = f"{self.response.status_code} {self.response.text}".strip()
+        else:
+            status = f"erro: {self.error}"
+        return f"Lote {self.index + 1} ({self.cr_number}): {status}"
+
+# Resposta combinada de um envio em lotes, com status_code e text como uma resposta única
+class CombinedResponse:
+    def __init__(self, chunks, total=None):
+        self.chunks = sorted(chunks, key=lambda chunk: chunk.index)
+        # Lotes ainda não enviados (envio cancelado) não aparecem em `chunks`
+        self.total = max(total or 0, len(self.chunks))
+
+    @property
+    def failed(self):
+        return [chunk for chunk in self.chunks if not chunk.ok]
+
+    @property
+    def pending(self):
+        return self.total - len(self.chunks)
+
+    @property
+    def complete(self):
+        return not self.failed and not self.pending
+
+    @property
+    def status_code(self):
+        """200 se todos os lotes foram aceitos; senão o status do primeiro lote com falha (None se não houve resposta)"""
+        failed = self.failed
+        if failed:
+            return failed[0].response.status_code if failed[0].response is not None else None
+        return 200 if not self.pending else None
+
+    def summary(self):
+        text = f"{len(self.chunks) - len(self.failed)}/{self.total} lotes aceitos"
+        return text + (f", {self.pending} não enviado(s)" if self.pending else "")
+
+    @property
+    def text(self):
+        return "\n".join([self.summary()] + [chunk.describe() for chunk in self.chunks])
+
+# Thread que envia vários payloads (lotes) com no máximo `max_workers` requisições simultâneas
+class ChunkedSubmissionWorker(SubmissionWorker):
+    """Publica os mesmos eventos de SubmissionWorker, mais ("chunk", ChunkResult) a cada lote
+    terminado; "done" traz a lista de ChunkResult e nunca é um erro: as falhas ficam nos lotes.
+
+    `payloads` é uma lista de (posição, payload). As requisições simultâneas são no máximo o menor
+    entre `max_workers` e o limite do sap_controller. Depois de cancel() os lotes ainda não
+    enviados são descartados.
+    """
+
+    def __init__(self, url, payloads, auth, timeout=30, max_workers=4, trace_parent=None):
+        super().__init__(url, None, auth, timeout, trace_parent)
+        self.payloads = payloads
+        self.max_workers = max(1, max_workers)
+        # Lotes terminados, inclusive os que a interface ainda não leu da fila
+        self.results = []
+
+    def _send(self, index, payload):
+        if self.cancelled:
+            return None
+        try:
+            with span("sap.http", parent=self.trace_parent, lote=index + 1) as current:
+                response = submit_payload(self.url, payload, self.auth, self.timeout, lambda: self.cancelled)
+                current.set(status_http=getattr(response, "status_code", None), circuito=get_controller().state)
+        except Exception as e:
+            result = ChunkResult(index, payload, None, e)
+        else:
+            if response is None:
+                return None
+            result = ChunkResult(index, payload, response, None)
+        self.results.append(result)
+        self._publish("chunk", result)
+        return result
+
+    def run(self):
+        total = len(self.payloads)
+        self._publish("progress", f"Enviando {total} lote(s), até {self.max_workers} por vez...")
+        with ThreadPoolExecutor(max_workers=min(self.max_workers, total or 1),
+                                thread_name_prefix="sap-lote") as executor:
+            futures = [executor.submit(self._send, index, payload) for index, payload in self.payloads]
+            results = [future.result() for future in futures]
+        self._publish("done", [result for result in results if result is not None])
@@ -0,0 +1,210 @@
+#sap_controller.py
+"""Controle do lado do cliente para o endpoint do SAP (URL_API).
+
+- Concorrência adaptativa (AIMD): o limite de requisições simultâneas sobe 1 a cada `limite`
+  respostas boas e cai pela metade a cada falha ou resposta lenta.
+- Disjuntor (circuit breaker): depois de FAILURE_THRESHOLD falhas seguidas o circuito abre e os
+  envios falham na hora, sem esperar o timeout. Passado o tempo de espera o circuito fica
+  meio-aberto e uma única requisição de teste decide se ele fecha ou volta a abrir (com espera
+  dobrada, até MAX_OPEN_SECONDS).
+
+Contam como falha: exceções (timeout, conexão recusada...) e status 429/5xx. Outros status 4xx
+mostram que o endpoint responde e não contam.
+"""
+import collections
+import threading
+import time
+
+from tracing import percentile
+
+STATE_CLOSED = "fechado"
+STATE_OPEN = "aberto"
+STATE_HALF_OPEN = "meio-aberto"
+
+FAILURE_THRESHOLD = 5
+OPEN_SECONDS = 30
+MAX_OPEN_SECONDS = 300
+INITIAL_LIMIT = 4
+MIN_LIMIT = 1
+MAX_LIMIT = 8  # Igual ao pool_maxsize da sessão HTTP
+SLOW_SECONDS = 10  # Resposta boa, mas lenta: também reduz o limite
+WINDOW = 200  # Respostas usadas nos percentis e na taxa de erro
+
+# Vaga reservada por acquire() e devolvida a release(); probe indica a requisição de teste do meio-aberto
+Slot = collections.namedtuple("Slot", ["probe"])
+
+class CircuitOpenError(Exception):
+    """Envio recusado sem contato com o SAP porque o circuito está aberto (ou em teste)"""
+
+# Status HTTP que indicam o endpoint com problemas
+def is_failure_status(status_code):
+    return status_code == 429 or status_code >= 500
+
+class SubmissionController:
+    def __init__(self, failure_threshold=FAILURE_THRESHOLD, open_seconds=OPEN_SECONDS,
+                 max_open_seconds=MAX_OPEN_SECONDS, initial_limit=INITIAL_LIMIT,
+                 min_limit=MIN_LIMIT, max_limit=MAX_LIMIT, slow_seconds=SLOW_SECONDS,
+                 window=WINDOW, clock=time.monotonic):
+        self.failure_threshold = failure_threshold
+        self.open_seconds = open_seconds
+        self.max_open_seconds = max_open_seconds
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.slow_seconds = slow_seconds
+        self.clock = clock
+        self._condition = threading.Condition()
+        self._limit = float(initial_limit)
+        self._in_flight = 0
+        self._state = STATE_CLOSED
+        self._consecutive_failures = 0
+        self._opened_at = None
+        self._current_open_seconds = open_seconds
+        self._probe_in_flight = False
+        # (latência em segundos, falhou) das últimas respostas
+        self._outcomes = collections.deque(maxlen=window)
+
+    # Passa de aberto para meio-aberto quando a espera termina (com o lock já adquirido)
+    def _refresh_state(self):
+        if self._state == STATE_OPEN and self.clock() - self._opened_at >= self._current_open_seconds:
+            self._state = STATE_HALF_OPEN
+            self._probe_in_flight = False
+
+    @property
+    def state(self):
+        with self._condition:
+            self._refresh_state()
+            return self._state
+
+    @property
+    def limit(self):
+        with self._condition:
+            return int(self._limit)
+
+    def _open_error(self):
+        remaining = max(0, self._current_open_seconds - (self.clock() - self._opened_at))
+        return CircuitOpenError(
+            f"Endpoint do SAP indisponível: {self._consecutive_failures} falhas seguidas. "
+            f"Nenhuma requisição será enviada nos próximos {remaining:.0f} s; tente novamente depois."
+        )
+
+    def check(self):
+        """Levanta CircuitOpenError se um envio seria recusado agora (sem reservar vaga)"""
+        with self._condition:
+            self._refresh_state()
+            if self._state == STATE_OPEN:
+                raise self._open_error()
+
+    def acquire(self, should_stop=None):
+        """Reserva uma vaga para uma requisição e devolve o Slot a passar para release(). Espera
+        enquanto o limite de simultâneas estiver atingido; devolve None se `should_stop()` ficar
+        verdadeiro durante a espera. Levanta CircuitOpenError com o circuito aberto ou com o teste
+        do meio-aberto já em andamento."""
+        with self._condition:
+            while True:
+                self._refresh_state()
+                if self._state == STATE_OPEN:
+                    raise self._open_error()
+                if self._state == STATE_HALF_OPEN:
+                    if self._probe_in_flight:
+                        raise CircuitOpenError(
+                            "Endpoint do SAP em teste após falhas seguidas; aguarde o resultado e tente novamente."
+                        )
+                    self._probe_in_flight = True
+                    self._in_flight += 1
+                    return Slot(probe=True)
+                if self._in_flight < int(self._limit):
+                    self._in_flight += 1
+                    return Slot(probe=False)
+                if should_stop and should_stop():
+                    return None
+                self._condition.wait(0.5)
+
+    def release(self, slot, latency, failed):
+        """Libera a vaga e registra o resultado (latência em segundos; failed = falha do endpoint).
+        Só a resposta da requisição de teste (slot.probe) fecha ou reabre o circuito meio-aberto;
+        respostas atrasadas de requisições enviadas antes da abertura não decidem o teste."""
+        with self._condition:
+            self._in_flight = max(0, self._in_flight - 1)
+            self._outcomes.append((latency, failed))
+            was_probe = slot.probe
+            if failed:
+                self._consecutive_failures += 1
+                self._limit = max(self.min_limit, self._limit / 2)
+                if was_probe:
+                    self._open(self._current_open_seconds * 2)
+                elif self._state == STATE_CLOSED and self._consecutive_failures >= self.failure_threshold:
+                    self._open(self.open_seconds)
+            else:
+                self._consecutive_failures = 0
+                if was_probe:
+                    self._state = STATE_CLOSED
+                    self._probe_in_flight = False
+                    self._current_open_seconds = self.open_seconds
+                if latency > self.slow_seconds:
+                    self._limit = max(self.min_limit, self._limit / 2)
+                else:
+                    self._limit = min(self.max_limit, self._limit + 1 / self._limit)
+            self._condition.notify_all()
+
+    def _open(self, seconds):
+        self._state = STATE_OPEN
+        self._opened_at = self.clock()
+        self._current_open_seconds = min(seconds, self.max_open_seconds)
+        self._probe_in_flight = False
+
+    def call(self, func, should_stop=None):
+        """Executa func() -> response com uma vaga reservada e registra o resultado.
+        Devolve None se `should_stop()` ficar verdadeiro antes de conseguir a vaga."""
+        slot = self.acquire(should_stop)
+        if slot is None:
+            return None
+        start = self.clock()
+        try:
+            response = func()
+        except BaseException:
+            self.release(slot, self.clock() - start, True)
+            raise
+        self.release(slot, self.clock() - start, is_failure_status(response.status_code))
+        return response
+
+    def stats(self):
+        """Estado, limite, simultâneas, percentis de latência (ms) e taxa de erro das últimas respostas"""
+        with self._condition:
+            self._refresh_state()
+            outcomes = list(self._outcomes)
+            stats = {
+                "estado": self._state,
+                "limite": int(self._limit),
+                "em_andamento": self._in_flight,
+                "falhas_seguidas": self._consecutive_failures,
+                "respostas": len(outcomes),
+            }
+            if self._state == STATE_OPEN:
+                stats["reabre_em_s"] = max(0, self._current_open_seconds - (self.clock() - self._opened_at))
+        if outcomes:
+            latencies = sorted(latency * 1000 for latency, _ in outcomes)
+            stats.update(
+                p50_ms=round(percentile(latencies, 0.50), 1),
+                p95_ms=round(percentile(latencies, 0.95), 1),
+                p99_ms=round(percentile(latencies, 0.99), 1),
+                taxa_erro=sum(failed for _, failed in outcomes) / len(outcomes),
+            )
+        return stats
+
+    def format_stats(self):
+        """Uma linha para o quadro "Resposta do SAP" """
+        stats = self.stats()
+        text = f"Circuito: {stats['estado']}"
+        if "reabre_em_s" in stats:
+            text += f" (teste em {stats['reabre_em_s']:.0f} s)"
+        text += f" | limite {stats['limite']} simultâneas ({stats['em_andamento']} em andamento)"
+        if stats["respostas"]:
+            text += (f" | latência p50 {stats['p50_ms']:.0f} ms, p95 {stats['p95_ms']:.0f} ms, "
+                     f"p99 {stats['p99_ms']:.0f} ms | erros {stats['taxa_erro']:.0%} "
+                     f"em {stats['respostas']} respostas")
+        return text
+
+_controller = SubmissionController()
+
+def get_controller():
+    return _controller
@@ -1,13 +1,16 @@
 #sap_integration.py
 import json
 import re
-import requests
 import os
+import queue
 import uuid
 import tkinter as tk
 from tkinter import messagebox, ttk
 from tkcalendar import DateEntry
 from config_manager import ConfigManager
+from sap_client import ChunkedSubmissionWorker, CombinedResponse, SubmissionWorker, new_request_ids, split_payload
+from sap_controller import CircuitOpenError, get_controller
+from tracing import span
 from datetime import datetime
 
 class SAPIntegrationDialog:
@@ -34,6 +37,11 @@ class SAPIntegrationDialog:
         self.response = None
         self.json_data = json_data
         self.log_callback = log_callback
+        self.worker = None
+        # Envio em lotes: payload e itens de cada lote e o último resultado de cada um
+        self.chunk_payloads = []
+        self.chunk_items = []
+        self.chunk_results = {}
         
         # Container principal
         self.main_frame = tk.Frame(self.dialog, bg='#f4f4f4')
@@ -46,6 +54,9 @@ class SAPIntegrationDialog:
         # Configurar interface
         self.setup_ui()
         
+        # Fechar a janela durante um envio equivale a cancelar
+        self.dialog.protocol("WM_DELETE_WINDOW", self.cancel)
+        
         # Focar janela
         self.dialog.focus_force()
 
@@ -123,6 +134,17 @@ class SAPIntegrationDialog:
             elif i == 3: self.cost_center = widget
             elif i == 4: self.conta_razao = widget
 
+        # Envio em lotes: cada lote vira uma requisição com CR_NUMBER e TOPDESK_KEY próprios
+        chunk_size = self.int_param("tamanho_lote_sap", 0)
+        self.split_var = tk.BooleanVar(value=chunk_size > 0)
+        self.chunk_size_var = tk.IntVar(value=chunk_size or 50)
+        ttk.Label(fields_frame, text="Envio em lotes:").grid(row=len(fields), column=0, sticky='e', padx=5, pady=5)
+        chunk_frame = ttk.Frame(fields_frame)
+        chunk_frame.grid(row=len(fields), column=1, sticky='w', padx=5, pady=5)
+        ttk.Checkbutton(chunk_frame, text="Dividir em lotes de", variable=self.split_var).pack(side='left')
+        ttk.Spinbox(chunk_frame, from_=1, to=1000, width=6, textvariable=self.chunk_size_var).pack(side='left', padx=5)
+        ttk.Label(chunk_frame, text="itens").pack(side='left')
+
         # Frame de botões (mesmo estilo da janela principal)
         buttons_frame = ttk.Frame(self.main_frame)
         buttons_frame.pack(fill='x', padx=10, pady=5)
@@ -150,11 +172,26 @@ class SAPIntegrationDialog:
         self.btn_cancel = ttk.Button(
             buttons_frame,
             text="Cancelar",
-            command=self.dialog.destroy,
+            command=self.cancel,
             width=20
         )
         self.btn_cancel.pack(side='left', padx=5)
         
+        self.btn_retry = ttk.Button(
+            buttons_frame,
+            text="Reenviar lotes com falha",
+            command=self.retry_failed_chunks,
+            width=24,
+            state="disabled"
+        )
+        self.btn_retry.pack(side='left', padx=5)
+        
+        # Andamento do envio em segundo plano
+        self.send_progress = ttk.Progressbar(buttons_frame, mode="indeterminate", length=120)
+        self.send_progress.pack(side='left', padx=5)
+        self.status_label = ttk.Label(buttons_frame, text="")
+        self.status_label.pack(side='left', padx=5)
+        
         # Preview Frame
         preview_frame = ttk.LabelFrame(self.main_frame, text="Preview do JSON", padding=10)
         preview_frame.pack(fill='both', expand=True, padx=10, pady=5)
@@ -206,6 +243,29 @@ class SAPIntegrationDialog:
         except Exception as e:
             self.log(f"Erro ao atualizar preview: {str(e)}")
 
+    # Parâmetro inteiro do parametros.json (valor padrão se ausente ou inválido)
+    def int_param(self, name, default):
+        try:
+            return int(self.params.get(name, default))
+        except (TypeError, ValueError):
+            return default
+
+    # Tamanho do lote escolhido (None se o envio não for dividido)
+    def chunk_size(self):
+        if not self.split_var.get():
+            return None
+        try:
+            size = int(self.chunk_size_var.get())
+        except (tk.TclError, ValueError):
+            raise ValueError("Tamanho do lote inválido")
+        if size < 1:
+            raise ValueError("O tamanho do lote deve ser pelo menos 1")
+        return size
+
+    # Um payload por lote de `size` itens (ver sap_client.split_payload)
+    def build_chunk_payloads(self, size):
+        return split_payload(self.build_payload(), size)
+
     # Construção do payload
     def build_payload(self):
         """Constrói o payload final para envio ao SAP"""
@@ -234,11 +294,12 @@ class SAPIntegrationDialog:
             conta_razao_full = self.conta_razao.get()
             conta_razao = conta_razao_full.split(" - ")[0] if " - " in conta_razao_full else conta_razao_full
             
+            topdesk_key, cr_number = new_request_ids()
             payload = {
                 "ZSBR_MM_AZU_WEBSHOP_PREQ": {
                     "I_WEBSHOP": {
-                        "TOPDESK_KEY": str(uuid.uuid4()),
-                        "CR_NUMBER": f"CR-{datetime.now().strftime('%y%m')}-{str(uuid.uuid4())[:5]}",
+                        "TOPDESK_KEY": topdesk_key,
+                        "CR_NUMBER": cr_number,
                         "REQUESTER": {
                             "USER": str(uuid.uuid4()),
                             "NOME": os.getenv('USERNAME').title(),
@@ -251,7 +312,8 @@ class SAPIntegrationDialog:
                         "ORDER": "",
                         "PLANT": "2201",
                         "CONTA_RAZAO": conta_razao,
-                        "ITEMS": self.json_data
+                        # Os itens só viram dicionários aqui, na fronteira com o SAP
+                        "ITEMS": [item.to_sap() for item in self.json_data]
                     }
                 }
             }
@@ -288,33 +350,210 @@ class SAPIntegrationDialog:
         if not self.validate_fields():
             return
         
+        if self.worker is not None:
+            return
+        
         try:
-            payload = self.build_payload()
-            self.last_payload = payload
-            self.log("Enviando requisição...", "info")
+            # Com o circuito aberto o envio falha aqui, sem esperar o timeout
+            get_controller().check()
+            size = self.chunk_size()
+            with span("sap.payload", itens=len(self.json_data), tamanho_lote=size) as prepare:
+                if size:
+                    self.chunk_payloads = self.build_chunk_payloads(size)
+                    self.chunk_items = [self.json_data[start:start + size]
+                                        for start in range(0, len(self.json_data), size)]
+                    self.chunk_results = {}
+                    prepare.set(lotes=len(self.chunk_payloads))
+                else:
+                    payload = self.build_payload()
             
-            response = requests.post(
-                self.params["URL_API"],
-                json=payload,
-                auth=(self.creds['usuario'], self.creds['senha']),
-                headers={'Content-Type': 'application/json'},
-                timeout=30
-            )
-            self.response = response
-            
-            if response.status_code == 200:
-                self.result = True
-                messagebox.showinfo("Sucesso", "Envio realizado com sucesso!")
-                self.dialog.destroy()
+            # O envio roda em uma thread; o resultado volta pela fila do worker
+            if size:
+                self.last_payload = None
+                self.worker = self.chunk_worker(list(enumerate(self.chunk_payloads)), prepare)
             else:
-                messagebox.showerror("Erro", f"Erro no envio: {response.text}")
+                self.last_payload = payload
+                self.worker = SubmissionWorker(
+                    self.params["URL_API"],
+                    payload,
+                    auth=(self.creds['usuario'], self.creds['senha']),
+                    timeout=30,
+                    trace_parent=prepare
+                )
+            self.set_sending(True)
+            self.worker.start()
+            self.dialog.after(100, self.poll_submission)
                 
         except Exception as e:
             self.response = None
+            self.worker = None
+            self.set_sending(False)
             error_msg = f"Erro durante o envio: {str(e)}"
             self.log(error_msg, "error")
             messagebox.showerror("Erro", error_msg)
 
+    # Worker que envia os lotes [(posição, payload)] com o paralelismo configurado
+    def chunk_worker(self, payloads, trace_parent=None):
+        return ChunkedSubmissionWorker(
+            self.params["URL_API"],
+            payloads,
+            auth=(self.creds['usuario'], self.creds['senha']),
+            timeout=30,
+            max_workers=self.int_param("envios_paralelos_sap", 4),
+            trace_parent=trace_parent
+        )
+
+    # Reenvia só os lotes que falharam, com os mesmos CR_NUMBER/TOPDESK_KEY
+    def retry_failed_chunks(self):
+        if self.worker is not None:
+            return
+        failed = [(index, self.chunk_payloads[index]) for index in self.unsent_chunks()]
+        if not failed:
+            return
+        try:
+            get_controller().check()
+        except CircuitOpenError as e:
+            self.log(str(e), "error")
+            messagebox.showerror("Erro", str(e))
+            return
+        self.log(f"Reenviando {len(failed)} lote(s) com falha ou não enviados", "info")
+        with span("sap.reenvio", lotes=len(failed)) as prepare:
+            self.worker = self.chunk_worker(failed, prepare)
+        self.set_sending(True)
+        self.worker.start()
+        self.dialog.after(100, self.poll_submission)
+
+    # Posições dos lotes com falha ou que não chegaram a ser enviados (envio cancelado)
+    def unsent_chunks(self):
+        return [index for index in range(len(self.chunk_payloads))
+                if index not in self.chunk_results or not self.chunk_results[index].ok]
+
+    # Resposta combinada dos lotes enviados até agora
+    def combined_response(self):
+        return CombinedResponse(self.chunk_results.values(), total=len(self.chunk_payloads))
+
+    # Itens dos lotes aceitos pelo SAP
+    @property
+    def sent_items(self):
+        return [item for index, result in sorted(self.chunk_results.items()) if result.ok
+                for item in self.chunk_items[index]]
+
+    # CR_NUMBER de cada item aceito pelo SAP: {id(item): cr_number}
+    def sent_cr_numbers(self):
+        if self.chunk_results:
+            return {id(item): result.cr_number for index, result in self.chunk_results.items() if result.ok
+                    for item in self.chunk_items[index]}
+        if self.result and self.last_payload:
+            cr_number = self.last_payload["ZSBR_MM_AZU_WEBSHOP_PREQ"]["I_WEBSHOP"]["CR_NUMBER"]
+            return {id(item): cr_number for item in self.json_data}
+        return {}
+
+    # Envios a registrar no histórico: [(payload, resposta)], um por lote no envio em lotes
+    def history_entries(self):
+        if self.chunk_results:
+            return [(result.payload, result.response if result.response is not None else result.error)
+                    for _, result in sorted(self.chunk_results.items())]
+        if self.response is not None:
+            return [(self.last_payload, self.response)]
+        return []
+
+    # Habilita/desabilita os controles enquanto há um envio em andamento
+    def set_sending(self, sending):
+        state = "disabled" if sending else "normal"
+        self.btn_send.config(state=state)
+        self.btn_preview.config(state=state)
+        has_failures = bool(self.chunk_results) and bool(self.unsent_chunks())
+        self.btn_retry.config(state="normal" if has_failures and not sending else "disabled")
+        # Depois do primeiro envio em lotes, um novo envio geraria outros CR_NUMBER para os mesmos itens
+        if self.chunk_results:
+            self.btn_send.config(state="disabled")
+        self.btn_cancel.config(text="Cancelar envio" if sending else "Cancelar")
+        if sending:
+            self.send_progress.start(10)
+        else:
+            self.send_progress.stop()
+            self.status_label.config(text="")
+
+    # Lê os eventos publicados pelo worker (executado no loop do Tk)
+    def poll_submission(self):
+        worker = self.worker
+        if worker is None or worker.cancelled:
+            return
+        try:
+            while True:
+                kind, value = worker.events.get_nowait()
+                if kind == "progress":
+                    self.status_label.config(text=value)
+                    self.log(value, "info")
+                elif kind == "chunk":
+                    self.chunk_results[value.index] = value
+                    self.response = self.combined_response()
+                    self.status_label.config(text=self.response.summary())
+                    self.log(value.describe(), "info" if value.ok else "error")
+                elif kind == "done" and isinstance(self.worker, ChunkedSubmissionWorker):
+                    self.worker = None
+                    self.set_sending(False)
+                    self.handle_chunk_results()
+                    return
+                elif kind == "done":
+                    self.worker = None
+                    self.set_sending(False)
+                    self.handle_response(value)
+                    return
+                elif kind == "error":
+                    self.worker = None
+                    self.set_sending(False)
+                    self.response = None
+                    error_msg = f"Erro durante o envio: {str(value)}"
+                    self.log(error_msg, "error")
+                    messagebox.showerror("Erro", error_msg)
+                    return
+        except queue.Empty:
+            pass
+        self.dialog.after(100, self.poll_submission)
+
+    # Trata a resposta do SAP
+    def handle_response(self, response):
+        self.response = response
+        
+        if response.status_code == 200:
+            self.result = True
+            messagebox.showinfo("Sucesso", "Envio realizado com sucesso!")
+            self.dialog.destroy()
+        else:
+            messagebox.showerror("Erro", f"Erro no envio: {response.text}")
+
+    # Trata o resultado combinado dos lotes
+    def handle_chunk_results(self):
+        self.response = self.combined_response()
+        failed = self.response.failed
+        if self.response.complete:
+            self.result = True
+            messagebox.showinfo("Sucesso", f"Envio realizado com sucesso! ({self.response.summary()})")
+            self.dialog.destroy()
+        else:
+            messagebox.showerror(
+                "Erro",
+                f"Envio incompleto ({self.response.summary()}).\n"
+                "Use \"Reenviar lotes com falha\" para tentar de novo só esses lotes.\n\n"
+                + "\n".join(chunk.describe() for chunk in failed)
+            )
+
+    # Cancela o envio em andamento ou fecha a janela
+    def cancel(self):
+        if self.worker is not None:
+            self.worker.cancel()
+            # Lotes que terminaram antes do cancelamento continuam valendo
+            for result in getattr(self.worker, "results", ()):
+                self.chunk_results[result.index] = result
+            if self.chunk_results:
+                self.response = self.combined_response()
+            self.worker = None
+            self.set_sending(False)
+            self.log("Envio cancelado pelo usuário; o SAP pode já ter recebido a requisição", "warning")
+            return
+        self.dialog.destroy()
+
     # Centralização do diálogo
     def center_dialog(self, parent):
         """Centraliza o diálogo em relação à janela pai"""
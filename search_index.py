@@ -0,0 +1,142 @@
+#search_index.py
+import re
+import threading
+import unicodedata
+from array import array
+from bisect import bisect_left
+
+_TOKEN_RE = re.compile(r"\w+")
+_NON_DIGIT_RE = re.compile(r"\D")
+# Só dígitos e a pontuação de CNPJ/códigos ("02.558.157/0001-62")
+_NUMERIC_RE = re.compile(r"[\d.\-/\s]*\d[\d.\-/\s]*")
+
+# Minúsculas e sem acentos ("Serviço" -> "servico"); números pontuados ficam só com os dígitos
+def normalize(text):
+    text = str(text).strip()
+    if _NUMERIC_RE.fullmatch(text):
+        return _NON_DIGIT_RE.sub("", text)
+    decomposed = unicodedata.normalize("NFKD", text.lower())
+    return "".join(char for char in decomposed if not unicodedata.combining(char))
+
+# Termos da consulta: separados por espaço antes da normalização, para que o texto exibido
+# ("02558157000162 - 1000029760") não vire um único número
+def query_terms(query):
+    terms = []
+    for chunk in str(query).split():
+        normalized = normalize(chunk)
+        terms.extend([normalized] if normalized.isdigit() else _TOKEN_RE.findall(normalized))
+    return terms
+
+# Índice de busca por prefixo e por trigramas para os comboboxes de fornecedor e material
+class SearchIndex:
+    """Cada entrada tem um texto de exibição e os campos pesquisáveis (CNPJ, código, descrição...).
+
+    Uma entrada é encontrada quando contém todos os termos da consulta. Os candidatos vêm:
+
+    - das palavras que começam pelo termo principal (busca binária na lista ordenada), que
+      aparecem primeiro;
+    - da lista de trigramas mais curta do termo principal, confirmados por busca de substring.
+      Termos de 1 ou 2 letras não têm trigramas: como termo principal, só as palavras que começam
+      por eles contam.
+
+    O termo principal é o que tem a menor lista de candidatos.
+
+    CNPJs são indexados e pesquisados só com os dígitos, então "02.558" encontra "02558157000162".
+    A busca para assim que tem `limit` resultados.
+
+    Com background=True o índice é montado em uma thread (listas grandes de fornecedores levam
+    mais de um segundo); len(), `in` e a busca vazia respondem na hora, e a primeira busca com
+    termos espera o fim da montagem.
+    """
+
+    def __init__(self, entries, background=False):
+        """entries: lista de (texto_de_exibição, campos_pesquisáveis)"""
+        entries = list(entries)
+        self.displays = [display for display, _ in entries]
+        self._display_set = set(self.displays)
+        self._built = threading.Event()
+        if background:
+            threading.Thread(target=self._build, args=(entries,), daemon=True, name="search-index").start()
+        else:
+            self._build(entries)
+
+    def _build(self, entries):
+        haystacks = []
+        tokens = []
+        trigrams = {}
+        for entry_id, (_, fields) in enumerate(entries):
+            haystack = " ".join(normalize(field) for field in fields)
+            haystacks.append(haystack)
+
+            for token in set(_TOKEN_RE.findall(haystack)):
+                tokens.append((token, entry_id))
+            for trigram in {haystack[i:i + 3] for i in range(len(haystack) - 2)}:
+                posting = trigrams.get(trigram)
+                if posting is None:
+                    trigrams[trigram] = [entry_id]
+                else:
+                    posting.append(entry_id)
+
+        # Listas de ids em array: ocupam 4 bytes por id em vez de um objeto por id
+        self.trigrams = {trigram: array("I", posting) for trigram, posting in trigrams.items()}
+        tokens.sort()
+        self.tokens = [token for token, _ in tokens]
+        self.token_ids = array("I", (entry_id for _, entry_id in tokens))
+        self.haystacks = haystacks
+        self._built.set()
+
+    def __len__(self):
+        return len(self.displays)
+
+    def __contains__(self, display):
+        return display in self._display_set
+
+    # Ids das entradas com alguma palavra começando pelo termo, na ordem das palavras
+    def _prefix_ids(self, term):
+        tokens = self.tokens
+        position = bisect_left(tokens, term)
+        while position < len(tokens) and tokens[position].startswith(term):
+            yield self.token_ids[position]
+            position += 1
+
+    # Ids candidatos a conter o termo (a lista de trigramas mais curta), na ordem das entradas.
+    # Termos curtos: as entradas com alguma palavra começando pelo termo
+    def _candidate_ids(self, term):
+        if len(term) < 3:
+            start = bisect_left(self.tokens, term)
+            end = bisect_left(self.tokens, term + "\uffff", start)
+            return self.token_ids[start:end]
+        shortest = None
+        for i in range(len(term) - 2):
+            posting = self.trigrams.get(term[i:i + 3])
+            if posting is None:
+                return ()
+            if shortest is None or len(posting) < len(shortest):
+                shortest = posting
+        return shortest
+
+    def search(self, query, limit=50):
+        """Devolve até `limit` textos de exibição que contêm todos os termos da consulta"""
+        terms = query_terms(query)
+        if not terms:
+            return self.displays[:limit]
+        self._built.wait()
+
+        # O termo com menos candidatos gera a busca; os outros só são conferidos
+        candidates = {term: self._candidate_ids(term) for term in terms}
+        primary = min(terms, key=lambda term: (len(candidates[term]), -len(term)))
+        haystacks = self.haystacks
+
+        results = []
+        seen = set()
+        for source in (self._prefix_ids(primary), candidates[primary]):
+            for entry_id in source:
+                if entry_id in seen:
+                    continue
+                haystack = haystacks[entry_id]
+                if all(term in haystack for term in terms):
+                    seen.add(entry_id)
+                    results.append(entry_id)
+                    if len(results) >= limit:
+                        return [self.displays[i] for i in results]
+        return [self.displays[i] for i in results]
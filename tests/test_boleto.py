@@ -0,0 +1,71 @@
+#test_boleto.py
+"""Decodificação de linhas digitáveis conhecidas (bancária e arrecadação, com e sem hífens)."""
+import datetime
+
+import pytest
+
+from boleto import KIND_BANK, KIND_COLLECTION, decode, due_date_from_factor, find_boletos, mod10, mod11_bank
+
+BANK_LINE = "34191.23454 67890.123457 67890.123457 5 12390000123456"
+COLLECTION_LINE = "83640000001-1 33120138000-2 81288462711-6 08013618155-1"
+
+# Linha digitável formatada a partir dos 43 dígitos do código de barras sem o DV geral
+def format_bank_line(without_dv):
+    barcode = without_dv[:4] + str(mod11_bank(without_dv)) + without_dv[4:]
+    fields = [barcode[0:4] + barcode[19:24], barcode[24:34], barcode[34:44]]
+    fields = [field + str(mod10(field)) for field in fields]
+    return " ".join(f"{field[:5]}.{field[5:]}" for field in fields) + f" {barcode[4]} {barcode[5:19]}"
+
+def test_bank_line():
+    (info,) = find_boletos(f"Linha digitável: {BANK_LINE}", datetime.date(2025, 10, 1))
+    assert info.kind == KIND_BANK
+    assert info.issuer == "341"
+    assert info.amount_cents == 123456
+    assert info.due_date == datetime.date(2025, 10, 19)
+    assert info.barcode == "34195123900001234561234567890123456789012345"
+
+@pytest.mark.parametrize("text", [
+    COLLECTION_LINE,
+    COLLECTION_LINE.replace("-", " "),
+    COLLECTION_LINE.replace("-", ""),
+    COLLECTION_LINE.replace(" ", "\n"),
+])
+def test_collection_line(text):
+    (info,) = find_boletos(f"Pague até 10/05/2025 {text} Autenticação")
+    assert info.kind == KIND_COLLECTION
+    assert info.amount_cents == 13312
+    assert info.barcode == "83640000001331201380008128846271108013618155"
+
+def test_bank_line_needs_currency_9():
+    barcode = "34195123900001234561234567890123456789012345"
+    assert format_bank_line(barcode[:4] + barcode[5:]) == BANK_LINE
+    assert find_boletos(format_bank_line("3410" + barcode[5:])) == []
+
+# DVs corretos não bastam: dígitos de uma tabela agrupados de outro jeito não são uma linha digitável
+@pytest.mark.parametrize("text", [
+    BANK_LINE.replace(".", "").replace(" ", ""),
+    " ".join(BANK_LINE.replace(".", "").replace(" ", "")[i:i + 8] for i in range(0, 47, 8)),
+    BANK_LINE.replace(" 5 ", " 5"),
+])
+def test_bank_line_needs_standard_layout(text):
+    assert find_boletos(text) == []
+
+def test_collection_barcode():
+    info = decode("83640000001331201380008128846271108013618155")
+    assert info.amount_cents == 13312
+
+def test_wrong_check_digit_is_rejected():
+    assert find_boletos(BANK_LINE.replace("5 1239", "6 1239")) == []
+    assert find_boletos(COLLECTION_LINE.replace("-2 ", "-3 ")) == []
+
+def test_mod10():
+    assert mod10("83640000001") == 1
+    assert mod10("33120138000") == 2
+    assert mod10("0") == 0
+
+def test_due_date_factor_rollover():
+    reference = datetime.date(2025, 3, 1)
+    assert due_date_from_factor(9999, reference) == datetime.date(2025, 2, 21)
+    assert due_date_from_factor(1000, reference) == datetime.date(2025, 2, 22)
+    assert due_date_from_factor(1000, datetime.date(2001, 1, 1)) == datetime.date(2000, 7, 3)
+    assert due_date_from_factor(0) is None
@@ -0,0 +1,20 @@
+#test_cnpj_index.py
+"""Detecção de fornecedores pelos CNPJs impressos no PDF."""
+from cnpj_index import CnpjIndex
+from json_generator import VIVO_CNPJ_MAPPING
+
+def test_detect_formatted_and_raw():
+    index = CnpjIndex({"11.222.333/0001-81": "1000000001", "44555666000199": "1000000002"})
+    (first, second) = index.detect("Emitente 11222333000181 ... Tomador 44.555.666/0001-99 e 11.222.333/0001-81")
+    assert (first.code, first.count) == ("1000000001", 2)
+    assert (second.cnpj, second.code) == ("44555666000199", "1000000002")
+    assert index.detect("Número 9911222333000181") == []
+
+def test_vivo_mapping_entries_are_selectable():
+    index = CnpjIndex({"02.558.157/0001-62": "2000000000"}, VIVO_CNPJ_MAPPING)
+    # O fornecedores.json prevalece e aparece primeiro; os demais CNPJs da Vivo vêm do mapeamento
+    assert index.entries()[0] == ("02.558.157/0001-62", "2000000000")
+    assert len(index) == len(VIVO_CNPJ_MAPPING)
+    (match,) = index.detect("CNPJ 02.558.157/0002-43")
+    assert (match.cnpj, match.code) == ("02558157000243", "1000029762")
+    assert (match.cnpj, match.code) in index.entries()
@@ -0,0 +1,81 @@
+#test_document_loader.py
+"""Teste de fumaça: PDFs reais passam por load_document (com e sem o cache de extração) e por
+load_vivo_movel."""
+import random
+
+import pytest
+
+pytest.importorskip("fitz")
+
+from benchmarks.corpus import boleto_pages, invoice_pages, money, vivo_pages, write_pdf
+from document_loader import load_document, load_vivo_movel
+from extraction_cache import ExtractionCache
+from extraction_templates import TemplateRegistry
+
+@pytest.fixture
+def invoice(tmp_path):
+    pages, total, _ = invoice_pages(random.Random(1))
+    path = tmp_path / "fatura.pdf"
+    write_pdf(str(path), pages)
+    return str(path), money(total)
+
+def test_load_without_cache(invoice):
+    path, total = invoice
+    result = load_document(path, templates=TemplateRegistry())
+    assert result["values"][0] == total
+    assert len(result["digest"]) == 64
+    assert result["partial"] is False
+
+def test_load_with_cache(invoice, tmp_path):
+    path, total = invoice
+    cache = ExtractionCache(str(tmp_path / "cache.sqlite3"))
+    logs = []
+    first = load_document(path, cache, templates=TemplateRegistry())
+    second = load_document(path, cache, templates=TemplateRegistry(), log_callback=lambda msg, level: logs.append(msg))
+    assert first["values"][0] == second["values"][0] == total
+    assert first["digest"] == second["digest"]
+    assert "Resultado da extração obtido do cache" in logs
+
+# Modo Vivo Móvel ativado à mão depois de um carregamento com streaming: todas as notas fiscais
+# precisam ser lidas, não só as das páginas lidas até o "Total a Pagar"
+def test_load_vivo_movel_reads_every_page(tmp_path):
+    pages, _, info = vivo_pages(random.Random(2), 10, 9)
+    path = str(tmp_path / "fatura.pdf")
+    write_pdf(path, pages)
+    cache = ExtractionCache(str(tmp_path / "cache.sqlite3"))
+    for _ in range(2):
+        text, data = load_vivo_movel(path, cache)
+        assert len(data["notas_fiscais"]) == info["notas_fiscais"]
+        assert "Página 10 de 10" in text
+
+# O caminho rápido do boleto lê só a primeira e a última página: o texto é marcado como parcial,
+# também quando vem do cache
+def test_boleto_text_is_partial(tmp_path):
+    rng = random.Random(3)
+    boleto, total, _ = boleto_pages(rng)
+    filler = [page for _ in range(2) for page in invoice_pages(rng)[0]]
+    path = str(tmp_path / "boleto.pdf")
+    write_pdf(path, boleto + filler + boleto)
+    cache = ExtractionCache(str(tmp_path / "cache.sqlite3"))
+    for _ in range(2):
+        result = load_document(path, cache, templates=TemplateRegistry())
+        assert result["values"] == [money(total)]
+        assert result["partial"] is True
+
+# A pontuação reaproveita os boletos procurados pela extração: find_boletos roda uma vez por página
+@pytest.mark.parametrize("streaming", [False, True])
+def test_scoring_reuses_page_boletos(invoice, monkeypatch, streaming):
+    import pdf_reader
+    path, total = invoice
+    calls = []
+    find_boletos = pdf_reader.find_boletos
+
+    def counting_find_boletos(text, reference=None):
+        calls.append(text)
+        return find_boletos(text, reference)
+
+    monkeypatch.setattr(pdf_reader, "find_boletos", counting_find_boletos)
+    result = load_document(path, streaming=streaming, templates=TemplateRegistry())
+    assert result["scores"][0].value == total
+    assert "negrito" in result["scores"][0].reasons
+    assert len(calls) == len(set(calls))
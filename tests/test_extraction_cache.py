@@ -0,0 +1,27 @@
+#test_extraction_cache.py
+"""Gravação e leitura das entradas do cache de extração."""
+import sqlite3
+
+from extraction_cache import ExtractionCache
+
+def test_put_and_get(tmp_path):
+    cache = ExtractionCache(str(tmp_path / "cache.sqlite3"))
+    cache.put("abc", "1", text="texto", values=["1.234,56"], layout="generico",
+              scores=[("1.234,56", 0.9, ["rótulo forte"])], template="Fornecedor X")
+    cached = cache.get("abc", "1")
+    assert cached["texto"] == "texto"
+    assert cached["valores"] == ["1.234,56"]
+    assert cached["pontuacoes"] == [["1.234,56", 0.9, ["rótulo forte"]]]
+    assert cached["modelo"] == "Fornecedor X"
+    assert cache.get("abc", "2") is None
+
+def test_database_errors_are_ignored(tmp_path, monkeypatch):
+    cache = ExtractionCache(str(tmp_path / "cache.sqlite3"))
+
+    def locked():
+        raise sqlite3.OperationalError("database is locked")
+
+    monkeypatch.setattr(cache, "_connect", locked)
+    cache.evict()
+    cache.put("abc", "1", text="texto")
+    assert cache.get("abc", "1") is None
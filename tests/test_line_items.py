@@ -0,0 +1,48 @@
+#test_line_items.py
+"""Conversão de valores digitados (SAP e janela de edição) e lidos do PDF em Money."""
+import pytest
+
+from line_items import Money
+
+@pytest.mark.parametrize("text, cents", [
+    ("1.234,56", 123456),
+    ("R$ 0,01", 1),
+    ("2.000", 200),  # Sem vírgula o ponto é decimal (formato do SAP)
+    ("1234.56", 123456),
+    ("-10,5", -1050),
+])
+def test_parse(text, cents):
+    assert Money.parse(text).cents == cents
+
+@pytest.mark.parametrize("text, cents", [
+    ("1.234,56", 123456),
+    ("R$ 0,01", 1),
+    ("2.000", 200000),  # Lido do PDF: o ponto é sempre separador de milhar
+    ("1.234.567,89", 123456789),
+])
+def test_parse_br(text, cents):
+    assert Money.parse_br(text).cents == cents
+
+@pytest.mark.parametrize("text", ["", "abc", "1,2,3", "NaN"])
+def test_invalid(text):
+    with pytest.raises(ValueError):
+        Money.parse(text)
+
+def test_format():
+    assert str(Money(123456)) == "1.234,56"
+    assert Money(-1).to_sap() == "-0.01"
+
+@pytest.mark.parametrize("text, cents", [
+    ("1.234,56", 123456),
+    ("R$ 0,01", 1),
+    ("2.000", 200000),  # Digitado como exibido: o ponto sozinho é separador de milhar
+    ("1.234.567", 123456700),
+    ("2000", 200000),
+])
+def test_parse_typed(text, cents):
+    assert Money.parse_typed(text).cents == cents
+
+@pytest.mark.parametrize("text", ["2000.50", "1.23", "abc", ""])
+def test_parse_typed_rejects_ambiguous(text):
+    with pytest.raises(ValueError):
+        Money.parse_typed(text)
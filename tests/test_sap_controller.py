@@ -0,0 +1,122 @@
+#test_sap_controller.py
+"""Concorrência adaptativa (AIMD) e transições do disjuntor do sap_controller, com relógio falso."""
+import pytest
+
+from sap_controller import (
+    STATE_CLOSED, STATE_HALF_OPEN, STATE_OPEN, CircuitOpenError, SubmissionController
+)
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+class FakeResponse:
+    def __init__(self, status_code):
+        self.status_code = status_code
+
+def make_controller(**kwargs):
+    clock = FakeClock()
+    options = dict(failure_threshold=3, open_seconds=30, max_open_seconds=100, initial_limit=4,
+                   max_limit=8, slow_seconds=10, clock=clock)
+    options.update(kwargs)
+    return SubmissionController(**options), clock
+
+def respond(controller, status_code=200):
+    return controller.call(lambda: FakeResponse(status_code))
+
+def fail(controller):
+    def timeout():
+        raise TimeoutError("timeout")
+    with pytest.raises(TimeoutError):
+        controller.call(timeout)
+
+def test_aimd_increase_and_decrease():
+    controller, _ = make_controller()
+    # Cada resposta boa soma 1/limite: de 4 para 5 são 5 respostas (4 somam só 0,96)
+    for _ in range(4):
+        respond(controller)
+    assert controller.limit == 4
+    respond(controller)
+    assert controller.limit == 5
+    # Cai pela metade com falha (429/5xx) e com resposta lenta; 4xx não conta como falha
+    respond(controller, 503)
+    assert controller.limit == 2
+    respond(controller, 404)
+    assert controller.state == STATE_CLOSED
+    slot = controller.acquire()
+    controller.release(slot, 11, False)
+    assert controller.limit == 1
+
+def test_opens_after_consecutive_failures():
+    controller, clock = make_controller()
+    fail(controller)
+    fail(controller)
+    respond(controller)  # Uma resposta boa zera a sequência
+    fail(controller)
+    fail(controller)
+    assert controller.state == STATE_CLOSED
+    respond(controller, 500)
+    assert controller.state == STATE_OPEN
+    with pytest.raises(CircuitOpenError):
+        controller.check()
+    with pytest.raises(CircuitOpenError):
+        respond(controller)
+    clock.now += 29
+    assert controller.state == STATE_OPEN
+
+def open_circuit(controller):
+    for _ in range(3):
+        fail(controller)
+    assert controller.state == STATE_OPEN
+
+def test_half_open_probe_success_closes():
+    controller, clock = make_controller()
+    open_circuit(controller)
+    clock.now += 30
+    assert controller.state == STATE_HALF_OPEN
+    probe = controller.acquire()
+    assert probe.probe
+    # Só uma requisição de teste por vez
+    with pytest.raises(CircuitOpenError):
+        controller.acquire()
+    controller.release(probe, 0.1, False)
+    assert controller.state == STATE_CLOSED
+    assert not controller.acquire().probe
+
+def test_half_open_probe_failure_doubles_wait():
+    controller, clock = make_controller()
+    open_circuit(controller)
+    clock.now += 30
+    fail(controller)
+    assert controller.state == STATE_OPEN
+    clock.now += 59
+    assert controller.state == STATE_OPEN
+    clock.now += 1
+    assert controller.state == STATE_HALF_OPEN
+    fail(controller)
+    # A espera dobra até max_open_seconds
+    clock.now += 100
+    assert controller.state == STATE_HALF_OPEN
+
+def test_stale_success_does_not_close_half_open():
+    # Limite alto o bastante para a vaga presa não bloquear as falhas que abrem o circuito
+    controller, clock = make_controller(initial_limit=8)
+    stale = controller.acquire()
+    open_circuit(controller)
+    clock.now += 30
+    probe = controller.acquire()
+    # Resposta atrasada de uma requisição enviada antes da abertura
+    controller.release(stale, 0.1, False)
+    assert controller.state == STATE_HALF_OPEN
+    with pytest.raises(CircuitOpenError):
+        controller.acquire()
+    controller.release(probe, 0.1, False)
+    assert controller.state == STATE_CLOSED
+
+def test_acquire_gives_up_when_stopped():
+    controller, _ = make_controller(initial_limit=1)
+    controller.acquire()
+    assert controller.acquire(should_stop=lambda: True) is None
@@ -0,0 +1,35 @@
+#test_search_index.py
+"""Busca dos comboboxes de fornecedor e material."""
+from search_index import SearchIndex, query_terms
+
+SUPPLIERS = [
+    ("02558157000162 - 1000029760", ("02.558.157/0001-62", "1000029760")),
+    ("11222333000181 - 1000012345", ("11.222.333/0001-81", "1000012345")),
+]
+MATERIALS = [
+    ("ZA040282 - Serviço de manutenção", ("ZA040282", "Serviço de manutenção")),
+    ("ZA040300 - Aquisição de peças", ("ZA040300", "Aquisição de peças")),
+]
+
+def test_query_terms():
+    assert query_terms("02558157000162 - 1000029760") == ["02558157000162", "1000029760"]
+    assert query_terms("02.558.157/0001-62") == ["02558157000162"]
+    assert query_terms("Manutenção  ZA04") == ["manutencao", "za04"]
+
+def test_displayed_entry_finds_itself():
+    index = SearchIndex(SUPPLIERS)
+    for display, _ in SUPPLIERS:
+        assert index.search(display) == [display]
+    assert index.search("02.558 1000029760") == [SUPPLIERS[0][0]]
+
+def test_short_terms_match_word_prefixes():
+    index = SearchIndex(MATERIALS)
+    assert index.search("a p") == [MATERIALS[1][0]]
+    assert index.search("se") == [MATERIALS[0][0]]
+    assert index.search("x") == []
+
+def test_background_build():
+    index = SearchIndex(SUPPLIERS, background=True)
+    assert len(index) == 2 and SUPPLIERS[1][0] in index
+    assert index.search("") == [display for display, _ in SUPPLIERS]
+    assert index.search("1000012") == [SUPPLIERS[1][0]]
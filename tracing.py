@@ -0,0 +1,177 @@
+#tracing.py
+"""Rastreamento leve das etapas do aplicativo (abrir o PDF, extrair, gerar o JSON, enviar ao SAP).
+
+Cada etapa é um span com nome, atributos (páginas, candidatos, itens, status HTTP...) e o span
+pai. O pai é o span aberto no mesmo contexto; entre threads ele é passado por `parent=`.
+
+Os spans terminados são gravados em TRACE_FILE, um por linha, como eventos "X" (completos) do
+formato de trace do Chrome, com trace_id/span_id/parent_id em "args" como no OTLP. Para abrir no
+chrome://tracing ou no Perfetto:
+
+    python -m tracing logs/traces.jsonl trace.json
+
+As durações da sessão ficam em memória para o resumo (p50/p95 por etapa) da aba Log.
+"""
+import collections
+import contextvars
+import json
+import math
+import os
+import secrets
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+from app_logging import LOG_DIR
+
+TRACE_FILE = os.path.join(LOG_DIR, "traces.jsonl")
+
+_current = contextvars.ContextVar("span_atual", default=None)
+
+# Uma etapa medida
+class Span:
+    __slots__ = ("name", "attributes", "trace_id", "span_id", "parent_id", "start_us", "_start_ns", "duration_us")
+
+    def __init__(self, name, parent=None, attributes=None):
+        self.name = name
+        self.attributes = dict(attributes or {})
+        self.trace_id = parent.trace_id if parent else secrets.token_hex(16)
+        self.span_id = secrets.token_hex(8)
+        self.parent_id = parent.span_id if parent else None
+        self.start_us = time.time_ns() // 1000
+        self._start_ns = time.perf_counter_ns()
+        self.duration_us = None
+
+    def set(self, **attributes):
+        """Acrescenta atributos ao span (ex.: quantidade de páginas lidas)"""
+        self.attributes.update(attributes)
+
+    def finish(self):
+        self.duration_us = (time.perf_counter_ns() - self._start_ns) // 1000
+
+    # Evento "X" do formato de trace do Chrome
+    def to_event(self):
+        args = {"trace_id": self.trace_id, "span_id": self.span_id, "parent_id": self.parent_id}
+        args.update(self.attributes)
+        return {
+            "name": self.name, "cat": "lancador", "ph": "X",
+            "ts": self.start_us, "dur": self.duration_us,
+            "pid": os.getpid(), "tid": threading.get_ident(), "args": args,
+        }
+
+# Percentil pelo método do posto mais próximo (valores já ordenados)
+def percentile(values, fraction):
+    return values[max(0, math.ceil(fraction * len(values)) - 1)]
+
+class Tracer:
+    """Grava os spans terminados em JSONL e guarda as durações da sessão (no máximo `keep` por etapa)"""
+
+    def __init__(self, path=TRACE_FILE, max_bytes=5 * 1024 * 1024, keep=10000):
+        self.path = path
+        self.max_bytes = max_bytes
+        self._file = None
+        self._lock = threading.Lock()
+        self._durations = collections.defaultdict(lambda: collections.deque(maxlen=keep))
+
+    @contextmanager
+    def span(self, name, parent=None, **attributes):
+        """Abre um span filho do span atual (ou de `parent`); exceções ficam no atributo "erro" """
+        span = Span(name, parent or _current.get(), attributes)
+        token = _current.set(span)
+        try:
+            yield span
+        except BaseException as e:
+            span.set(erro=type(e).__name__)
+            raise
+        finally:
+            _current.reset(token)
+            span.finish()
+            self._record(span)
+
+    def _record(self, span):
+        line = json.dumps(span.to_event(), ensure_ascii=False, default=str)
+        with self._lock:
+            self._durations[span.name].append(span.duration_us / 1000)
+            if self.path is None:
+                return
+            try:
+                if self._file is None:
+                    self._open()
+                self._file.write(line + "\n")
+                self._file.flush()
+            except OSError:
+                # O rastreamento não pode atrapalhar o aplicativo: sem arquivo, só o resumo
+                self.path = None
+
+    def _open(self):
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        # Um arquivo anterior de cada vez, como no log rotativo
+        if os.path.exists(self.path) and os.path.getsize(self.path) > self.max_bytes:
+            os.replace(self.path, f"{self.path}.1")
+        self._file = open(self.path, "a", encoding="utf-8")
+
+    def summary(self):
+        """Devolve [(etapa, quantidade, p50_ms, p95_ms, total_ms)] da sessão, da mais demorada no total"""
+        with self._lock:
+            durations = {name: sorted(values) for name, values in self._durations.items() if values}
+        rows = [
+            (name, len(values), percentile(values, 0.50), percentile(values, 0.95), sum(values))
+            for name, values in durations.items()
+        ]
+        rows.sort(key=lambda row: row[4], reverse=True)
+        return rows
+
+    def format_summary(self):
+        """Resumo em texto, uma etapa por linha"""
+        rows = self.summary()
+        if not rows:
+            return "Nenhuma etapa medida nesta sessão"
+        width = max(len(row[0]) for row in rows)
+        lines = [f"{'etapa':<{width}} {'n':>5} {'p50 (ms)':>10} {'p95 (ms)':>10}"]
+        for name, count, p50, p95, _ in rows:
+            lines.append(f"{name:<{width}} {count:>5} {p50:>10.1f} {p95:>10.1f}")
+        return "\n".join(lines)
+
+    def close(self):
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+_tracer = Tracer()
+
+def get_tracer():
+    return _tracer
+
+def span(name, parent=None, **attributes):
+    """Atalho para get_tracer().span(...)"""
+    return _tracer.span(name, parent, **attributes)
+
+def current_span():
+    """Span aberto no contexto atual (para passar como `parent` a outra thread)"""
+    return _current.get()
+
+# Converte o JSONL em um arquivo que o chrome://tracing e o Perfetto abrem diretamente
+def export_chrome_trace(jsonl_path, output_path):
+    events = []
+    with open(jsonl_path, encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if line:
+                try:
+                    events.append(json.loads(line))
+                except ValueError:
+                    # Linha cortada (aplicativo encerrado no meio da gravação)
+                    continue
+    with open(output_path, "w", encoding="utf-8") as f:
+        json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, f, ensure_ascii=False)
+    return len(events)
+
+if __name__ == "__main__":
+    if len(sys.argv) != 3:
+        print("Uso: python -m tracing ENTRADA.jsonl SAIDA.json", file=sys.stderr)
+        sys.exit(2)
+    print(f"{export_chrome_trace(sys.argv[1], sys.argv[2])} eventos exportados")
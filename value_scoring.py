@@ -0,0 +1,162 @@
+#value_scoring.py
+"""Pontuação dos valores candidatos a total da fatura.
+
+Cada candidato recebe pontos por característica encontrada nas páginas já lidas:
+
+- rótulo: colado a um rótulo forte (TOTAL A PAGAR, VALOR DO DOCUMENTO...) ou a outro rótulo/R$;
+- linha digitável: igual ao valor de uma linha digitável/código de barras com DVs corretos;
+- fonte: maior que a fonte mais comum da página e/ou em negrito;
+- posição: na metade inferior direita da página;
+- magnitude: entre os maiores valores candidatos.
+
+A confiança é a soma dos pontos, limitada a 1. O primeiro candidato é aceito sem perguntar quando
+a confiança passa do limiar e fica à frente do segundo por uma margem mínima.
+"""
+from collections import namedtuple
+from statistics import median
+
+from line_items import Money
+from pdf_reader import RANK_ISOLATED, STRONG_TOTAL_LABELS, _AMOUNT_RE
+
+# Limiar padrão para aceitar o primeiro candidato (sobrescrito por "limiar_aceite_automatico"
+# no parametros.json) e vantagem mínima sobre o segundo
+AUTO_ACCEPT_THRESHOLD = 0.75
+AUTO_ACCEPT_MARGIN = 0.15
+
+# Pontos de cada característica
+WEIGHT_STRONG_LABEL = 0.50
+WEIGHT_LABEL = 0.20
+WEIGHT_BOLETO = 0.35
+WEIGHT_LARGE_FONT = 0.10
+WEIGHT_BOLD = 0.10
+WEIGHT_POSITION = 0.10
+WEIGHT_MAGNITUDE = 0.15
+
+# Fonte "maior" a partir deste fator sobre a mediana da página
+LARGE_FONT_FACTOR = 1.2
+# Flag de negrito dos spans do PyMuPDF
+BOLD_FLAG = 16
+# Máximo de páginas cuja camada "dict" é lida só para a pontuação (as já lidas não contam)
+MAX_SPAN_PAGES = 2
+
+# Valor pontuado: confiança de 0 a 1 e os motivos, para o log e para o diálogo
+ScoredValue = namedtuple("ScoredValue", ["value", "confidence", "reasons"])
+
+# Centavos de um valor no formato brasileiro (None se não for um valor)
+def _cents(value):
+    try:
+        return Money.parse_br(value).cents
+    except (ValueError, ArithmeticError):
+        return None
+
+# Acrescenta a `features` os pontos de fonte e posição dos candidatos, pelos spans da página
+def _add_layout_features(page, wanted, cents_of, features):
+    spans = page.spans
+    if not spans:
+        return
+    typical_size = median(span.size for span in spans)
+    width, height = page.rect.width or 1, page.rect.height or 1
+    for span in spans:
+        for match in _AMOUNT_RE.finditer(span.text):
+            cents = cents_of(match.group())
+            if cents not in wanted:
+                continue
+            found = features.setdefault(cents, set())
+            if span.size >= typical_size * LARGE_FONT_FACTOR:
+                found.add("fonte")
+            if span.flags & BOLD_FLAG:
+                found.add("negrito")
+            x0, y0, x1, y1 = span.bbox
+            if (x0 + x1) / 2 / width > 0.5 and (y0 + y1) / 2 / height > 0.5:
+                found.add("posicao")
+
+# Pontua os candidatos usando só as páginas já lidas do DocumentModel
+def score_values(model, values):
+    """Devolve uma lista de ScoredValue, da maior para a menor confiança (empates mantêm a ordem
+    original das estratégias). Grafias diferentes do mesmo valor ("1234,56" e "1.234,56") ficam
+    só com a primeira. Tokens, boletos e spans vêm do que a extração já calculou em cada página;
+    a camada "dict" só é lida a mais nas páginas onde um candidato tem rótulo."""
+    candidates = []
+    seen = set()
+    for value in values or ():
+        cents = _cents(value)
+        if cents is not None and cents not in seen:
+            seen.add(cents)
+            candidates.append((value, cents))
+    if not candidates:
+        return []
+    wanted = {cents for _, cents in candidates}
+
+    # Cada grafia é convertida uma vez: os mesmos valores se repetem nos tokens e nos spans
+    parsed = {}
+    def cents_of(value):
+        if value not in parsed:
+            parsed[value] = _cents(value)
+        return parsed[value]
+
+    labels = {}          # centavos -> melhor rótulo (pontos, nome)
+    boleto_amounts = set()
+    layout = {}          # centavos -> {"fonte", "negrito", "posicao"}
+    span_reads = 0
+    for page in model.loaded_pages():
+        labelled = False
+        for token in page.tokens:
+            cents = cents_of(token.value)
+            if cents not in wanted:
+                continue
+            if token.label in STRONG_TOTAL_LABELS:
+                label = (WEIGHT_STRONG_LABEL, token.label)
+            elif token.label or any(rank != RANK_ISOLATED for rank in token.ranks):
+                label = (WEIGHT_LABEL, token.label or "R$")
+            else:
+                continue
+            labelled = True
+            if label > labels.get(cents, (0, "")):
+                labels[cents] = label
+        boleto_amounts.update(info.amount_cents for info in page.boletos if info.amount_cents)
+        if page.has_spans:
+            _add_layout_features(page, wanted, cents_of, layout)
+        elif labelled and span_reads < MAX_SPAN_PAGES:
+            span_reads += 1
+            _add_layout_features(page, wanted, cents_of, layout)
+
+    magnitude = {cents: rank for rank, cents in enumerate(sorted(wanted, reverse=True))}
+
+    scored = []
+    for order, (value, cents) in enumerate(candidates):
+        score = 0.0
+        reasons = []
+        if cents in labels:
+            points, name = labels[cents]
+            score += points
+            reasons.append(f"rótulo {name}")
+        if cents in boleto_amounts:
+            score += WEIGHT_BOLETO
+            reasons.append("confere com a linha digitável")
+        found = layout.get(cents, ())
+        if "fonte" in found:
+            score += WEIGHT_LARGE_FONT
+            reasons.append("fonte maior")
+        if "negrito" in found:
+            score += WEIGHT_BOLD
+            reasons.append("negrito")
+        if "posicao" in found:
+            score += WEIGHT_POSITION
+            reasons.append("canto inferior direito")
+        rank = magnitude[cents]
+        if rank < 3:
+            score += WEIGHT_MAGNITUDE / (rank + 1)
+            reasons.append("maior valor" if rank == 0 else f"{rank + 1}º maior valor")
+        scored.append((-min(score, 1.0), order, ScoredValue(value, round(min(score, 1.0), 2), reasons)))
+
+    scored.sort()
+    return [entry for _, _, entry in scored]
+
+# Primeiro candidato, se puder ser aceito sem perguntar ao usuário
+def auto_accept(scored, threshold=AUTO_ACCEPT_THRESHOLD, margin=AUTO_ACCEPT_MARGIN):
+    """Devolve o ScoredValue aceito ou None"""
+    if not scored or scored[0].confidence < threshold:
+        return None
+    if len(scored) > 1 and scored[0].confidence - scored[1].confidence < margin:
+        return None
+    return scored[0]